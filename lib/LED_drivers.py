@@ -17,6 +17,10 @@ class PixelStrip_Emu():
         if 0 < pos < self.leds:
             self.led_state[pos] = color
 
+    def setPixels(self, pixels):
+        pixels = pixels[:self.leds]
+        self.led_state = pixels.tolist() if hasattr(pixels, "tolist") else list(pixels)
+
     def getPixels(self):
         return self.led_state
 
@@ -0,0 +1,186 @@
+"""
+Single owner of the LED strip while an animation runs.
+
+Animations used to run on a fresh thread each, polling the menu flags every
+frame, with fixed sleeps covering the handoff (0.3 s in stop_animations, 0.2 s
+on restarts, 1 s at the end of manage_idle_animation). The controller keeps one
+worker thread instead. Every started animation gets a CancelToken; starting
+another animation or stopping cancels the token, the engine notices it at the
+latest when its current frame wait ends (the wait is woken by the token), and
+stop(wait=True) returns as soon as the worker has let go of the strip, which is
+bounded by one frame.
+
+The menu flags is_animation_running / is_idle_animation_running are views of
+this state (see MenuLCD).
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from lib.log_setup import logger
+
+
+class CancelToken:
+    """Cancellation flag shared between the controller and one running animation."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Sleep up to timeout seconds; returns True early once cancelled."""
+        return self._event.wait(timeout)
+
+
+class _Request:
+    def __init__(self, frames, ledstrip, ledsettings, speed_ms, param, is_idle, stop_on_key):
+        self.frames = frames
+        self.ledstrip = ledstrip
+        self.ledsettings = ledsettings
+        self.speed_ms = speed_ms
+        self.param = param
+        self.is_idle = is_idle
+        self.stop_on_key = stop_on_key
+        self.token = CancelToken()
+
+
+class AnimationController:
+    def __init__(self, window=256):
+        """
+        Args:
+            window: Number of recent handoff times kept for get_stats()
+        """
+        self._cond = threading.Condition()
+        self._pending = None
+        self._current = None
+        self._thread = None
+        self._handoffs = deque(maxlen=window)
+
+    @staticmethod
+    def _matches(request, idle):
+        return request is not None and not request.token.cancelled and (idle is None or request.is_idle == idle)
+
+    def start(self, frames, ledstrip, ledsettings, speed_ms=None, param=None, is_idle=False, stop_on_key=None):
+        """
+        Replace whatever animation is running with a new one.
+
+        Args:
+            frames: Frame generator function (see lib.animation_engine)
+            ledstrip: LedStrip instance
+            ledsettings: LedSettings instance
+            speed_ms: Animation speed in milliseconds, global speed if None
+            param: Animation parameter (chord scale, colormap name)
+            is_idle: Whether this is an idle animation (stopped by any activity)
+            stop_on_key: Whether a key press ends it (see stop_for_key()), defaults to is_idle
+
+        Returns:
+            CancelToken: Token of the new animation
+        """
+        if stop_on_key is None:
+            stop_on_key = is_idle
+        request = _Request(frames, ledstrip, ledsettings, speed_ms, param, is_idle, stop_on_key)
+        with self._cond:
+            for running in (self._pending, self._current):
+                if running is not None:
+                    running.token.cancel()
+            self._pending = request
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="animation", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return request.token
+
+    def stop(self, idle=None, wait=True, timeout=1.0):
+        """
+        Cancel the running animation.
+
+        Args:
+            idle: True to stop only an idle animation, False only a user-started one, None for either
+            wait: Block until the worker released the strip
+            timeout: Upper bound for the wait in seconds
+
+        Returns:
+            bool: True if an animation was stopped
+        """
+        return self._stop(lambda request: self._matches(request, idle), wait, timeout)
+
+    def stop_for_key(self, wait=True, timeout=1.0):
+        """Cancel the running animation if a key press ends it; arguments and result as in stop()."""
+        return self._stop(lambda request: self._matches(request, None) and request.stop_on_key, wait, timeout)
+
+    def _stop(self, matches, wait, timeout):
+        started = time.perf_counter()
+        with self._cond:
+            stopped = [r for r in (self._pending, self._current) if matches(r)]
+            if not stopped:
+                return False
+            for request in stopped:
+                request.token.cancel()
+            if self._pending in stopped:
+                self._pending = None
+            if wait and threading.current_thread() is not self._thread:
+                released = self._cond.wait_for(lambda: self._current not in stopped, timeout)
+                if released:
+                    self._handoffs.append(time.perf_counter() - started)
+                else:
+                    logger.warning("Animation did not stop within %.2f s" % timeout)
+        return True
+
+    def is_running(self, idle=None):
+        """Whether an animation (of the given kind, see stop()) is running or about to start."""
+        with self._cond:
+            return self._matches(self._pending, idle) or self._matches(self._current, idle)
+
+    def _worker(self):
+        from lib.animation_engine import run_animation
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None)
+                request, self._pending = self._pending, None
+                self._current = request
+            try:
+                run_animation(request.frames, request.ledstrip, request.ledsettings, request.token,
+                              request.speed_ms, request.param)
+            except Exception as e:
+                logger.warning(f"Animation failed: {e}")
+            finally:
+                with self._cond:
+                    self._current = None
+                    self._cond.notify_all()
+
+    def get_stats(self):
+        """
+        Time from stop() to the worker releasing the strip, in milliseconds.
+
+        Returns:
+            dict: {count, p50, max}
+        """
+        with self._cond:
+            samples = np.array(self._handoffs) * 1000
+        if len(samples) == 0:
+            return {"count": 0, "p50": None, "max": None}
+        return {"count": int(len(samples)), "p50": round(float(np.median(samples)), 3),
+                "max": round(float(samples.max()), 3)}
+
+
+# Global controller instance, created at import so every thread shares the same worker
+_controller = AnimationController()
+
+
+def get_controller() -> AnimationController:
+    """
+    Get the global animation controller.
+
+    Returns:
+        AnimationController: The global controller instance
+    """
+    return _controller
@@ -0,0 +1,180 @@
+"""
+Frame-generator engine for the LED animations.
+
+Every registered animation is a generator function taking an AnimationContext.
+It primes with a bare ``yield`` and then, for each ``(t, dt)`` the engine sends
+(seconds since start, seconds since the previous frame), yields the whole strip
+as an (N, 3) array of 0-255 channel values. Per-animation parameters (speed,
+scale, colormap) come from the context, brightness and colors are read live.
+
+    def rainbow(ctx):
+        t, dt = yield
+        while True:
+            ...
+            t, dt = yield frame
+
+run_animation() drives the generator from one shared RenderScheduler, writes
+the frame to every pixel left free by the keys (LedStrip.get_overwrite_mask)
+in a single set_masked() call and shows it. A generator may also yield packed
+uint32 colors, or None when the previous frame still stands; periodic
+animations are replayed this way from lib.frame_cache. Returning from the generator or
+cancelling its token ends the animation and fills the free pixels with the
+backlight, unless the generator returns a frame to leave on the strip
+instead. Animations are started through
+lib.animation_controller, whose worker thread is the only caller.
+"""
+
+import numpy as np
+
+from lib.render_scheduler import RenderScheduler
+
+ANIMATION_FPS = 60
+MAX_FRAME_DT = 0.25  # Longer stalls (cover closed, slow show) don't make animations jump
+
+_scheduler = RenderScheduler(ANIMATION_FPS)
+
+
+def get_scheduler():
+    """The RenderScheduler shared by all animations."""
+    return _scheduler
+
+
+class AnimationContext:
+    """Strip geometry, settings and parameters handed to a frame generator."""
+
+    def __init__(self, ledstrip, ledsettings, speed_ms=None, param=None, seed=None):
+        """
+        Args:
+            ledstrip: LedStrip instance
+            ledsettings: LedSettings instance
+            speed_ms: Animation speed (old per-frame wait) in milliseconds, global speed if None
+            param: Animation parameter (chord scale, colormap name)
+            seed: Optional seed for the random generator
+        """
+        from lib.animation_speed import get_global_speed_ms
+        self.ledstrip = ledstrip
+        self.ledsettings = ledsettings
+        if speed_ms is None:
+            speed_ms = get_global_speed_ms(getattr(ledsettings, "usersettings", None))
+        self.speed_ms = max(1.0, float(speed_ms))
+        self.param = param
+        self.num_pixels = ledstrip.strip.numPixels()
+        self.positions = np.arange(self.num_pixels, dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def brightness(self):
+        from lib.functions import calculate_brightness
+        return calculate_brightness(self.ledsettings)
+
+    def backlight_color(self):
+        """Backlight color as a float (r, g, b) array."""
+        ls = self.ledsettings
+        return np.array([ls.get_backlight_color("Red"), ls.get_backlight_color("Green"),
+                         ls.get_backlight_color("Blue")], dtype=np.float64)
+
+    def rate(self, step, min_ms=0.0):
+        """
+        Convert a per-frame step of the old sleep loops into a per-second rate.
+
+        The old loops advanced `step` every speed_ms (or a scaled step every
+        10-20 ms, which works out to the same rate), so the speed setting keeps
+        its meaning whatever frame rate the engine runs at.
+        """
+        return step * 1000.0 / max(self.speed_ms, min_ms)
+
+    def frames_elapsed(self, dt, max_ms=None, min_ms=0.0):
+        """Number of old loop iterations that fit in dt, for per-frame chances and ages."""
+        period = max(self.speed_ms, min_ms)
+        if max_ms is not None:
+            period = min(period, max_ms)
+        return dt * 1000.0 / period
+
+    def can_overwrite(self):
+        """Mask of pixels not showing a key."""
+        from lib.functions import can_overwrite_mask
+        return can_overwrite_mask(self.ledstrip, self.ledsettings, self.num_pixels)
+
+
+def start_frames(frames, ctx):
+    """Create and prime a frame generator."""
+    gen = frames(ctx)
+    next(gen)
+    return gen
+
+
+def render_frame(ledstrip, ledsettings, frame):
+    """Write a frame to every overwritable pixel and show it."""
+    from lib.functions import can_overwrite_mask
+    strip = ledstrip.strip
+    strip.set_masked(can_overwrite_mask(ledstrip, ledsettings, len(frame)), frame)
+    strip.show()
+
+
+def run_animation(frames, ledstrip, ledsettings, token, speed_ms=None, param=None):
+    """
+    Run a frame generator until its token is cancelled or the generator returns.
+
+    Args:
+        frames: Frame generator function (see module docstring)
+        ledstrip: LedStrip instance
+        ledsettings: LedSettings instance
+        token: CancelToken, checked every frame and waking the frame wait
+        speed_ms: Animation speed in milliseconds, global speed if None
+        param: Animation parameter (chord scale, colormap name)
+    """
+    from lib.functions import backlight_idle_leds, read_cover_open
+    from lib.animation_frames import PERIODIC
+    from lib.frame_cache import cached_frames
+    backlight_idle_leds(ledstrip, ledsettings)
+
+    if frames in PERIODIC:
+        frames = cached_frames(frames, PERIODIC[frames])
+    ctx = AnimationContext(ledstrip, ledsettings, speed_ms, param)
+    gen = start_frames(frames, ctx)
+    scheduler = _scheduler
+    scheduler.reset()
+
+    t = 0.0
+    last = None
+    shown_frame = None
+    shown_version = None  # Occupancy version shown_frame was written with
+    cover_was_open = True
+    end_frame = None
+    while not token.cancelled:
+        if not read_cover_open():
+            if cover_was_open:
+                backlight_idle_leds(ledstrip, ledsettings)
+            cover_was_open = False
+            last = None  # Don't count the time the cover was closed
+            shown_version = None
+            token.wait(.1)
+            continue
+        cover_was_open = True
+
+        now = scheduler.begin_frame()
+        dt = 0.0 if last is None else min(now - last, MAX_FRAME_DT)
+        last = now
+        t += dt
+        try:
+            frame = gen.send((t, dt))
+        except StopIteration as stop:
+            end_frame = stop.value
+            break
+        if token.cancelled:
+            break
+        if frame is None and shown_version != ledstrip.occupancy_version:
+            # Unchanged frame, but keys freed or took pixels since it was written
+            frame = shown_frame
+        if frame is not None:
+            render_frame(ledstrip, ledsettings, frame)
+            shown_frame = frame
+            shown_version = ledstrip.occupancy_version
+        scheduler.end_frame()
+        scheduler.wait(wake=token.wait)
+
+    gen.close()
+    if end_frame is not None and not token.cancelled:
+        render_frame(ledstrip, ledsettings, end_frame)
+    else:
+        backlight_idle_leds(ledstrip, ledsettings)
@@ -0,0 +1,506 @@
+"""
+Vectorized frame generators for the registered LED animations.
+
+Each generator follows the protocol of lib.animation_engine: it takes an
+AnimationContext, primes with a bare ``yield`` and then yields the whole strip
+as an (N, 3) float array for every (t, dt) it is sent. Values are clipped and
+truncated to 0-255 when packed, like the int() conversions of the old loops.
+
+Movement that used to advance by a fixed step per loop iteration is expressed
+as a rate per second (ctx.rate), and per-iteration chances and ages are scaled
+by ctx.frames_elapsed(dt), so each animation looks the same as its old loop at
+the same speed setting.
+"""
+
+import colorsys
+import math
+
+import numpy as np
+
+import lib.colormaps as cmap
+
+TWO_PI = 2 * math.pi
+
+
+def wheel_colors(pos, brightness):
+    """
+    Vectorized functions.wheel(): rainbow colors across 0-255 positions.
+
+    Args:
+        pos: Array of wheel positions
+        brightness: Brightness multiplier (0-1)
+
+    Returns:
+        np.ndarray: (N, 3) float channel values
+    """
+    pos = np.asarray(pos, dtype=np.float64) % 255
+    out = np.zeros(pos.shape + (3,))
+    first = pos < 85
+    second = (pos >= 85) & (pos < 170)
+    third = pos >= 170
+
+    p = pos[first] * 3
+    out[first, 0] = p
+    out[first, 1] = 255 - p
+    p = (pos[second] - 85) * 3
+    out[second, 0] = 255 - p
+    out[second, 2] = p
+    p = (pos[third] - 170) * 3
+    out[third, 1] = p
+    out[third, 2] = 255 - p
+    return out * brightness
+
+
+def theater_chase(ctx):
+    frame = np.zeros((ctx.num_pixels, 3))
+    t, dt = yield
+    while True:
+        q = int(t * 1000 / ctx.speed_ms) % 5
+        frame[:] = 0
+        frame[q::5] = np.floor(ctx.backlight_color() * ctx.brightness)
+        t, dt = yield frame
+
+
+def theater_chase_rainbow(ctx):
+    frame = np.zeros((ctx.num_pixels, 3))
+    t, dt = yield
+    while True:
+        step = int(t * 1000 / ctx.speed_ms)
+        q = step % 5
+        j = (step // 5) % 257
+        frame[:] = 0
+        frame[q::5] = wheel_colors((ctx.positions[q::5] - q + j) % 255, ctx.brightness)
+        t, dt = yield frame
+
+
+def rainbow(ctx):
+    frame = np.zeros((ctx.num_pixels, 3))
+    t, dt = yield
+    while True:
+        frame[:] = wheel_colors((ctx.rate(1.0) * t) % 256, ctx.brightness)
+        t, dt = yield frame
+
+
+def rainbow_cycle(ctx):
+    offsets = ctx.positions * 256 / ctx.num_pixels
+    t, dt = yield
+    while True:
+        t, dt = yield wheel_colors(offsets + (ctx.rate(1.0) * t) % 256, ctx.brightness)
+
+
+def fireplace(ctx):
+    frame = np.zeros((ctx.num_pixels, 3))
+    next_flicker = 0.0
+    t, dt = yield
+    while True:
+        if t >= next_flicker:
+            brightness = ctx.brightness
+            frame[:, 0] = np.floor(brightness * ctx.rng.integers(150, 256, ctx.num_pixels))
+            frame[:, 1] = int(brightness * 50)  # Reddish color for fire
+            next_flicker = t + ctx.rng.uniform(ctx.speed_ms / 1000, ctx.speed_ms / 500)
+        t, dt = yield frame
+
+
+def breathing(ctx):
+    frame = np.zeros((ctx.num_pixels, 3))
+    low, high = 24.0, 98.0
+    span = high - low
+    t, dt = yield
+    while True:
+        # Multiplier bounces between 24 and 98 percent
+        x = (ctx.rate(2.0) * t) % (2 * span)
+        multiplier = low + (x if x <= span else 2 * span - x)
+        frame[:] = np.round(ctx.backlight_color() * (multiplier / 100 * ctx.brightness))
+        t, dt = yield frame
+
+
+def sound_of_da_police(ctx):
+    frame = np.zeros((ctx.num_pixels, 3))
+    positions = ctx.positions
+    middle = ctx.num_pixels / 2
+    r_start = 0.0
+    l_start = 196.0
+    t, dt = yield
+    while True:
+        step = ctx.rate(14.0) * dt
+        r_start += step
+        l_start -= step
+
+        value = int(255 * ctx.brightness)
+        right = (positions > middle) & (r_start < positions) & (positions < r_start + 40)
+        left = (positions < middle) & (l_start > positions) & (positions > l_start - 40)
+        frame[:] = 0
+        frame[right, 0] = value
+        frame[left & ~right, 2] = value
+        if r_start > 150:
+            r_start = 0.0
+            l_start = 175.0
+        t, dt = yield frame
+
+
+def scanner(ctx):
+    frame = np.zeros((ctx.num_pixels, 3))
+    positions = ctx.positions
+    scanner_length = 20
+    half = scanner_length / 2
+    color = ctx.backlight_color()
+    position = 0.0
+    direction = 1
+    t, dt = yield
+    while True:
+        position += direction * ctx.rate(3.0) * dt
+        window = (position - scanner_length < positions) & (positions < position + scanner_length)
+        divide = (half - np.abs(position - positions)) / half
+        # Pixels outside the window keep the beam's trail, as before
+        frame[window] = np.floor(color * np.maximum(divide[window], 0)[:, None] * ctx.brightness)
+
+        if position >= ctx.num_pixels:
+            direction = -1
+        elif position <= 1:
+            direction = 1
+        t, dt = yield frame
+
+
+def chords(ctx):
+    from lib.functions import compute_note_positions
+    ledstrip = ctx.ledstrip
+    ledsettings = ctx.ledsettings
+    frame = np.zeros((ctx.num_pixels, 3))
+    scale = int(ctx.param)
+    notes_in_scale = [0, 2, 4, 5, 7, 9, 11] if scale < 12 else [0, 2, 3, 5, 7, 8, 10]
+    layout_key = None
+    leds = colors = None
+    t, dt = yield
+    while True:
+        ledstrip.get_note_map()  # Bumps note_map_version when the geometry changed
+        key = (ledstrip.note_map_version, ctx.num_pixels)
+        if key != layout_key:
+            layout_key = key
+            density = ledstrip.leds_per_meter / 72
+            # One note per key the strip can show; can go past MIDI 127 on dense strips
+            notes = 21 + np.arange(int(ctx.num_pixels / density))
+            positions = compute_note_positions(notes, ledstrip.led_number, ledstrip.leds_per_meter,
+                                               ledstrip.shift, ledstrip.reverse, ledsettings.note_offsets)
+            in_scale = np.isin((notes - scale) % 12, notes_in_scale)
+            visible = positions < ctx.num_pixels
+            leds = positions[visible]
+            colors = np.where(in_scale[visible, None],
+                              np.array(list(ledsettings.key_in_scale.values()), dtype=np.float64),
+                              np.array(list(ledsettings.key_not_in_scale.values()), dtype=np.float64))
+
+        frame[:] = 0
+        frame[leds] = np.floor(colors * ctx.brightness)
+        t, dt = yield frame
+
+
+def colormap_animation(ctx):
+    ledsettings = ctx.ledsettings
+    frame = np.zeros((ctx.num_pixels, 3))
+    t, dt = yield
+    while True:
+        colormap = cmap.get_lut(ctx.param)
+        if colormap is None:
+            return
+
+        # Pixels outside A0..C8 keep the backlight, as set by fastColorWipe
+        if ledsettings.backlight_stopped:
+            frame[:] = 0
+        else:
+            frame[:] = np.floor(ctx.backlight_color() * (ledsettings.backlight_brightness_percent / 100))
+
+        note_map = ctx.ledstrip.get_note_map()
+        led_a0 = int(note_map[21])
+        led_c8 = int(note_map[108])
+        step = 1 if led_c8 >= led_a0 else -1
+        num_leds = abs(led_c8 - led_a0) + 1
+        leds = np.arange(led_a0, led_c8 + step, step)
+        index = np.round(np.arange(len(leds)) * 255 / num_leds).astype(np.intp)
+        colors = colormap[index]
+        visible = leds < ctx.num_pixels
+        frame[leds[visible]] = np.round(colors[visible] * ctx.brightness)
+        t, dt = yield frame
+
+
+def wave(ctx):
+    num_pixels = ctx.num_pixels
+    trail_length = max(10, int(num_pixels * 0.3))
+    pixel_phase = ctx.positions / num_pixels * TWO_PI
+    wave_position = 0.0
+    t, dt = yield
+    while True:
+        wave_position = (wave_position + ctx.rate(0.1) * dt) % TWO_PI
+
+        phase_diff = ((pixel_phase - wave_position + math.pi) % TWO_PI) - math.pi
+        wave_value = (np.sin(phase_diff + math.pi / 2) + 1.0) / 2.0
+        pixel_distance = np.abs(phase_diff) / TWO_PI * num_pixels
+        fade_factor = 1.0 - np.minimum(pixel_distance / trail_length, 1.0)
+        pixel_brightness = wave_value * fade_factor * ctx.brightness
+        t, dt = yield np.floor(ctx.backlight_color() * pixel_brightness[:, None])
+
+
+def lava_lamp(ctx):
+    num_pixels = ctx.num_pixels
+    positions = ctx.positions
+    base_speed = ctx.rate(0.3)  # Pixels per second
+    blob_pos = num_pixels * np.array([0.2, 0.5, 0.7, 0.9])
+    blob_vel = base_speed * np.array([0.8, -1.2, 1.0, -0.6])
+    blob_size = num_pixels * np.array([0.15, 0.12, 0.18, 0.14])
+    blob_intensity = np.array([0.9, 0.7, 0.85, 0.75])
+    color = ctx.backlight_color()
+    t, dt = yield
+    while True:
+        blob_pos += blob_vel * dt
+        low = blob_pos <= 0
+        high = blob_pos >= num_pixels - 1
+        blob_pos[low] = 0
+        blob_vel[low] = np.abs(blob_vel[low])
+        blob_pos[high] = num_pixels - 1
+        blob_vel[high] = -np.abs(blob_vel[high])
+
+        # Occasional random velocity change (2% chance per old frame)
+        chance = min(1.0, 0.02 * ctx.frames_elapsed(dt, max_ms=10.0))
+        vary = ctx.rng.random(len(blob_pos)) < chance
+        if vary.any():
+            blob_vel[vary] += ctx.rng.uniform(-0.05, 0.05, vary.sum()) * base_speed
+            np.clip(blob_vel, -base_speed * 2, base_speed * 2, out=blob_vel)
+
+        distance = np.abs(positions[None, :] - blob_pos[:, None]) / blob_size[:, None]
+        contribution = (np.exp(-2.0 * distance ** 2) * blob_intensity[:, None]).sum(axis=0)
+        t, dt = yield np.floor(np.clip(color * (contribution * ctx.brightness)[:, None], 0, 255))
+
+
+# (r, g, b) slots filled by (c, x, 0) per 60 degree hue sector
+_HSV_SECTORS = ((0, 1, 2), (1, 0, 2), (2, 0, 1), (2, 1, 0), (1, 2, 0), (0, 2, 1))
+
+
+def _hsv_to_rgb(hue, saturation, value):
+    """HSV -> RGB (0-255, truncated) for one hue in degrees and arrays of s/v."""
+    hue = hue % 360
+    c = value * saturation
+    x = c * (1 - abs((hue / 60.0) % 2 - 1))
+    m = value - c
+    parts = (c, x, np.zeros_like(c))
+    slots = _HSV_SECTORS[int(hue // 60) % 6]
+    return np.floor(np.stack([parts[slots[k]] + m for k in range(3)], axis=-1) * 255)
+
+
+def aurora(ctx):
+    pixel_pos = ctx.positions / ctx.num_pixels
+    base_speed = ctx.rate(0.05)  # Radians per second
+    phases = np.array([0.0, math.pi, math.pi / 2, math.pi * 1.5])
+    speeds = base_speed * np.array([0.8, 1.2, 0.6, 1.0])
+    frequencies = np.array([2.0, 1.5, 2.5, 1.8])
+    hues = [140, 180, 280, 160]  # Green, blue, purple, cyan-green
+    amplitudes = np.array([0.7, 0.6, 0.5, 0.4])
+    time_counter = 0.0
+    total = np.zeros((ctx.num_pixels, 3))
+    t, dt = yield
+    while True:
+        phases = (phases + speeds * dt) % TWO_PI
+        time_counter += base_speed * 0.3 * dt
+        hue_variation = math.sin(time_counter * 0.1) * 20  # +-20 degrees
+
+        wave_values = (np.sin(pixel_pos[None, :] * frequencies[:, None] * TWO_PI + phases[:, None]) + 1.0) / 2.0
+        intensities = wave_values * amplitudes[:, None]
+        total[:] = 0
+        for k, hue in enumerate(hues):
+            intensity = intensities[k]
+            rgb = _hsv_to_rgb(hue + hue_variation, 0.6 + intensity * 0.4, 0.3 + intensity * 0.7)
+            total += rgb * intensity[:, None]
+        t, dt = yield np.floor(np.clip(total * ctx.brightness, 0, 255))
+
+
+def stardust(ctx):
+    num_pixels = ctx.num_pixels
+    speed_factor = max(0.3, min(3.0, 50.0 / ctx.speed_ms))
+    spawn_rate = 0.3 * speed_factor  # Chance of new stars per old frame
+    fade_duration = 1.5 / speed_factor  # Seconds
+    max_stars = max(1, int(num_pixels * 0.15))
+    color = ctx.backlight_color()
+
+    star_led = np.zeros(0, dtype=np.intp)
+    star_age = np.zeros(0)
+    star_fade = np.zeros(0)
+    frame = np.zeros((num_pixels, 3))
+    t, dt = yield
+    while True:
+        if len(star_led) < max_stars and ctx.rng.random() < min(1.0, spawn_rate * ctx.frames_elapsed(dt)):
+            free = ctx.can_overwrite()
+            free[star_led] = False
+            candidates = np.flatnonzero(free)
+            count = min(int(ctx.rng.integers(1, min(3, max_stars - len(star_led)) + 1)), len(candidates))
+            if count:
+                new = ctx.rng.choice(candidates, count, replace=False)
+                star_led = np.concatenate([star_led, new])
+                star_age = np.concatenate([star_age, np.zeros(count)])
+                star_fade = np.concatenate([star_fade, fade_duration * ctx.rng.uniform(0.7, 1.3, count)])
+
+        star_age += dt
+        alive = star_age < star_fade
+        star_led, star_age, star_fade = star_led[alive], star_age[alive], star_fade[alive]
+
+        frame[:] = 0
+        level = (1.0 - star_age / star_fade) * ctx.brightness * ctx.rng.uniform(0.9, 1.1, len(star_led))
+        frame[star_led] = np.floor(np.clip(color * level[:, None], 0, 255))
+        t, dt = yield frame
+
+
+def kaleidoscope(ctx):
+    num_pixels = ctx.num_pixels
+    positions = ctx.positions
+    segment_size = num_pixels / 4
+    segment_index = np.floor(positions / segment_size)
+    pos_in_segment = (positions % segment_size) / segment_size
+    normalized_pos = np.where(segment_index % 2 == 0, pos_in_segment, 1.0 - pos_in_segment)
+    color_shift_speed = 0.02
+    rotation_angle = 0.0
+    rgb = np.zeros((num_pixels, 3))
+    t, dt = yield
+    while True:
+        turn = rotation_angle / TWO_PI
+        rotated_pos = (normalized_pos + turn) % 1.0
+        wave_value = (np.sin(rotated_pos * TWO_PI * 2) + 1.0) / 2.0
+        secondary_wave = (np.sin(rotated_pos * TWO_PI * 3 + rotation_angle) + 1.0) / 2.0
+        intensity = (wave_value * 0.7 + secondary_wave * 0.3) * (255 * ctx.brightness)
+
+        # Three-segment hue ramp red -> green -> blue
+        hue = ((rotated_pos + turn + color_shift_speed * t) % 1.0) * 3
+        sector = np.minimum(hue.astype(np.intp), 2)
+        ramp = hue - sector
+        rgb[:] = 0
+        rows = np.arange(num_pixels)
+        rgb[rows, sector] = 1.0 - ramp
+        rgb[rows, (sector + 1) % 3] = ramp
+        t, dt = yield np.floor(np.clip(rgb * intensity[:, None], 0, 255))
+
+        rotation_angle = (rotation_angle + ctx.rate(0.05) * dt) % TWO_PI
+
+
+def color_ripple(ctx):
+    num_pixels = ctx.num_pixels
+    positions = ctx.positions
+    expansion_speed = ctx.rate(1.5, min_ms=20.0)  # Pixels per second
+    speed_factor = max(0.3, min(2.0, 100.0 / ctx.speed_ms))
+    spawn_rate = 0.08 * speed_factor
+    max_ripples = 4
+    max_radius = num_pixels * 0.4
+    color = ctx.backlight_color()
+
+    centers = np.zeros(0)
+    radii = np.zeros(0)
+    speeds = np.zeros(0)
+    frame = np.zeros((num_pixels, 3))
+    t, dt = yield
+    while True:
+        frames = ctx.frames_elapsed(dt, max_ms=66.67, min_ms=20.0)
+        if len(centers) < max_ripples and ctx.rng.random() < min(1.0, spawn_rate * frames):
+            candidates = np.flatnonzero(ctx.can_overwrite())
+            if len(candidates):
+                centers = np.append(centers, ctx.rng.choice(candidates))
+                radii = np.append(radii, 0.0)
+                speeds = np.append(speeds, expansion_speed * ctx.rng.uniform(0.8, 1.2))
+
+        radii += speeds * dt
+        alive = radii < max_radius
+        centers, radii, speeds = centers[alive], radii[alive], speeds[alive]
+
+        frame[:] = 0
+        brightness = ctx.brightness
+        for center, radius in zip(centers, radii):
+            distance = np.abs(positions - center)
+            inside = distance <= radius
+            normalized = distance[inside] / radius if radius > 0 else np.zeros(inside.sum())
+            ring_phase = (normalized * 4.0) % 2.0
+            ring_phase = np.where(ring_phase > 1.0, 2.0 - ring_phase, ring_phase)
+            intensity = math.sin((1.0 - radius / max_radius) * math.pi / 2.0)
+            level = np.minimum((1.0 - normalized * 0.5) * (0.7 + ring_phase * 0.3) * intensity, 1.0)
+            frame[inside] = np.minimum(255, frame[inside] + np.floor(color * (level * brightness)[:, None]))
+        t, dt = yield frame
+
+
+def fireworks(ctx):
+    num_pixels = ctx.num_pixels
+    # Particle speeds, ages and lifetimes are in old frames (20-66.67 ms each)
+    particle_speed = 0.8 * min(1.0, 66.67 / ctx.speed_ms)
+    speed_factor = max(0.3, min(2.0, 100.0 / ctx.speed_ms))
+    spawn_rate = 0.06 * speed_factor
+    max_bursts = 3
+    particles_per_burst = 8
+    particle_lifetime = 60.0 / max(0.5, min(2.0, 50.0 / ctx.speed_ms))
+
+    burst_id = np.zeros(0, dtype=np.int64)
+    position = np.zeros(0)
+    velocity = np.zeros(0)
+    colors = np.zeros((0, 3))
+    age = np.zeros(0)
+    lifetime = np.zeros(0)
+    next_burst = 0
+    frame = np.zeros((num_pixels, 3))
+    t, dt = yield
+    while True:
+        frames = ctx.frames_elapsed(dt, max_ms=66.67, min_ms=20.0)
+        if len(np.unique(burst_id)) < max_bursts and ctx.rng.random() < min(1.0, spawn_rate * frames):
+            candidates = np.flatnonzero(ctx.can_overwrite())
+            if len(candidates):
+                center = ctx.rng.choice(candidates)
+                base = np.floor(np.array(colorsys.hsv_to_rgb(ctx.rng.random(), ctx.rng.uniform(0.7, 1.0),
+                                                             ctx.rng.uniform(0.8, 1.0))) * 255)
+                n = particles_per_burst
+                angle = ctx.rng.uniform(0, TWO_PI, n)
+                burst_id = np.append(burst_id, np.full(n, next_burst))
+                position = np.append(position, np.full(n, float(center)))
+                velocity = np.append(velocity, particle_speed * ctx.rng.uniform(0.5, 1.5, n) * np.cos(angle))
+                colors = np.vstack([colors, np.floor(base * ctx.rng.uniform(0.7, 1.0, n)[:, None])])
+                age = np.append(age, np.zeros(n))
+                lifetime = np.append(lifetime, particle_lifetime * ctx.rng.uniform(0.8, 1.2, n))
+                next_burst += 1
+
+        age += frames
+        position += velocity * frames
+        alive = age < lifetime
+        burst_id, position, velocity = burst_id[alive], position[alive], velocity[alive]
+        colors, age, lifetime = colors[alive], age[alive], lifetime[alive]
+
+        frame[:] = 0
+        level = 1.0 - age / lifetime
+        shown = (level > 0.01) & (position >= 0) & (position < num_pixels)
+        np.add.at(frame, position[shown].astype(np.intp),
+                  np.floor(colors[shown] * (level[shown] * ctx.brightness)[:, None]))
+        np.minimum(frame, 255, out=frame)
+        t, dt = yield frame
+
+
+def startup(ctx):
+    """
+    Red, blue and green blocks in the middle of the strip that fade in to half
+    brightness and back out, then end with the strip off. ctx.param is (duration_ms, max_leds).
+    """
+    duration_ms, max_leds = ctx.param
+    duration = duration_ms / 1000
+    frame = np.zeros((ctx.num_pixels, 3))
+    third = max_leds // 3
+    start = (ctx.num_pixels - max_leds) // 2
+    red = slice(max(start, 0), max(start + third, 0))
+    blue = slice(max(start + third, 0), max(start + 2 * third, 0))
+    green = slice(max(start + 2 * third, 0), max(start + max_leds, 0))
+    t, dt = yield
+    while t < duration:
+        brightness = 0.5 * (1 - abs(2 * t / duration - 1))
+        value = int(255 * brightness)
+        frame[red, 0] = value
+        frame[blue, 2] = value
+        frame[green, 1] = value
+        t, dt = yield frame
+    return np.zeros((ctx.num_pixels, 3))
+
+
+# Animations that are a pure function of t and repeat after a whole number of steps,
+# replayed from lib.frame_cache: generator -> ctx -> (steps per period, seconds per step)
+PERIODIC = {
+    theater_chase: lambda ctx: (5, ctx.speed_ms / 1000),
+    theater_chase_rainbow: lambda ctx: (5 * 257, ctx.speed_ms / 1000),
+    rainbow: lambda ctx: (256, 1 / ctx.rate(1.0)),
+    rainbow_cycle: lambda ctx: (256, 1 / ctx.rate(1.0)),
+    breathing: lambda ctx: (148, 1 / ctx.rate(2.0)),
+    colormap_animation: lambda ctx: (1, math.inf),
+}
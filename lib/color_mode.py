@@ -55,8 +55,8 @@ class ColorMode(object):
         Called on every midi event, with direct ledstrip access.
         If using this function without NoteOn, then
         ledstrip.strip.setPixelColor must be set manually, 
-        as well set ledstrip.keylist_color for fade processing
-        and call ledstrip.set_adjacent_colors.
+        as well set ledstrip.keylist_color for fade processing.
+        Adjacent LEDs are drawn by the halo pass (LedStrip.apply_halo).
         """
         pass
 
@@ -68,6 +68,24 @@ class ColorMode(object):
         """
         pass
 
+    def ColorUpdateFrame(self, frame_time, positions, old_colors):
+        """Optional.  Frame-level ColorUpdate, called once per event loop refresh
+
+        positions holds every LED where old_color > 0, old_colors their colors
+        as an (n, 3) array, frame_time is one time.time() for the whole frame.
+        Return (colors, updated): an (n, 3) color array and a bool mask of the
+        rows to apply (None for all rows), or None for no change.
+        The default calls ColorUpdate once per LED.
+        """
+        colors = np.array(old_colors)
+        updated = np.zeros(len(positions), dtype=bool)
+        for i, led_pos in enumerate(positions):
+            new_color = self.ColorUpdate(None, led_pos, tuple(old_colors[i]))
+            if new_color is not None:
+                colors[i] = new_color
+                updated[i] = True
+        return colors, updated
+
 
 class SingleColor(ColorMode):
     def LoadSettings(self, ledsettings):
@@ -199,6 +217,14 @@ class Rainbow(ColorMode):
     def ColorUpdate(self, time_delta, led_pos, old_color):
         return self.NoteOn(None, None, None, led_pos)
 
+    def ColorUpdateFrame(self, frame_time, positions, old_colors):
+        lut = cmap.get_lut(self.colormap)
+        if lut is None:
+            return None
+        shift = (frame_time - self.timeshift_start) * self.timeshift
+        rainbow_values = ((positions + self.offset + shift) * (float(self.scale) / 100)).astype(np.intp) & 255
+        return lut[rainbow_values], None
+
 
 class SpeedColor(ColorMode):
     def LoadSettings(self, ledsettings):
@@ -246,8 +272,12 @@ class Gradient(ColorMode):
         self.gradient_end = {"red": int(ledsettings.usersettings.get_setting_value("gradient_end_red")),
                              "green": int(ledsettings.usersettings.get_setting_value("gradient_end_green")),
                              "blue": int(ledsettings.usersettings.get_setting_value("gradient_end_blue"))}
+        # One color per LED, so NoteOn is a single lookup
+        self._led_colors = tuple(self.gradient_get_colors(position) for position in range(self.led_number))
 
     def NoteOn(self, midi_event: mido.Message, midi_time, midi_state, note_position):
+        if 0 <= note_position < len(self._led_colors):
+            return self._led_colors[note_position]
         return self.gradient_get_colors(note_position)
 
     def gradient_get_colors(self, position):
@@ -266,10 +296,13 @@ class ScaleColoring(ColorMode):
         self.scale_key = int(ledsettings.scale_key)
         self.key_in_scale = ledsettings.key_in_scale
         self.key_not_in_scale = ledsettings.key_not_in_scale
+        self._note_colors = tuple(
+            tuple(get_scale_color(self.scale_key, note, self.key_in_scale, self.key_not_in_scale))
+            for note in range(128)
+        )
 
     def NoteOn(self, midi_event: mido.Message, midi_time, midi_state, note_position):
-        scale_colors = get_scale_color(self.scale_key, midi_event.note, self.key_in_scale, self.key_not_in_scale)
-        return scale_colors
+        return self._note_colors[midi_event.note]
 
 
 class VelocityRainbow(ColorMode):
@@ -278,11 +311,15 @@ class VelocityRainbow(ColorMode):
         self.scale = int(ledsettings.velocityrainbow_scale)
         self.curve = int(ledsettings.velocityrainbow_curve)
         self.colormap = ledsettings.velocityrainbow_colormap
+        # Colormap index per velocity. The colors themselves are looked up on each
+        # note, as the colormap is regenerated when the gamma changes.
+        self._velocity_index = tuple(
+            int(((255 * powercurve(velocity / 127, self.curve / 100) * (self.scale / 100) % 256) + self.offset) % 256)
+            for velocity in range(128)
+        )
 
     def NoteOn(self, midi_event: mido.Message, midi_time, midi_state, note_position):
         if self.colormap not in cmap.colormaps:
             return None
 
-        x = int(((255 * powercurve(midi_event.velocity / 127, self.curve / 100)
-                    * (self.scale / 100) % 256) + self.offset) % 256)
-        return cmap.colormaps[self.colormap][x]
+        return cmap.colormaps[self.colormap][self._velocity_index[midi_event.velocity]]
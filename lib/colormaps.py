@@ -1,41 +1,96 @@
-import numpy as np
-import os
+"""
+Colormap lookup tables.
+
+Every gradient is turned into a 256 entry lookup table for the current LED
+gamma. Tables live in an immutable snapshot that writers replace as a whole
+(adding a table, changing the gamma) under _publish_lock, so readers - Rainbow
+and VelocityRainbow on every note and frame, the colormap animation - only
+read a module global and never take a lock.
+
+The loaded gradients, the tables for the current gamma and the menu previews
+are kept in Colormaps/cache as two .npy files and a JSON sidecar. When the data
+files and gamma haven't changed, startup reads those instead of parsing
+Colormaps/*.data and generating tables.
+"""
+
 import glob
+import json
+import os
+import threading
+from collections.abc import Mapping
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+
+import numpy as np
+
 from lib.log_setup import logger
 
-# Global state for lazy loading
-_current_gamma = 1.0
-_colormaps_lock = Lock()
+LUT_CACHE_DIR = 'Colormaps/cache'
+LUT_CACHE_FORMAT = 1
+
+
+class _Table:
+    """One lookup table: a read-only (256, 3) uint8 array and the same rows as int tuples."""
+    __slots__ = ("lut", "rows")
+
+    def __init__(self, lut):
+        lut = np.array(lut, dtype=np.uint8)
+        lut.flags.writeable = False
+        self.lut = lut
+        # Scalar lookups return plain ints, as the old list of tuples did
+        self.rows = tuple(map(tuple, lut.tolist()))
+
+
+class _Snapshot:
+    """Tables generated for one gamma. Never modified once published."""
+    __slots__ = ("gamma", "tables")
+
+    def __init__(self, gamma, tables):
+        self.gamma = gamma
+        self.tables = tables
+
+
+_snapshot = _Snapshot(1.0, {})
+_publish_lock = threading.Lock()
+
+# Tables read from the LUT cache by load_colormaps(): (gamma, {name: _Table}) or None
+_cached_tables = None
+_save_lock = threading.Lock()
+
+
+class _ColormapStore(Mapping):
+    """Read-only mapping of gradient name -> lookup table rows, generated on first access."""
 
-# Lazy-loading wrapper for colormaps dict
-class _LazyColormapDict(dict):
-    """Dict-like wrapper that generates colormaps on-demand."""
     def __getitem__(self, key):
-        ensure_colormap_generated(key)
-        # Use dict.__getitem__ to bypass our __getitem__ and avoid recursion
-        return dict.__getitem__(self, key)
-    
+        table = _snapshot.tables.get(key)
+        if table is None:
+            table = ensure_colormap_generated(key)
+            if table is None:
+                raise KeyError(key)
+        return table.rows
+
     def __contains__(self, key):
         # Check if gradient exists, not if colormap is generated
         return key in gradients
-    
-    def get(self, key, default=None):
-        if key in self:
-            return self[key]
-        return default
-    
-    def keys(self):
-        # Return all available gradient names
-        return gradients.keys()
-    
+
     def __iter__(self):
         return iter(gradients.keys())
 
-colormaps = _LazyColormapDict()
+    def __len__(self):
+        return len(gradients)
+
+
+colormaps = _ColormapStore()
 colormaps_preview = {}
 
+
+def get_lut(name):
+    """Read-only (256, 3) uint8 lookup table of a gradient, generated if needed; None if unknown."""
+    table = _snapshot.tables.get(name)
+    if table is None:
+        table = ensure_colormap_generated(name)
+    return table.lut if table is not None else None
+
+
 # Colormap gradients designed with ws281x gamma = 1
 # These will be converted to colormap lookup tables with 256 entries for use in colormaps dict
 gradients = {}
@@ -60,6 +115,10 @@ gradients["Cool-Cyclic"] = [(0.0, (0, 128, 0)), (0.25, (0, 126, 128)), (0.5, (0,
 gradients["Warm-Cyclic"] = [(0.0, (255, 0, 0)), (0.4, (170, 64, 0)), (0.6, (128, 126, 0)), (0.8, (86, 85, 86)),
                             (1.0, (255, 0, 0))]
 
+# Part of the LUT cache signature: tables made from an edited hard-coded gradient are stale
+_BUILTIN_NAMES = frozenset(gradients)
+_BUILTIN_GRADIENTS = repr(gradients)
+
 
 # Gradients from files:
 #
@@ -127,43 +186,75 @@ def gradient_to_cmaplut(gradient, gamma=1, entries=256, int_table=True):
         table[i] = np.interp(xpoints, pos, c01) ** (1 / gamma)
 
     if int_table:
-        return [(round(x[0] * 255), round(x[1] * 255), round(x[2] * 255)) for x in table.T]
+        # np.round rounds half to even, like round()
+        return [tuple(x) for x in np.round(table.T * 255).astype(int).tolist()]
     else:
         return [(x[0], x[1], x[2]) for x in table.T]
 
 
-def update_colormap(name, gamma):
-    """Generate a colormap from its gradient. Thread-safe."""
-    global colormaps, colormaps_preview, gradients, _current_gamma
-
+def _generate(name, gamma):
+    """Return (table, preview) for a gradient, or None if it can't be generated."""
     try:
         if name not in gradients:
             logger.warning(f"Gradient {name} not found")
-            return
-        
-        with _colormaps_lock:
-            # Store directly in the underlying dict
-            dict.__setitem__(colormaps, name, gradient_to_cmaplut(gradients[name], gamma))
-            colormaps_preview[name] = gradient_to_cmaplut(gradients[name], 2.2, 64)
-            _current_gamma = gamma
+            return None
+        gradient = gradients[name]
+        return _Table(gradient_to_cmaplut(gradient, gamma)), gradient_to_cmaplut(gradient, 2.2, 64)
     except Exception as e:
         logger.warning(f"Loading colormap {name} failed: {e}")
+        return None
+
+
+def _publish(name, table, preview, gamma=None):
+    """
+    Swap in a snapshot that includes one more table.
+
+    Args:
+        gamma: If given, publish only while the snapshot is still for this gamma
+
+    Returns:
+        bool: Whether the table was published
+    """
+    global _snapshot
+    with _publish_lock:
+        current = _snapshot
+        if gamma is not None and gamma != current.gamma:
+            return False
+        _snapshot = _Snapshot(current.gamma, {**current.tables, name: table})
+        colormaps_preview[name] = preview
+    return True
+
+
+def update_colormap(name, gamma):
+    """Generate a colormap from its gradient with the given gamma and publish it."""
+    generated = _generate(name, gamma)
+    if generated is not None:
+        _publish(name, *generated)
+        return generated[0]
+    return None
 
 
 def ensure_colormap_generated(name, gamma=None):
-    """Ensure a colormap is generated, generating it lazily if needed. Thread-safe."""
-    global colormaps, _current_gamma
-    
-    if gamma is None:
-        gamma = _current_gamma
-    
-    with _colormaps_lock:
-        # Check underlying dict, not the lazy wrapper's __contains__
-        if name not in dict.keys(colormaps):
-            update_colormap(name, gamma)
-        elif gamma != _current_gamma:
-            # Regenerate if gamma changed
-            update_colormap(name, gamma)
+    """
+    Ensure a colormap is generated for the current gamma, generating it lazily if needed.
+
+    Returns:
+        _Table or None if the gradient is unknown or broken
+    """
+    if gamma is not None and gamma != _snapshot.gamma:
+        generate_colormaps(gradients, gamma, [name])
+
+    while True:
+        snapshot = _snapshot
+        table = snapshot.tables.get(name)
+        if table is not None:
+            return table
+        generated = _generate(name, snapshot.gamma)
+        if generated is None:
+            return None
+        # Retry if the gamma changed while generating
+        if _publish(name, *generated, gamma=snapshot.gamma):
+            return generated[0]
 
 
 def generate_colormaps(gradients, gamma, colormap_names=None):
@@ -176,19 +267,29 @@ def generate_colormaps(gradients, gamma, colormap_names=None):
         colormap_names: Optional list of specific colormap names to generate.
                        If None, generates all colormaps (legacy behavior).
     """
-    global _current_gamma
-    
-    _current_gamma = gamma
-    
-    if colormap_names is None:
-        # Legacy behavior: generate all
-        for k, v in gradients.items():
-            update_colormap(k, gamma)
-    else:
-        # Generate only specified colormaps
-        for name in colormap_names:
-            if name in gradients:
-                update_colormap(name, gamma)
+    global _snapshot
+
+    # Reuse tables already made for this gamma, in memory or in the LUT cache
+    tables = {}
+    if _cached_tables is not None and _cached_tables[0] == gamma:
+        tables.update(_cached_tables[1])
+    current = _snapshot
+    if current.gamma == gamma:
+        tables.update(current.tables)
+
+    previews = {}
+    for name in gradients if colormap_names is None else colormap_names:
+        if name in gradients and name not in tables:
+            generated = _generate(name, gamma)
+            if generated is not None:
+                tables[name], previews[name] = generated
+
+    with _publish_lock:
+        if _snapshot.gamma == gamma:
+            # Keep tables published while this one was being built
+            tables = {**tables, **_snapshot.tables}
+        _snapshot = _Snapshot(gamma, tables)
+        colormaps_preview.update(previews)
 
 
 def _load_led_colormap_file(filepath):
@@ -218,12 +319,76 @@ def _load_srgb_colormap_file(filepath, existing_names):
         return None
 
 
-def load_colormaps():
-    """Load colormap files in parallel for faster startup."""
+def _source_signature(data_dir):
+    """Identifies the colormap data files (names, mtimes, sizes) and the hard-coded gradients."""
+    files = []
+    for filepath in sorted(glob.glob(os.path.join(data_dir, "*.led.data")) +
+                           glob.glob(os.path.join(data_dir, "*.sRGB.data"))):
+        stat = os.stat(filepath)
+        files.append([os.path.basename(filepath), stat.st_mtime_ns, stat.st_size])
+    return {"format": LUT_CACHE_FORMAT, "files": files, "builtin": _BUILTIN_GRADIENTS}
+
+
+def lut_cache_paths(cache_dir=LUT_CACHE_DIR):
+    """Return (tables_path, gradients_path, meta_path) of the LUT cache."""
+    return (os.path.join(cache_dir, "luts.npy"), os.path.join(cache_dir, "gradients.npy"),
+            os.path.join(cache_dir, "luts.json"))
+
+
+def _read_lut_cache(cache_dir, signature):
+    """
+    Read the LUT cache if it was written for the current data files.
+
+    Returns:
+        (file gradients, gamma, {name: _Table}, {name: preview}) or None
+    """
+    tables_path, gradients_path, meta_path = lut_cache_paths(cache_dir)
+    try:
+        with open(meta_path) as handle:
+            meta = json.load(handle)
+        if meta.get("source") != signature:
+            return None
+        luts = np.load(tables_path)
+        rows = np.load(gradients_path)
+        names = meta["names"]
+        if luts.shape != (len(names), 256 + 64, 3) or luts.dtype != np.uint8:
+            return None
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring colormap cache {cache_dir}: {e}")
+        return None
+
+    loaded = {name: rows[start:stop].tolist() for name, start, stop in meta["sources"]}
+    tables = {name: _Table(lut[:256]) for name, lut in zip(names, luts)}
+    previews = {name: [tuple(row) for row in lut[256:].tolist()] for name, lut in zip(names, luts)}
+    return loaded, meta["gamma"], tables, previews
+
+
+def load_colormaps(data_dir="Colormaps", cache_dir=LUT_CACHE_DIR):
+    """
+    Load colormap files, from the LUT cache if it is current, else in parallel.
+
+    A current cache also provides the tables for its gamma (used by
+    generate_colormaps) and the previews of every colormap.
+    """
+    global _cached_tables
+
+    signature = _source_signature(data_dir)
+    cached = _read_lut_cache(cache_dir, signature) if cache_dir else None
+    if cached is not None:
+        loaded, gamma, tables, previews = cached
+        _cached_tables = (gamma, tables)
+        with _publish_lock:
+            for name, preview in previews.items():
+                colormaps_preview.setdefault(name, preview)
+        return loaded
+
+    _cached_tables = None
     gradients = {}
     
     # Load .led.data files in parallel
-    led_files = glob.glob("Colormaps/*.led.data")
+    led_files = glob.glob(os.path.join(data_dir, "*.led.data"))
     if led_files:
         with ThreadPoolExecutor(max_workers=min(len(led_files), 8)) as executor:
             futures = {executor.submit(_load_led_colormap_file, f): f for f in led_files}
@@ -234,7 +399,7 @@ def load_colormaps():
                     gradients[name] = gradient_data
     
     # Load .sRGB.data files in parallel
-    srgb_files = glob.glob("Colormaps/*.sRGB.data")
+    srgb_files = glob.glob(os.path.join(data_dir, "*.sRGB.data"))
     if srgb_files:
         with ThreadPoolExecutor(max_workers=min(len(srgb_files), 8)) as executor:
             futures = {executor.submit(_load_srgb_colormap_file, f, set(gradients.keys())): f for f in srgb_files}
@@ -247,6 +412,69 @@ def load_colormaps():
     return dict(sorted(gradients.items()))
 
 
+def lut_cache_is_current():
+    """Whether the LUT cache holds the file gradients and the tables for the current gamma."""
+    return _cached_tables is not None and _cached_tables[0] == _snapshot.gamma
+
+
+def save_lut_cache(data_dir="Colormaps", cache_dir=LUT_CACHE_DIR):
+    """
+    Write the file gradients, every table for the current gamma and the
+    previews to the LUT cache, generating the tables that are still missing.
+    The sidecar is written last, so a partial write is never valid.
+    """
+    global _cached_tables
+
+    with _save_lock:
+        snapshot = _snapshot
+        gamma = snapshot.gamma
+        tables = {}
+        previews = {}
+        for name in list(gradients):
+            if name.startswith("^"):
+                continue
+            table = snapshot.tables.get(name)
+            preview = colormaps_preview.get(name)
+            if table is None or preview is None:
+                generated = _generate(name, gamma)
+                if generated is None:
+                    continue
+                table, preview = generated
+                _publish(name, table, preview, gamma=gamma)
+            tables[name] = table
+            previews[name] = preview
+        names = list(tables)
+
+        sources = []
+        rows = []
+        start = 0
+        for name in names:
+            if name not in _BUILTIN_NAMES:
+                gradient = np.asarray(gradients[name], dtype=np.float64)
+                sources.append([name, start, start + len(gradient)])
+                rows.append(gradient)
+                start += len(gradient)
+
+        tables_path, gradients_path, meta_path = lut_cache_paths(cache_dir)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            luts = np.concatenate([np.stack([tables[name].lut for name in names]),
+                                   np.array([previews[name] for name in names], dtype=np.uint8)], axis=1)
+            for path, array in ((tables_path, luts),
+                                (gradients_path, np.concatenate(rows) if rows else np.zeros((0, 4)))):
+                with open(path + ".tmp", "wb") as handle:
+                    np.save(handle, array)
+                os.replace(path + ".tmp", path)
+            with open(meta_path + ".tmp", "w") as handle:
+                json.dump({"source": _source_signature(data_dir), "gamma": gamma,
+                           "names": names, "sources": sources}, handle)
+            os.replace(meta_path + ".tmp", meta_path)
+        except OSError as e:
+            logger.warning(f"Could not write colormap cache: {e}")
+            return
+        _cached_tables = (gamma, tables)
+
+
 def multicolor_to_gradient(multicolor_range, multicolor):
     m = zip(multicolor_range, multicolor)
     pos_next = None
@@ -0,0 +1,505 @@
+"""
+Compiled song format for LearnMIDI.
+
+A MIDI file is compiled once into a NumPy structured array with one row per
+merged-track message (meta messages included, so row indices and the
+start_point/end_point percentages match the old mido message list):
+
+- time:     absolute time in seconds at the song's first tempo (what the learn
+            loop has always used for its delays, scaled by set_tempo)
+- clock:    time in seconds following every tempo change (notes_time, used for
+            sheet music sync in the web interface)
+- play:     time in seconds as a MIDI player plays the file, every delta
+            following tempo changes (what play_midi sends to the piano by)
+- type:     TYPE_* row kind
+- status:   raw status byte (channel messages only, notes keep their file channel)
+- note:     first data byte (note number, controller, program...)
+- velocity: second data byte (velocity, controller value...)
+- channel:  hand/track channel for notes, MIDI channel for other messages
+
+Sysex payloads do not fit a fixed-size row; they are kept by row index next to
+the array. The array is stored as Songs/cache/<song>.npy next to a small JSON
+sidecar that records the format version, the source file's mtime, size and
+SHA-1, and the sysex payloads. Loading memory-maps the .npy, so opening a
+cached song costs a header read and pages are only touched as the song is
+played.
+"""
+
+import hashlib
+import json
+import os
+
+import mido
+import numpy as np
+
+from lib.log_setup import logger
+from lib.midi_event import NoteEvent
+
+FORMAT_VERSION = 3
+
+SONG_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("clock", "<f8"),
+    ("play", "<f8"),
+    ("type", "u1"),
+    ("status", "u1"),
+    ("note", "u1"),
+    ("velocity", "u1"),
+    ("channel", "u1"),
+])
+
+TYPE_META = 0
+TYPE_NOTE_ON = 1
+TYPE_NOTE_OFF = 2
+TYPE_OTHER = 3  # Other channel message, rebuilt from its status/data bytes
+TYPE_SYSEX = 4  # Payload is kept in CompiledSong.sysex
+
+DEFAULT_TEMPO = 500000
+
+
+class MetaRow:
+    """Placeholder returned for meta rows; only is_meta and type are meaningful."""
+    __slots__ = ()
+
+    is_meta = True
+    type = "meta"
+    channel = None
+    note = None
+    velocity = 0
+
+
+META_ROW = MetaRow()
+
+
+class StepIndex:
+    """
+    Chord steps of a song, as the learn loop waits for them.
+
+    A step starts at every note row that follows a delay; the rows up to the
+    next step are played (or pressed) together. Built once per song with a few
+    array ops: the step of a row is an array lookup, and the notes of a step
+    are a slice, so the learn loop never scans rows to find a chord.
+    """
+
+    def __init__(self, events):
+        kind = events["type"]
+        channel = events["channel"]
+        is_note = (kind == TYPE_NOTE_ON) | (kind == TYPE_NOTE_OFF)
+        delay = np.diff(events["time"], prepend=0.0)
+        on = (kind == TYPE_NOTE_ON) & (events["velocity"] > 0)
+        out = kind != TYPE_META
+
+        self.boundaries = np.flatnonzero(is_note & (delay > 0))
+        self.note_on_rows = np.flatnonzero(on)
+        self.note_on_notes = events["note"][on].tolist()
+        self.note_on_channels = channel[on].tolist()
+        self.output_rows = np.flatnonzero(out)
+        self.output_channels = channel[out].tolist()
+
+        # First row of every step; rows before the first boundary are step 0
+        self.starts = np.union1d(self.boundaries, [0]) if len(events) else np.zeros(0, dtype=np.int64)
+        first = np.zeros(len(events), dtype=np.int32)
+        first[self.starts] = 1
+        self.row_step = np.cumsum(first, dtype=np.int32) - 1
+        self._ends = np.append(self.starts[1:], len(events))
+        self._on_offsets = np.searchsorted(self.note_on_rows, self._ends)
+        self._out_offsets = np.searchsorted(self.output_rows, self._ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def step_at(self, row):
+        """Step that row belongs to."""
+        return int(self.row_step[row])
+
+    def rows(self, step):
+        """Row range (start, end) of step."""
+        return int(self.starts[step]), int(self._ends[step])
+
+    def span(self, start, end):
+        """
+        Steps covering rows start..end-1, widened to whole chords.
+
+        Args:
+            start, end: Row range, as used for start_point/end_point slicing
+
+        Returns:
+            (first, last): Steps first..last-1; first == last when the range is empty
+        """
+        start = max(0, start)
+        end = min(len(self.row_step), end)
+        if end <= start:
+            return 0, 0
+        return self.step_at(start), self.step_at(end - 1) + 1
+
+    def to_press(self, step, hands):
+        """
+        Notes the user plays in step.
+
+        Args:
+            hands: 0 for both hands, otherwise the channel of the hand being learned
+
+        Returns:
+            (notes, channels): Note numbers and the hand channel of each
+        """
+        begin = self._on_offsets[step - 1] if step > 0 else 0
+        pairs = [(note, channel) for note, channel in
+                 zip(self.note_on_notes[begin:self._on_offsets[step]],
+                     self.note_on_channels[begin:self._on_offsets[step]]) if hands == 0 or channel == hands]
+        return [note for note, channel in pairs], [channel for note, channel in pairs]
+
+    def autoplay(self, step, hands, mute_hand, listen=False):
+        """
+        Rows of step the software plays for the user: the other hand's part,
+        unless it is muted, or everything in listen mode.
+
+        Returns:
+            list of row indices
+        """
+        begin = self._out_offsets[step - 1] if step > 0 else 0
+        rows = self.output_rows[begin:self._out_offsets[step]]
+        if listen:
+            return rows.tolist()
+        if hands == 1 and mute_hand != 2:
+            channel = 2
+        elif hands == 2 and mute_hand != 1:
+            channel = 1
+        else:
+            return []
+        channels = self.output_channels[begin:self._out_offsets[step]]
+        return [int(row) for row, row_channel in zip(rows, channels) if row_channel == channel]
+
+    def preview(self, start, end, exclude=()):
+        """
+        Note-on rows of the next chord from row start that has notes outside exclude.
+
+        Matches what the learn loop lights as future notes: the chord only
+        counts when another step starts before row end.
+
+        Args:
+            start, end: Row range, as used for start_point/end_point slicing
+            exclude: Notes to leave out (the notes to press right now)
+
+        Returns:
+            list of row indices, empty if there is no such chord
+        """
+        rows = self.note_on_rows
+        notes = self.note_on_notes
+        k = int(np.searchsorted(rows, start))
+        while k < len(rows) and rows[k] < end and notes[k] in exclude:
+            k += 1
+        if k == len(rows) or rows[k] >= end:
+            return []
+        b = int(np.searchsorted(self.boundaries, rows[k], side="right"))
+        if b == len(self.boundaries) or self.boundaries[b] >= end:
+            return []
+        stop = int(np.searchsorted(rows, self.boundaries[b]))
+        return [int(rows[i]) for i in range(k, stop) if notes[i] not in exclude]
+
+
+class CompiledSong:
+    def __init__(self, events, song_tempo=DEFAULT_TEMPO, ticks_per_beat=480, sysex=None):
+        """
+        Args:
+            events: Structured array with SONG_DTYPE (may be a read-only memmap)
+            song_tempo: First tempo of the song in microseconds per beat
+            ticks_per_beat: MIDI resolution of the source file
+            sysex: Dict of row index -> sysex data bytes (without the F0/F7 framing)
+        """
+        self.events = events
+        self.song_tempo = song_tempo
+        self.ticks_per_beat = ticks_per_beat
+        self.sysex = sysex if sysex is not None else {}
+        self._notes_time = None
+        self._steps = None
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def nbytes(self):
+        return self.events.nbytes
+
+    @property
+    def notes_time(self):
+        """Tempo-aware timestamps of every non-meta row, in order."""
+        if self._notes_time is None:
+            events = self.events
+            self._notes_time = np.ascontiguousarray(events["clock"][events["type"] != TYPE_META])
+        return self._notes_time
+
+    @property
+    def steps(self):
+        """StepIndex of the song, built on first use."""
+        if self._steps is None:
+            self._steps = StepIndex(self.events)
+        return self._steps
+
+    def delays(self, start, end, tempo_scale=1.0):
+        """
+        Per-row delay (seconds since the previous row) for rows start..end-1.
+
+        Args:
+            start, end: Row range, as used for start_point/end_point slicing
+            tempo_scale: Multiplier applied to every delay (100 / set_tempo)
+        """
+        start = max(0, start)
+        end = min(len(self.events), end)
+        if end <= start:
+            return np.zeros(0)
+        times = self.events["time"][max(0, start - 1):end]
+        if start == 0:
+            delays = np.diff(times, prepend=0.0)
+        else:
+            delays = np.diff(times)
+        return delays * tempo_scale
+
+    def output_rows(self):
+        """Rows sent to the piano when the song is played: every non-meta row."""
+        return np.flatnonzero(self.events["type"] != TYPE_META)
+
+    def output_message(self, idx):
+        """mido.Message for non-meta row idx, as in the file (notes on their own channel, sysex with its data)."""
+        row = self.events[idx]
+        if row["type"] == TYPE_SYSEX:
+            return mido.Message("sysex", data=self.sysex.get(int(idx), b""))
+        return self._channel_message(row)
+
+    def event(self, idx):
+        """Message-like object for row idx (NoteEvent, mido.Message or META_ROW)."""
+        return self._row_event(self.events[idx])
+
+    def iter_events(self, start=0, end=None):
+        """Yield message-like objects for rows start..end-1."""
+        if end is None:
+            end = len(self.events)
+        for row in self.events[start:end]:
+            yield self._row_event(row)
+
+    @staticmethod
+    def _row_event(row):
+        kind = row["type"]
+        if kind == TYPE_META:
+            return META_ROW
+        if kind == TYPE_NOTE_ON:
+            return NoteEvent("note_on", int(row["channel"]), int(row["note"]), int(row["velocity"]))
+        if kind == TYPE_NOTE_OFF:
+            return NoteEvent("note_off", int(row["channel"]), int(row["note"]), 0)
+        if kind == TYPE_SYSEX:
+            return mido.Message("sysex")
+        return CompiledSong._channel_message(row)
+
+    @staticmethod
+    def _channel_message(row):
+        status = int(row["status"])
+        data = [status, int(row["note"]), int(row["velocity"])]
+        # Program change and channel pressure only carry one data byte
+        if 0xC0 <= status < 0xE0:
+            data = data[:2]
+        return mido.Message.from_bytes(data)
+
+
+def get_tempo(mid):
+    """First set_tempo of the song, or the MIDI default."""
+    for msg in mid:
+        if msg.type == 'set_tempo':
+            return msg.tempo
+    return DEFAULT_TEMPO
+
+
+def compile_midi(path, progress=None):
+    """
+    Parse a MIDI file into a CompiledSong.
+
+    Note messages are assigned a channel from their track index (offset by one
+    for two-track files) so the learn loop knows which hand they belong to.
+
+    Args:
+        path: Path of the .mid file
+        progress: Optional function(stage) called with LearnMIDI loading stages (2 = Proces, 3 = Merge)
+    """
+    mid = mido.MidiFile(path, clip=True)  # clip=True fixes some midi files
+    song_tempo = get_tempo(mid)
+    ticks_per_beat = mid.ticks_per_beat
+
+    if progress:
+        progress(2)
+    offset = 1 if len(mid.tracks) == 2 else 0
+    file_status = []  # Status bytes of the note messages of each track, before the remap
+    for k, track in enumerate(mid.tracks):
+        file_status.append([])
+        for msg in track:
+            if not msg.is_meta and msg.type in ('note_on', 'note_off'):
+                file_status[k].append(msg.bytes()[0])
+                msg.channel = k + offset
+                if msg.type == 'note_off':
+                    msg.velocity = 0
+
+    if progress:
+        progress(3)
+    merged = mido.merge_tracks(mid.tracks)
+    events = np.zeros(len(merged), dtype=SONG_DTYPE)
+    sysex = {}
+    ticks = np.fromiter((msg.time for msg in merged), dtype=np.int64, count=len(merged))
+    events["time"] = mido.tick2second(1, ticks_per_beat, song_tempo) * np.cumsum(ticks)
+
+    # Merging keeps the order of each track, so its notes come out in the order of its status list
+    file_status = [iter(statuses) for statuses in file_status]
+    clock = 0.0
+    play = 0.0
+    tempo = DEFAULT_TEMPO
+    for i, msg in enumerate(merged):
+        if msg.time > 0:
+            play += mido.tick2second(msg.time, ticks_per_beat, tempo)
+        # Same arithmetic as the old notes_time loop over MidiFile, which follows
+        # tempo changes and only accumulated the delta of non-meta messages
+        if msg.time > 0 and not msg.is_meta:
+            clock += mido.tick2second(msg.time, ticks_per_beat, tempo)
+        if msg.type == 'set_tempo':
+            tempo = msg.tempo
+        row = events[i]
+        row["clock"] = clock
+        row["play"] = play
+        if msg.is_meta:
+            row["type"] = TYPE_META
+        elif msg.type == 'note_on' or msg.type == 'note_off':
+            row["type"] = TYPE_NOTE_ON if msg.type == 'note_on' else TYPE_NOTE_OFF
+            row["status"] = next(file_status[msg.channel - offset])
+            row["note"] = msg.note
+            row["velocity"] = msg.velocity
+            row["channel"] = msg.channel
+        elif msg.type == 'sysex':
+            row["type"] = TYPE_SYSEX
+            row["status"] = 0xF0
+            sysex[i] = bytes(msg.data)
+        else:
+            data = msg.bytes()
+            row["type"] = TYPE_OTHER
+            row["status"] = data[0]
+            if len(data) > 1:
+                row["note"] = data[1]
+            if len(data) > 2:
+                row["velocity"] = data[2]
+            row["channel"] = getattr(msg, "channel", 0)
+
+    return CompiledSong(events, song_tempo, ticks_per_beat, sysex)
+
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(song_name, cache_dir='Songs/cache'):
+    """Return (array_path, meta_path) of the compiled cache for a song."""
+    base = os.path.join(cache_dir, song_name)
+    return base + '.npy', base + '.json'
+
+
+def cache_files(song_name, cache_dir='Songs/cache'):
+    """All cache files that may exist for a song, including the legacy pickle."""
+    return list(cache_paths(song_name, cache_dir)) + [os.path.join(cache_dir, song_name + '.p')]
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(meta, handle)
+    os.replace(tmp_path, meta_path)
+
+
+def load_cached(song_name, songs_dir='Songs', cache_dir='Songs/cache'):
+    """
+    Memory-map the compiled cache of a song if it is still valid.
+
+    The cache is valid when it was written by this FORMAT_VERSION and the
+    source file has the same mtime and size. If only the mtime differs, the
+    SHA-1 decides (and the sidecar is refreshed when the content is unchanged).
+
+    Returns:
+        CompiledSong or None
+    """
+    array_path, meta_path = cache_paths(song_name, cache_dir)
+    source_path = os.path.join(songs_dir, song_name)
+    meta = _read_meta(meta_path)
+    if not meta or meta.get('format') != FORMAT_VERSION or not os.path.isfile(array_path):
+        return None
+
+    try:
+        stat = os.stat(source_path)
+    except OSError:
+        return None
+    if stat.st_size != meta.get('source_size'):
+        return None
+    if stat.st_mtime_ns != meta.get('source_mtime_ns'):
+        if _file_sha1(source_path) != meta.get('source_sha1'):
+            return None
+        meta['source_mtime_ns'] = stat.st_mtime_ns
+        try:
+            _write_meta(meta_path, meta)
+        except OSError as e:
+            logger.warning("Could not refresh song cache metadata: " + str(e))
+
+    events = np.load(array_path, mmap_mode='r')
+    if events.dtype != SONG_DTYPE or len(events) != meta.get('rows'):
+        return None
+    sysex = {int(row): bytes.fromhex(data) for row, data in meta.get('sysex', {}).items()}
+    return CompiledSong(events, meta['song_tempo'], meta['ticks_per_beat'], sysex)
+
+
+def save_cached(song, song_name, songs_dir='Songs', cache_dir='Songs/cache'):
+    """Write the compiled song and its version sidecar (sidecar last, so a partial write is never valid)."""
+    array_path, meta_path = cache_paths(song_name, cache_dir)
+    source_path = os.path.join(songs_dir, song_name)
+    stat = os.stat(source_path)
+
+    tmp_path = array_path + '.tmp'
+    with open(tmp_path, 'wb') as handle:
+        np.save(handle, np.ascontiguousarray(song.events))
+    os.replace(tmp_path, array_path)
+
+    _write_meta(meta_path, {
+        'format': FORMAT_VERSION,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+        'source_sha1': _file_sha1(source_path),
+        'song_tempo': song.song_tempo,
+        'ticks_per_beat': song.ticks_per_beat,
+        'rows': len(song.events),
+        'sysex': {str(row): data.hex() for row, data in song.sysex.items()},
+    })
+
+
+def load_song(song_name, songs_dir='Songs', cache_dir='Songs/cache', progress=None):
+    """
+    Load a song from its compiled cache, compiling and caching it if needed.
+
+    Returns:
+        CompiledSong (memory-mapped when it came from the cache)
+    """
+    song = load_cached(song_name, songs_dir, cache_dir)
+    if song is not None:
+        logger.info("Loading song from cache")
+        return song
+
+    logger.info("Cache not found")
+    song = compile_midi(os.path.join(songs_dir, song_name), progress)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_cached(song, song_name, songs_dir, cache_dir)
+    except OSError as e:
+        logger.warning("Could not write song cache: " + str(e))
+        return song
+    # Reopen memory-mapped so the parsed copy can be freed
+    return load_cached(song_name, songs_dir, cache_dir) or song
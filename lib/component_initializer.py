@@ -12,6 +12,7 @@ from lib.menulcd import MenuLCD
 from lib.midiports import MidiPorts
 from lib.platform import PlatformRasp, PlatformNull, Hotspot
 from lib.savemidi import SaveMIDI
+from lib.song_index import SongIndex
 from lib.usersettings import UserSettings
 
 
@@ -50,10 +51,14 @@ class ComponentInitializer:
         # Phase 5: Initialize LearnMIDI (depends on multiple components)
         self.learning = LearnMIDI(self.usersettings, self.ledsettings, self.midiports, self.ledstrip)
         
+        # Song library index, scanned in the background
+        self.song_index = SongIndex()
+        self.song_index.start()
+
         # Phase 6: Initialize MenuLCD (depends on everything)
         self.menu = MenuLCD("config/menu.xml", self.args, self.usersettings, self.ledsettings,
                             self.ledstrip, self.learning, self.saving, self.midiports,
-                            self.hotspot, self.platform)
+                            self.hotspot, self.platform, self.song_index)
         self.setup_components()
 
     def setup_components(self):
@@ -100,13 +105,15 @@ class ComponentInitializer:
             cmap.generate_colormaps(cmap.gradients, self.ledstrip.led_gamma, None)
         
         cmap.update_multicolor(self.ledsettings.multicolor_range, self.ledsettings.multicolor)
+        if not cmap.lut_cache_is_current():
+            threading.Thread(target=cmap.save_lut_cache, daemon=True).start()
 
-        t = threading.Thread(target=startup_animation, args=(self.ledstrip, self.ledsettings))
-        t.start()
+        startup_animation(self.ledstrip, self.ledsettings)
 
         self.midiports.add_instance(self.menu)
         self.ledsettings.add_instance(self.menu, self.ledstrip)
         self.saving.add_instance(self.menu)
+        self.saving.recover_journals()
         self.learning.add_instance(self.menu)
 
         self.menu.show()
@@ -0,0 +1,267 @@
+"""
+NumPy frame buffer sitting between the visualizer and the LED driver.
+
+All drawing goes into a contiguous uint32 array of packed 0xWWRRGGBB values
+(the same format Color() produces) and is pushed to the hardware driver
+once per show().
+
+Writes are tracked as a dirty span, and show() is suppressed when nothing in
+that span differs from the last frame sent to the strip. Callers can also
+open a frame (begin_frame()/commit() or ``with strip.frame():``) so that any
+number of show() requests made inside it collapse into a single transfer.
+"""
+
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def pack_rgb(red, green, blue):
+    """Pack channel arrays (or scalars) into uint32 color values."""
+    red = np.clip(red, 0, 255).astype(np.uint32)
+    green = np.clip(green, 0, 255).astype(np.uint32)
+    blue = np.clip(blue, 0, 255).astype(np.uint32)
+    return (red << 16) | (green << 8) | blue
+
+
+def unpack_rgb(packed):
+    """Split packed uint32 colors into an (N, 3) uint8 array."""
+    packed = np.asarray(packed, dtype=np.uint32)
+    rgb = np.empty(packed.shape + (3,), dtype=np.uint8)
+    rgb[..., 0] = (packed >> 16) & 0xFF
+    rgb[..., 1] = (packed >> 8) & 0xFF
+    rgb[..., 2] = packed & 0xFF
+    return rgb
+
+
+def to_packed(colors):
+    """
+    Normalize a color argument to packed uint32 form.
+
+    Accepts a packed int (as returned by Color()), an (r, g, b) tuple/list,
+    an (N, 3) array of channel values, or a uint32 array of packed values.
+    """
+    if isinstance(colors, (int, np.integer)):
+        return np.uint32(int(colors) & 0xFFFFFFFF)
+    if isinstance(colors, (tuple, list)) and len(colors) == 3 and not isinstance(colors[0], (tuple, list)):
+        return pack_rgb(colors[0], colors[1], colors[2])
+    colors = np.asarray(colors)
+    if colors.dtype == np.uint32:
+        return colors
+    if colors.ndim >= 1 and colors.shape[-1] == 3:
+        return pack_rgb(colors[..., 0], colors[..., 1], colors[..., 2])
+    return colors.astype(np.uint32)
+
+
+class FrameBuffer:
+    """
+    Pixel buffer with a PixelStrip-compatible interface plus bulk writes.
+
+    Existing code keeps calling setPixelColor()/show(); hot paths can use
+    fill(), blit() and set_masked() to update many pixels in one NumPy op.
+    """
+
+    def __init__(self, driver, num_pixels=None):
+        """
+        Args:
+            driver: rpi_ws281x PixelStrip or PixelStrip_Emu instance
+            num_pixels: Buffer length (defaults to driver.numPixels())
+        """
+        self.driver = driver
+        if num_pixels is None:
+            num_pixels = driver.numPixels()
+        self.pixels = np.zeros(int(num_pixels), dtype=np.uint32)
+        self._flushed = None
+        self._flush_lock = threading.Lock()
+        # Held while writing pixels and their dirty span, and while flush() snapshots both,
+        # so a write is either in the snapshot or still marked dirty for the next flush
+        self._write_lock = threading.Lock()
+
+        # Dirty span [lo, hi) of pixels written since the last flush
+        self._dirty_lo = 0
+        self._dirty_hi = len(self.pixels)
+        # Set when the driver needs a show() even if pixel data is unchanged (brightness/gamma)
+        self._force = True
+
+        # Frame barrier: show() calls inside an open frame are deferred until commit()
+        self._frame_depth = 0
+        self._show_pending = False
+
+        self.show_requested = 0
+        self.show_issued = 0
+        # Optional LatencyTracker notified whenever the strip is up to date after a show()
+        self.latency = None
+
+    # PixelStrip-compatible interface
+
+    def numPixels(self):
+        return len(self.pixels)
+
+    def setPixelColor(self, n, color):
+        if 0 <= n < len(self.pixels):
+            with self._write_lock:
+                self.pixels[n] = int(color) & 0xFFFFFFFF
+                if n < self._dirty_lo:
+                    self._dirty_lo = n
+                if n >= self._dirty_hi:
+                    self._dirty_hi = n + 1
+
+    def setPixelColorRGB(self, n, red, green, blue):
+        self.setPixelColor(n, (int(red) << 16) | (int(green) << 8) | int(blue))
+
+    def getPixelColor(self, n):
+        return int(self.pixels[n])
+
+    def getPixels(self):
+        return self.pixels.tolist()
+
+    def setBrightness(self, brightness):
+        self.driver.setBrightness(brightness)
+        self._force = True
+
+    def show(self):
+        """Request a show(); deferred while a frame is open, skipped if nothing changed."""
+        with self._flush_lock:
+            self.show_requested += 1
+            if self._frame_depth > 0:
+                self._show_pending = True
+                return
+        self.flush()
+
+    # Dirty tracking / frame barrier
+
+    def mark_dirty(self, start=0, end=None):
+        """Record that pixels [start, end) were written directly through self.pixels."""
+        with self._write_lock:
+            self._mark_dirty(start, end)
+
+    def _mark_dirty(self, start=0, end=None):
+        if end is None:
+            end = len(self.pixels)
+        self._dirty_lo = min(self._dirty_lo, max(0, start))
+        self._dirty_hi = max(self._dirty_hi, min(len(self.pixels), end))
+
+    def invalidate(self):
+        """Force the next show() through, e.g. after the driver's gamma table changed."""
+        self._force = True
+
+    def begin_frame(self):
+        with self._flush_lock:
+            self._frame_depth += 1
+
+    def commit(self):
+        """Close a frame opened by begin_frame() and issue one show() if any was requested."""
+        with self._flush_lock:
+            self._frame_depth = max(0, self._frame_depth - 1)
+            if self._frame_depth > 0 or not self._show_pending:
+                return
+            self._show_pending = False
+        self.flush()
+
+    @contextmanager
+    def frame(self):
+        self.begin_frame()
+        try:
+            yield self
+        finally:
+            self.commit()
+
+    def get_show_stats(self):
+        return {
+            "requested": self.show_requested,
+            "issued": self.show_issued,
+            "suppressed": self.show_requested - self.show_issued,
+        }
+
+    # Bulk interface
+
+    def fill(self, color, start=0, end=None):
+        """Set pixels [start, end) to a single color."""
+        packed = to_packed(color)
+        with self._write_lock:
+            self.pixels[start:end] = packed
+            self._mark_dirty(start, end)
+
+    def blit(self, colors, offset=0):
+        """Copy a run of colors into the buffer starting at offset, clipped to the strip."""
+        colors = np.atleast_1d(to_packed(colors))
+        start = max(0, offset)
+        end = min(len(self.pixels), offset + len(colors))
+        if start < end:
+            with self._write_lock:
+                self.pixels[start:end] = colors[start - offset:end - offset]
+                self._mark_dirty(start, end)
+
+    def set_masked(self, mask, colors):
+        """
+        Write colors where mask is True.
+
+        colors is either a single color or a full-length array, of which
+        only the masked entries are used.
+        """
+        idx = np.flatnonzero(mask)
+        if len(idx) == 0:
+            return
+        packed = to_packed(colors)
+        with self._write_lock:
+            if np.ndim(packed) == 0:
+                self.pixels[idx] = packed
+            else:
+                self.pixels[idx] = packed[idx]
+            self._mark_dirty(int(idx[0]), int(idx[-1]) + 1)
+
+    def set_indexed(self, idx, colors):
+        """Write colors (a single color or one per index) to the pixels at idx."""
+        idx = np.asarray(idx, dtype=np.intp)
+        if len(idx) == 0:
+            return
+        packed = to_packed(colors)
+        with self._write_lock:
+            self.pixels[idx] = packed
+            self._mark_dirty(int(idx.min()), int(idx.max()) + 1)
+
+    def rgb(self):
+        """Current frame as an (N, 3) uint8 array."""
+        return unpack_rgb(self.pixels)
+
+    def clear(self):
+        with self._write_lock:
+            self.pixels.fill(0)
+            self._mark_dirty()
+
+    def flush(self):
+        """Push the frame to the driver and latch it, unless nothing changed since the last one."""
+        with self._flush_lock:
+            with self._write_lock:
+                lo, hi = self._dirty_lo, self._dirty_hi
+                self._dirty_lo, self._dirty_hi = len(self.pixels), 0
+                frame = self.pixels.copy()
+            force, self._force = self._force, False
+
+            if self._flushed is None or len(self._flushed) != len(frame):
+                force = True
+                changed = np.arange(len(frame))
+            elif lo < hi:
+                changed = lo + np.flatnonzero(frame[lo:hi] != self._flushed[lo:hi])
+            else:
+                changed = frame[:0]
+
+            if len(changed) == 0 and not force:
+                if self.latency is not None:
+                    self.latency.mark_shown()
+                return False
+
+            driver = self.driver
+            if hasattr(driver, "setPixels"):
+                driver.setPixels(frame)
+            else:
+                # rpi_ws281x has no bulk setter; only touch pixels that changed
+                for i in changed.tolist():
+                    driver.setPixelColor(i, int(frame[i]))
+            self._flushed = frame
+            driver.show()
+            self.show_issued += 1
+            if self.latency is not None:
+                self.latency.mark_shown()
+            return True
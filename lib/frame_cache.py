@@ -0,0 +1,137 @@
+"""
+Frame cache for periodic animations.
+
+Some animations (see animation_frames.PERIODIC) are a pure function of time
+that repeats after a whole number of steps. For those, run_animation() replays
+frames from a cache instead of recomputing them: each step is rendered once,
+packed into a row of a (steps, N) uint32 ring (the frame buffer's own format,
+so replay needs no packing), and looked up by step afterwards.
+
+Rows are keyed by everything that changes their content (animation, strip
+length, brightness, backlight, gamma, parameter, note map). The animation
+speed is not part of the key: it only changes how fast the steps advance.
+While the step doesn't change the replay yields None, which tells the engine
+the previous frame still stands.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from lib.frame_buffer import to_packed
+
+MAX_CACHE_BYTES = 16 * 1024 * 1024
+
+
+class _Entry:
+    def __init__(self, steps, num_pixels):
+        self.rows = np.zeros((steps, num_pixels), dtype=np.uint32)
+        self.filled = np.zeros(steps, dtype=bool)
+
+
+class FrameCache:
+    """LRU store of pre-rendered periodic animation frames, bounded in bytes."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, steps, num_pixels):
+        """Entry for key, created empty (and older entries evicted) if missing."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.rows.shape == (steps, num_pixels):
+                self._entries.move_to_end(key)
+                return entry
+            entry = _Entry(steps, num_pixels)
+            self._entries[key] = entry
+            while len(self._entries) > 1 and self.nbytes() > self.max_bytes:
+                self._entries.popitem(last=False)
+            return entry
+
+    def nbytes(self):
+        return sum(entry.rows.nbytes for entry in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = FrameCache()
+
+
+def get_frame_cache():
+    """The FrameCache shared by all animations."""
+    return _cache
+
+
+def frame_key(frames, ctx):
+    """Everything besides the step that a periodic frame depends on."""
+    ledstrip = ctx.ledstrip
+    ledsettings = ctx.ledsettings
+    ledstrip.get_note_map()  # Bumps note_map_version when the geometry changed
+    return (frames.__name__, ctx.num_pixels, ctx.brightness, tuple(ctx.backlight_color()),
+            getattr(ledsettings, "backlight_brightness_percent", None),
+            getattr(ledsettings, "backlight_stopped", None),
+            getattr(ledstrip, "led_gamma", None), ctx.param, ledstrip.note_map_version)
+
+
+def cached_frames(frames, period, cache=None):
+    """
+    Wrap a periodic frame generator so it replays from the frame cache.
+
+    Args:
+        frames: Frame generator function, a pure function of t
+        period: Function(ctx) -> (steps per period, seconds per step)
+        cache: FrameCache to use (the shared one if None)
+
+    Returns:
+        Frame generator function yielding packed uint32 rows, or None while
+        the frame is unchanged
+    """
+    if cache is None:
+        cache = _cache
+
+    def replay(ctx):
+        live = None
+        entry = None
+        key = None
+        last = None
+        t, dt = yield
+        while True:
+            steps, step_seconds = period(ctx)
+            step = int(t / step_seconds) % steps if np.isfinite(step_seconds) else 0
+
+            new_key = frame_key(frames, ctx)
+            if new_key != key:
+                key = new_key
+                entry = cache.get(key, steps, ctx.num_pixels)
+                last = None
+
+            if not entry.filled[step]:
+                cache.misses += 1
+                if live is None:
+                    live = frames(ctx)
+                    next(live)
+                # Render the middle of the step, away from rounding at its edges
+                middle = (step + 0.5) * step_seconds if np.isfinite(step_seconds) else 0.0
+                try:
+                    entry.rows[step] = to_packed(live.send((middle, 0.0)))
+                except StopIteration:
+                    return
+                entry.filled[step] = True
+            elif step != last:
+                cache.hits += 1
+
+            if step == last:
+                t, dt = yield None
+            else:
+                last = step
+                t, dt = yield entry.rows[step]
+
+    replay.__name__ = frames.__name__
+    return replay
@@ -0,0 +1,79 @@
+"""
+Guide lights of learning mode.
+
+LearnMIDI describes what should be lit as layers of LED position -> packed
+color instead of drawing pixel by pixel:
+
+- step:    notes of the song as they are played (the notes to press)
+- wrong:   wrong keys the student is holding
+- hints:   dim hand hints shown after a mistake
+- preview: dim future notes of the next chord
+
+Later layers win where they overlap, which matches the order the learn loop
+used to draw them in. apply() composes the layers, compares the result with
+the frame buffer and writes only the LEDs that differ, in one show(). LEDs
+that leave every layer go back to the backlight, so finishing a step no
+longer wipes and redraws the whole strip.
+"""
+
+import numpy as np
+
+from lib.frame_buffer import to_packed
+from lib.functions import get_backlight_fill_color
+
+LAYERS = ("step", "wrong", "hints", "preview")
+
+
+class GuideLights:
+    def __init__(self, ledstrip, ledsettings):
+        self.ledstrip = ledstrip
+        self.ledsettings = ledsettings
+        self.layers = {name: {} for name in LAYERS}
+        self._lit = set()  # Positions drawn by the last apply()
+
+    def set(self, layer, position, color):
+        """Light position in layer with a packed or (r, g, b) color."""
+        self.layers[layer][position] = int(to_packed(color))
+
+    def discard(self, layer, position):
+        self.layers[layer].pop(position, None)
+
+    def clear(self, *layers):
+        """Empty the given layers, or all of them."""
+        for name in layers or LAYERS:
+            self.layers[name].clear()
+
+    def reset(self):
+        """Forget everything, after the strip was wiped by someone else."""
+        self.clear()
+        self._lit.clear()
+
+    def apply(self):
+        """
+        Draw the composed layers, changing only LEDs that differ, with a single show().
+
+        Returns:
+            int: Number of LEDs written
+        """
+        desired = {}
+        for name in LAYERS:
+            desired.update(self.layers[name])
+
+        strip = self.ledstrip.strip
+        pixels = strip.pixels
+        background = int(to_packed(get_backlight_fill_color(self.ledsettings)))
+        positions = []
+        colors = []
+        for position in self._lit.union(desired):
+            if not 0 <= position < len(pixels):
+                continue
+            color = desired.get(position, background)
+            if pixels[position] != color:
+                positions.append(position)
+                colors.append(color)
+        self._lit = set(desired)
+
+        if positions:
+            strip.set_indexed(positions, np.array(colors, dtype=np.uint32))
+            strip.show()
+        return len(positions)
@@ -0,0 +1,119 @@
+"""
+Note-to-photon latency tracking.
+
+Every note_on that lights a key carries the perf_counter timestamp taken when
+MidiPorts queued it. That timestamp is compared against three later points:
+
+- dequeue: MIDIEventProcessor pulled the message off the queue
+- color:   the color mode produced the note color
+- show:    the frame containing the key was pushed to the strip
+- handoff: same as show, only for keys pressed while an idle animation was
+           running (the animation has to stop before the key can light)
+
+Each stage keeps a rolling window of samples. Stats are served by
+/api/latency and the LCD latency screen.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+STAGES = ("dequeue", "color", "show", "handoff")
+
+# Histogram bucket upper edges in milliseconds (last bucket is open-ended)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class LatencyTracker:
+    def __init__(self, window=1024):
+        """
+        Args:
+            window: Number of recent samples kept per stage
+        """
+        self._lock = threading.Lock()
+        self._samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self._pending = []  # input timestamps of notes colored but not yet shown
+        self._pending_handoff = []
+        self._handoff_before = None  # notes queued before this time ended an idle animation
+
+    def mark_dequeued(self, input_ts, now=None):
+        self._record("dequeue", input_ts, now)
+
+    def expect_handoff(self, now=None):
+        """
+        Called when activity stopped an idle animation. The next colored note, if
+        it was queued before this call, is also recorded in the handoff stage.
+        """
+        self._handoff_before = time.perf_counter() if now is None else now
+
+    def mark_colored(self, input_ts, now=None):
+        """Record color computation and hold the note until the next show()."""
+        self._record("color", input_ts, now)
+        with self._lock:
+            self._pending.append(input_ts)
+            handoff_before, self._handoff_before = self._handoff_before, None
+            if handoff_before is not None and input_ts is not None and input_ts <= handoff_before:
+                self._pending_handoff.append(input_ts)
+
+    def mark_shown(self, now=None):
+        """Called by the frame buffer after driver.show()."""
+        if not self._pending:
+            return
+        if now is None:
+            now = time.perf_counter()
+        with self._lock:
+            pending, self._pending = self._pending, []
+            samples = self._samples["show"]
+            for input_ts in pending:
+                samples.append(max(0.0, now - input_ts))
+            if self._pending_handoff:
+                self._samples["handoff"].extend(max(0.0, now - input_ts) for input_ts in self._pending_handoff)
+                self._pending_handoff = []
+
+    def _record(self, stage, input_ts, now):
+        if input_ts is None:
+            return
+        if now is None:
+            now = time.perf_counter()
+        with self._lock:
+            self._samples[stage].append(max(0.0, now - input_ts))
+
+    def reset(self):
+        with self._lock:
+            for samples in self._samples.values():
+                samples.clear()
+            self._pending = []
+            self._pending_handoff = []
+            self._handoff_before = None
+
+    def get_stats(self):
+        """
+        Rolling latency statistics per stage, in milliseconds.
+
+        Returns:
+            dict: stage -> {count, p50, p95, p99, max, histogram}, where histogram
+                  holds sample counts per BUCKETS_MS bucket (plus one overflow bucket)
+        """
+        with self._lock:
+            snapshot = {stage: np.array(samples) * 1000 for stage, samples in self._samples.items()}
+
+        stats = {}
+        for stage, samples in snapshot.items():
+            if len(samples) == 0:
+                stats[stage] = {"count": 0, "p50": None, "p95": None, "p99": None, "max": None,
+                                "histogram": [0] * (len(BUCKETS_MS) + 1)}
+                continue
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+            counts = np.bincount(np.searchsorted(BUCKETS_MS, samples), minlength=len(BUCKETS_MS) + 1)
+            stats[stage] = {
+                "count": int(len(samples)),
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3),
+                "max": round(float(samples.max()), 3),
+                "histogram": counts.tolist(),
+            }
+        stats["buckets_ms"] = list(BUCKETS_MS)
+        return stats
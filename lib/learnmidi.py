@@ -3,17 +3,19 @@ import threading
 import time
 import json
 
-import mido
 import subprocess
 
 import os
 
-from lib.functions import clamp, fastColorWipe, find_between, get_note_position
+from lib import compiled_song
+from lib.functions import clamp, fastColorWipe, get_note_position
+from lib.guide_lights import GuideLights
+from lib.playback import PlaybackClock
 from lib.rpi_drivers import Color
 
 import numpy as np
-import pickle
 from lib.log_setup import logger
+from lib.midi_event import NoteEvent
 from lib.score_manager import ScoreManager
 from webinterface import app_state
 
@@ -32,20 +34,16 @@ score_logger.addHandler(file_handler)
 score_logger.info("Score logger initialized.")
 
 
+# Longest wait for piano input before re-checking the learning state (stop and restart also wake it)
+INPUT_WAIT_TIMEOUT = 0.5
+
+
 def find_nearest(array, target):
     array = np.asarray(array)
     idx = (np.abs(array - target)).argmin()
     return idx
 
 
-# Get midi song tempo
-def get_tempo(mid):
-    for msg in mid:  # Search for tempo
-        if msg.type == 'set_tempo':
-            return msg.tempo
-    return 500000  # If not found return default tempo
-
-
 class LearnMIDI:
     def __init__(self, usersettings, ledsettings, midiports, ledstrip):
         self.menu = None
@@ -53,6 +51,7 @@ class LearnMIDI:
         self.ledsettings = ledsettings
         self.midiports = midiports
         self.ledstrip = ledstrip
+        self.guide = GuideLights(ledstrip, ledsettings)
         
         # Initialize the score manager
 
@@ -94,11 +93,13 @@ class LearnMIDI:
         self.mute_handList = ['Off', 'Right', 'Left']
         self.hand_colorList = ast.literal_eval(usersettings.get_setting_value("hand_colorList"))
 
+        self.song = None
         self.song_tempo = 500000
         self.song_tracks = []
+        self.song_steps = None
         self.ticks_per_beat = 240
         self.is_loaded_midi = {}
-        self.is_started_midi = False
+        self._is_started_midi = False
         self.t = None
 
         self.current_idx = 0
@@ -115,6 +116,17 @@ class LearnMIDI:
         self.left_hand_mistakes = []
 
 
+    @property
+    def is_started_midi(self):
+        return self._is_started_midi
+
+    @is_started_midi.setter
+    def is_started_midi(self, value):
+        self._is_started_midi = value
+        if not value:
+            # Wake learn_midi if it is waiting for keys, so it stops right away
+            self.midiports.notify_midi_input()
+
     def add_instance(self, menu):
         self.menu = menu
 
@@ -142,6 +154,7 @@ class LearnMIDI:
 
     def restart_loop(self):
         self.awaiting_restart_loop = True
+        self.midiports.notify_midi_input()
 
     def change_start_point(self, value):
         self.start_point += 5 * value
@@ -185,23 +198,13 @@ class LearnMIDI:
             self.hand_colorL = clamp(self.hand_colorL, 0, len(self.hand_colorList) - 1)
             self.usersettings.change_setting_value("hand_colorL", self.hand_colorL)
 
-    def load_song_from_cache(self, song_path):
-        # Load song from cache
-        try:
-            if os.path.isfile('Songs/cache/' + song_path + '.p'):
-                logger.info("Loading song from cache")
-                with open('Songs/cache/' + song_path + '.p', 'rb') as handle:
-                    cache = pickle.load(handle)
-                    self.song_tempo = cache['song_tempo']
-                    self.ticks_per_beat = cache['ticks_per_beat']
-                    self.song_tracks = cache['song_tracks']
-                    self.notes_time = cache['notes_time']
-                    self.loading = 4
-                    return True
-            else:
-                return False
-        except Exception as e:
-            logger.warning(e)
+    def set_song(self, song):
+        self.song = song
+        self.song_tempo = song.song_tempo
+        self.ticks_per_beat = song.ticks_per_beat
+        self.song_tracks = song
+        self.notes_time = song.notes_time
+        self.song_steps = song.steps  # Next-chord previews; built while the song loads
 
     def load_midi(self, song_path):
         while 4 > self.loading > 0:
@@ -248,82 +251,38 @@ class LearnMIDI:
         self.is_started_midi = False  # Stop current learning song
         self.t = threading.current_thread()
 
-        # Load song from cache
-        if self.load_song_from_cache(song_path):
-            return
-        logger.info("Cache not found")
-
         try:
-            # Load the midi file
-            mid = mido.MidiFile('Songs/' + song_path, clip=True)  # clip=True fixes some midi files
-
-            # Get tempo and Ticks per beat
-            self.song_tempo = get_tempo(mid)
-            self.ticks_per_beat = mid.ticks_per_beat
-
-            # Assign Tracks to different channels before merging to know the message origin
-            self.loading = 2  # 2 = Proces
-            if len(mid.tracks) == 2:  # check if the midi file has only 2 Tracks
-                offset = 1
-            else:
-                offset = 0
-            for k in range(len(mid.tracks)):
-                for msg in mid.tracks[k]:
-                    if not msg.is_meta and msg.type in ['note_on', 'note_off']:
-                        msg.channel = k + offset
-                        if msg.type == 'note_off':
-                            msg.velocity = 0
-
-            # Merge tracks
-            self.loading = 3  # 3 = Merge
-            self.song_tracks = mido.merge_tracks(mid.tracks)
-            time_passed = 0
-            self.notes_time.clear()
-            for msg in mid:
-                if not msg.is_meta:
-                    time_passed += msg.time
-                    self.notes_time.append(time_passed)
+            song = compiled_song.load_song(song_path, progress=self.set_loading)
+            self.set_song(song)
+            logger.info("Loaded {}: {} events, {:.1f} kB".format(song_path, len(song), song.nbytes / 1024))
 
             fastColorWipe(self.ledstrip.strip, True, self.ledsettings)
-
-            # Save to cache
-            with open('Songs/cache/' + song_path + '.p', 'wb') as handle:
-                cache = {'song_tempo': self.song_tempo, 'ticks_per_beat': self.ticks_per_beat,
-                         'notes_time': self.notes_time, 'song_tracks': self.song_tracks, }
-                pickle.dump(cache, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
             self.loading = 4  # 4 = Done
         except Exception as e:
             logger.warning(e)
             self.loading = 5  # 5 = Error!
             self.is_loaded_midi.clear()
 
+    def set_loading(self, stage):
+        self.loading = stage
+
+    def send_to_playport(self, msg):
+        if isinstance(msg, NoteEvent):
+            msg = msg.to_message()
+        self.midiports.playport.send(msg)
+
     # predict future notes in MIDI messages
     def predict_future_notes(self, starting_note, ending_note, notes_to_press):
 
-        if self.show_future_notes != 1:
+        if self.show_future_notes != 1 or self.practice != 0:
             return
 
-        predicted_future_notes = []
-        current_note = starting_note
-        for msg in self.song_tracks[starting_note:ending_note]:
-            # Get time delay
-            tDelay = mido.tick2second(msg.time, self.ticks_per_beat, self.song_tempo * 100 / self.set_tempo)
-
-            if not msg.is_meta and tDelay > 0 and (
-                    msg.type == 'note_on' or msg.type == 'note_off') and predicted_future_notes and self.practice == 0:
-                self.light_up_predicted_future_notes(predicted_future_notes)
-                return
-
-            if msg.type == 'note_on' and msg.velocity > 0:
-                # make sure msg.note is not in notes_to_press list
-                if msg.note not in notes_to_press:
-                    predicted_future_notes.append(msg)
-
-            current_note += 1
+        rows = self.song_steps.preview(starting_note, ending_note, notes_to_press)
+        self.light_up_predicted_future_notes([self.song.event(row) for row in rows])
 
     def light_up_predicted_future_notes(self, notes):
         dim = 10
+        self.guide.clear("preview")
         for msg in notes:
             # Light-up LEDs with the notes to press
             if not msg.is_meta:
@@ -333,20 +292,13 @@ class LearnMIDI:
 
                     brightness = 0.5
                     brightness /= dim
-                    red, green, blue = [0, 0, 0]
                     if msg.channel == 1:
-                        # red = int(self.hand_colorList[self.hand_colorR][0] * brightness)
-                        # green = int(self.hand_colorList[self.hand_colorR][1] * brightness)
-                        # blue = int(self.hand_colorList[self.hand_colorR][2] * brightness)
                         red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorR]]
+                        self.guide.set("preview", note_position, Color(red, green, blue))
                     if msg.channel == 2:
-                        # red = int(self.hand_colorList[self.hand_colorL][0] * brightness)
-                        # green = int(self.hand_colorList[self.hand_colorL][1] * brightness)
-                        # blue = int(self.hand_colorList[self.hand_colorL][2] * brightness)
                         red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorL]]
-
-                    self.ledstrip.strip.setPixelColor(note_position, Color(red, green, blue))
-                    self.ledstrip.strip.show()
+                        self.guide.set("preview", note_position, Color(red, green, blue))
+        self.guide.apply()
 
     def handle_wrong_notes(self, wrong_notes, hand_hint_notesL, hand_hint_notesR):
 
@@ -356,25 +308,25 @@ class LearnMIDI:
         brightness = 0.05
         # loop through wrong_notes and light them up
         for msg in wrong_notes:
-            note = int(find_between(str(msg), "note=", " "))
+            note = msg.note
 
-            if "note_off" in str(msg):
+            if msg.type == "note_off":
                 velocity = 0
             else:
-                velocity = int(find_between(str(msg), "velocity=", " "))
+                velocity = msg.velocity
 
             note_position = get_note_position(note, self.ledstrip, self.ledsettings)
             if velocity > 0:
-                self.ledstrip.strip.setPixelColor(note_position, Color(255, 0, 0))
+                self.guide.set("wrong", note_position, Color(255, 0, 0))
                 self.mistakes_count += 1
                 if self.is_led_activeL == 0:
                     for expected_note in hand_hint_notesL:
                         red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.prev_hand_colorL]]
-                        self.ledstrip.strip.setPixelColor(expected_note, Color(red, green, blue))
+                        self.guide.set("hints", expected_note, Color(red, green, blue))
                 if self.is_led_activeR == 0:
                     for expected_note in hand_hint_notesR:
                         red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.prev_hand_colorR]]
-                        self.ledstrip.strip.setPixelColor(expected_note, Color(red, green, blue))
+                        self.guide.set("hints", expected_note, Color(red, green, blue))
                  
                 # Wrong note penalty
                 self.score_manager.penalize_for_wrong_note()
@@ -390,13 +342,13 @@ class LearnMIDI:
                     "last_update": self.score_manager.get_last_score_update()
                 }))
             else:
-                self.ledstrip.strip.setPixelColor(note_position, Color(0, 0, 0))
+                self.guide.discard("wrong", note_position)
 
         if self.mistakes_count > self.number_of_mistakes > 0:
             self.mistakes_count = 0
             self.restart_loop()
 
-        self.ledstrip.strip.show()
+        self.guide.apply()
 
     def learn_midi(self):
         loops_count = 0
@@ -461,235 +413,265 @@ class LearnMIDI:
             }))
             try:
                 fastColorWipe(self.ledstrip.strip, True, self.ledsettings)
-                time_prev = time.time()
-                notes_to_press = []
+                self.guide.reset()
+                steps = self.song_steps
+                times = self.song.events["time"]
 
                 start_idx = int(self.start_point * len(self.song_tracks) / 100)
                 end_idx = int(self.end_point * len(self.song_tracks) / 100)
+                # Learn whole chords: the range starts and ends on step boundaries
+                first_step, last_step = steps.span(start_idx, end_idx)
+                if first_step < last_step:
+                    start_idx, end_idx = steps.rows(first_step)[0], steps.rows(last_step - 1)[1]
 
                 # self.current_idx does not count meta messages (used for sheet music sync in web interface)
                 # absolute_idx counts all messages (used for predicting messages)
 
                 self.current_idx = start_idx
-                absolute_idx = start_idx
 
-                for msg in self.song_tracks[start_idx:end_idx]:
-                    self.midiports.last_activity = time.time()
-                    # Exit thread if learning is stopped
-                    if not self.is_started_midi:
+                clock = PlaybackClock(times, 100 / self.set_tempo)
+                clock.start(start_idx)
+                restart = False
+                for step in range(first_step, last_step):
+                    step_start, step_end = steps.rows(step)
+                    # Notes the user has to press before the song moves past this step,
+                    # and the rows the software plays for the other hand
+                    if self.practice == 0:
+                        notes_to_press, press_channels = steps.to_press(step, self.hands)
+                    else:
+                        notes_to_press, press_channels = [], []
+                    software_rows = set(steps.autoplay(step, self.hands, self.mute_hand, self.practice == 2))
+
+                    for absolute_idx in range(step_start, step_end):
+                        self.midiports.last_activity = time.time()
+                        # Exit thread if learning is stopped
+                        if not self.is_started_midi:
+                            break
+
+                        msg = self.song.event(absolute_idx)
+                        if not msg.is_meta:
+                            try:
+                                self.socket_send.append(float(self.notes_time[self.current_idx]))
+                            except Exception as e:
+                                logger.warning(e)
+
+                            self.current_idx += 1
+
+                        # Show the notes lit since the last delay (a whole chord) at once
+                        if absolute_idx > 0 and times[absolute_idx] > times[absolute_idx - 1]:
+                            self.guide.apply()
+
+                        # Follow tempo changes made while the song is being learned
+                        if clock.tempo_scale != 100 / self.set_tempo:
+                            clock.set_tempo_scale(100 / self.set_tempo, absolute_idx)
+
+                        # Wait for this message's deadline on the song timeline
+                        if not clock.wait_until(absolute_idx, lambda: self.is_started_midi):
+                            break
+
+                        # Light-up LEDs with the notes to press
+                        if not msg.is_meta:
+                            # Calculate note position on the strip and display
+                            if msg.type == 'note_on' or msg.type == 'note_off':
+                                note_position = get_note_position(msg.note, self.ledstrip, self.ledsettings)
+                                if msg.velocity == 0:
+                                    brightness = 0
+                                else:
+                                    brightness = 0.5
+
+                                red, green, blue = [0, 0, 0]
+                                if msg.channel == 1:
+                                    red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorR]]
+                                    if self.is_led_activeR == 0:
+                                        if brightness > 0:
+                                            hand_hint_notesR.append(note_position)
+                                        else:
+                                            try:
+                                                hand_hint_notesR.remove(note_position)
+                                            except ValueError:
+                                                pass  # do nothing
+                                if msg.channel == 2:
+                                    red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorL]]
+                                    if self.is_led_activeL == 0:
+                                        if brightness > 0:
+                                            hand_hint_notesL.append(note_position)
+                                        else:
+                                            try:
+                                                hand_hint_notesL.remove(note_position)
+                                            except ValueError:
+                                                pass  # do nothing
+                                if red or green or blue:
+                                    self.guide.set("step", note_position, Color(red, green, blue))
+                                else:
+                                    self.guide.discard("step", note_position)
+                                    self.guide.discard("hints", note_position)
+
+                            # Handle software's notes
+                            if absolute_idx in software_rows:
+                                if msg.type == 'sysex':
+                                    msg = self.song.output_message(absolute_idx)
+                                if notes_to_press:
+                                    # Play it once the user has pressed the notes of this step
+                                    self.pending_software_notes.append(msg)
+                                else:
+                                    # Nothing to wait for (or Listen mode): play it now
+                                    self.send_to_playport(msg)
+
+                        if self.awaiting_restart_loop:
+                            restart = True
+                            break
+
+                    if restart or not self.is_started_midi:
                         break
 
-                    # Get time delay
-                    tDelay = mido.tick2second(msg.time, self.ticks_per_beat, self.song_tempo * 100 / self.set_tempo)
+                    if notes_to_press:
+                        notes_pressed = []
+                        wrong_notes = []
+                        self.predict_future_notes(step_end, end_idx, notes_to_press)
+                        self.guide.apply()
+
+                        # Store timing information for next note
+                        tDelay = float(times[step_end] - times[step_end - 1]) * clock.tempo_scale \
+                            if step_end < len(times) else 0.0
+                        self.next_note_time = time.time() + tDelay
+                        self.next_note_delay = tDelay
+                        midi_time += tDelay
+
+                        input_seq = self.midiports.midi_input_seq
+                        while not set(notes_to_press).issubset(notes_pressed) and self.is_started_midi:
+                            if self.awaiting_restart_loop:
+                                break
+                            keys_changed = False
+                            deferred = []
+                            while self.midiports.midi_queue:
+                                queue_item = self.midiports.midi_queue.popleft()
+                                msg_in = queue_item[0]
+                                msg_timestamp = queue_item[1]
+                                # non-piano msgs (guide lights etc.) go to midifile_queue below;
+                                # while learning is running the processor doesn't drain midi_queue
+                                source = queue_item[2] if len(queue_item) >= 3 else None
+                                if source not in (None, "piano"):
+                                    deferred.append(queue_item)
+                                    continue
+                                if msg_in.type not in ("note_on", "note_off"):
+                                    continue
+
+                                note = msg_in.note
+                                keys_changed = True
+
+                                if msg_in.type == "note_off":
+                                    velocity = 0
+                                else:
+                                    velocity = msg_in.velocity
 
-                    # Check notes to press
-                    if not msg.is_meta:
-                        try:
-                            self.socket_send.append(self.notes_time[self.current_idx])
-                        except Exception as e:
-                            logger.warning(e)
+                                # check if note is NOT in the list of notes to press
+                                if note not in notes_to_press:
+                                    wrong_notes.append(msg_in)
+                                    # Clear pending software notes if wrong key is pressed
+                                    if velocity > 0:
+                                        # Count the mistake for the hand that should play the nearest note
+                                        nearest = min(range(len(notes_to_press)),
+                                                      key=lambda i: abs(notes_to_press[i] - note))
+                                        if press_channels[nearest] == 1:
+                                            self.right_hand_mistakes.append(midi_time)
+                                            score_logger.debug("right hand mistakes: %s", self.right_hand_mistakes)
+                                        if press_channels[nearest] == 2:
+                                            self.left_hand_mistakes.append(midi_time)
+                                            score_logger.debug("left hand mistakes: %s", self.left_hand_mistakes)
+                                        self.pending_software_notes.clear()
+                                    continue
+
+                                # check if note is in the list of notes to press
+                                if velocity > 0:
+                                    if note not in notes_pressed:
+                                        notes_pressed.append(note)
+
+                                        # Calculate delay from ideal hit time
+                                        current_time = time.time()
+                                        if self.next_note_time:
+                                            # Get delay in seconds
+                                            delay = current_time - self.next_note_time
+
+                                            # Add score for correct note
+                                            self.score_manager.add_score_for_correct_note(delay)
+
+                                            note_timing = (midi_time, delay)
+
+                                            score_logger.debug("midi_time" +str(midi_time))
+                                            hand = press_channels[notes_to_press.index(note)]
+                                            if hand == 1:
+                                                score_logger.debug("channel 1")
+                                                score_logger.debug("right hand timing note timimg: %s", self.right_hand_timing)
+                                                self.right_hand_timing.append(note_timing)
+                                                if delay >= self.score_manager.max_delay:
+                                                    self.delay_countR += 1
+                                            if hand == 2:
+                                                score_logger.debug("channel- 2")
+                                                score_logger.debug("left hand timing note timimg: %s", self.left_hand_timing)
+                                                self.left_hand_timing.append(note_timing)
+                                                if delay >= self.score_manager.max_delay:
+                                                    self.delay_countL += 1
+
+                                            # send score update to frontend
+                                            self.socket_send.append(json.dumps({
+                                                "type": "score_update",
+                                                "score": self.score_manager.get_score(),
+                                                "combo": self.score_manager.get_combo(),
+                                                "multiplier": self.score_manager.get_multiplier(),
+                                                "last_update": self.score_manager.get_last_score_update()
+                                            }))
 
-                        self.current_idx += 1
 
-                        if tDelay > 0 and (
-                                msg.type == 'note_on' or msg.type == 'note_off') and notes_to_press and self.practice == 0:
-                            notes_pressed = []
-                            wrong_notes = []
-                            self.predict_future_notes(absolute_idx, end_idx, notes_to_press)
 
-                            # Store timing information for next note
-                            self.next_note_time = time.time() + tDelay
-                            self.next_note_delay = tDelay
-                            midi_time += tDelay
+                                else:
+                                    try:
+                                        notes_pressed.remove(note)
+                                    except ValueError:
+                                        pass  # do nothing
 
-                            while not set(notes_to_press).issubset(notes_pressed) and self.is_started_midi:
-                                if self.awaiting_restart_loop:
-                                    break
-                                deferred = []
-                                while self.midiports.midi_queue:
-                                    queue_item = self.midiports.midi_queue.popleft()
-                                    msg_in = queue_item[0]
-                                    msg_timestamp = queue_item[1]
-                                    # non-piano msgs (guide lights etc.) go to midifile_queue below;
-                                    # while learning is running the processor doesn't drain midi_queue
-                                    source = queue_item[2] if len(queue_item) >= 3 else None
-                                    if source not in (None, "piano"):
-                                        deferred.append(queue_item)
-                                        continue
-                                    if msg_in.type not in ("note_on", "note_off"):
-                                        continue
-
-                                    note = int(find_between(str(msg_in), "note=", " "))
-
-                                    if "note_off" in str(msg_in):
-                                        velocity = 0
-                                    else:
-                                        velocity = int(find_between(str(msg_in), "velocity=", " "))
-
-                                    # check if note is NOT in the list of notes to press
-                                    if note not in notes_to_press:
-                                        wrong_notes.append(msg_in)
-                                        # Clear pending software notes if wrong key is pressed
-                                        if velocity > 0:
-                                            if msg.channel == 1:
-                                                self.right_hand_mistakes.append(midi_time)
-                                                score_logger.debug("right hand mistakes: %s", self.right_hand_mistakes)
-                                            if msg.channel == 2:
-                                                self.left_hand_mistakes.append(midi_time)
-                                                score_logger.debug("left hand mistakes: %s", self.left_hand_mistakes)
-                                            self.pending_software_notes.clear()
-                                        continue
-                                    
-                                    # check if note is in the list of notes to press
-                                    if velocity > 0:
-                                        if note not in notes_pressed:
-                                            notes_pressed.append(note)
- 
-                                            # Calculate delay from ideal hit time
-                                            current_time = time.time()
-                                            if self.next_note_time:
-                                                # Get delay in seconds
-                                                delay = current_time - self.next_note_time
-                                                
-                                                # Add score for correct note
-                                                self.score_manager.add_score_for_correct_note(delay)
-
-                                                note_timing = (midi_time, delay)
-                                               
-                                                score_logger.debug("midi_time" +str(midi_time))
-                                                if msg.channel == 1: 
-                                                    score_logger.debug("channel 1")
-                                                    score_logger.debug("right hand timing note timimg: %s", self.right_hand_timing)
-                                                    self.right_hand_timing.append(note_timing)
-                                                    if delay >= self.score_manager.max_delay:
-                                                        self.delay_countR += 1
-                                                if msg.channel == 2:
-                                                    score_logger.debug("channel- 2")
-                                                    score_logger.debug("left hand timing note timimg: %s", self.left_hand_timing)
-                                                    self.left_hand_timing.append(note_timing)
-                                                    if delay >= self.score_manager.max_delay:
-                                                        self.delay_countL += 1
-
-                                                # send score update to frontend
-                                                self.socket_send.append(json.dumps({
-                                                    "type": "score_update",
-                                                    "score": self.score_manager.get_score(),
-                                                    "combo": self.score_manager.get_combo(),
-                                                    "multiplier": self.score_manager.get_multiplier(),
-                                                    "last_update": self.score_manager.get_last_score_update()
-                                                }))
-
-
-
-                                    else:
-                                        try:
-                                            notes_pressed.remove(note)
-                                        except ValueError:
-                                            pass  # do nothing
-
-                                for item in deferred:
-                                    self.midiports.midifile_queue.append(item)
+                            for item in deferred:
+                                self.midiports.midifile_queue.append(item)
+                            if deferred:
+                                self.midiports.notify_led_input()
 
+                            if wrong_notes:
                                 self.handle_wrong_notes(wrong_notes, hand_hint_notesL, hand_hint_notesR)
                                 wrong_notes.clear()
 
+                            if keys_changed:
                                 # light up predicted future notes again in case the future note was pressed
                                 # and color was overwritten
-                                self.predict_future_notes(absolute_idx, end_idx, notes_to_press)
-                            
-                            hand_hint_notesL = []
-                            hand_hint_notesR = []
-                            # Play any pending software notes only after all required notes have been pressed
-                            if set(notes_to_press).issubset(notes_pressed) and self.pending_software_notes:
-                                for software_note in self.pending_software_notes:
-                                    self.midiports.playport.send(software_note)
-                                self.pending_software_notes.clear()
-
-                            # Turn off the pressed LEDs
-                            fastColorWipe(self.ledstrip.strip, True,
-                                          self.ledsettings)  # ideally clear only pressed notes!
-                            notes_to_press.clear()
-
-                    # Realize time delay, consider also the time lost during computation
-                    delay = max(0, tDelay - (
-                            time.time() - time_prev) - 0.003)  # 0.003 sec calibratable to account for extra time loss
-                    time.sleep(delay)
-                    time_prev = time.time()
-
-                    # Light-up LEDs with the notes to press
-                    if not msg.is_meta:
-                        # Calculate note position on the strip and display
-                        if msg.type == 'note_on' or msg.type == 'note_off':
-                            note_position = get_note_position(msg.note, self.ledstrip, self.ledsettings)
-                            if msg.velocity == 0:
-                                brightness = 0
-                            else:
-                                brightness = 0.5
-
-                            red, green, blue = [0, 0, 0]
-                            if msg.channel == 1:
-                                red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorR]]
-                                if self.is_led_activeR == 0:
-                                    if brightness > 0:
-                                        hand_hint_notesR.append(note_position)
-                                    else:
-                                        try:
-                                            hand_hint_notesR.remove(note_position)
-                                        except ValueError:
-                                            pass  # do nothing
-                            if msg.channel == 2:
-                                red, green, blue = [int(c * brightness) for c in self.hand_colorList[self.hand_colorL]]
-                                if self.is_led_activeL == 0:
-                                    if brightness > 0:
-                                        hand_hint_notesL.append(note_position)
-                                    else:
-                                        try:
-                                            hand_hint_notesL.remove(note_position)
-                                        except ValueError:
-                                            pass  # do nothing
-                            self.ledstrip.strip.setPixelColor(note_position, Color(red, green, blue))
-                            self.ledstrip.strip.show()
-                        # Save notes to press
-                        if msg.type == 'note_on' and msg.velocity > 0 and (
-                                msg.channel == self.hands or self.hands == 0):
-                            notes_to_press.append(msg.note)
-
-                        # Handle software's notes
-                        if ((
-                                self.hands == 1 and self.mute_hand != 2 and msg.channel == 2) or
-                                # Left hand notes
-                                (
-                                        self.hands == 2 and self.mute_hand != 1 and msg.channel == 1) or
-                                # Right hand notes
-                                self.practice == 2):  # Listen mode
-                            if self.practice == 2:
-                                # In Listen mode, play immediately
-                                self.midiports.playport.send(msg)
-                            else:
-                                # Check if there are any user notes to press at this moment
-                                if notes_to_press:
-                                    # If there are user notes to press, store this software note to play when user presses their key
-                                    self.pending_software_notes.append(msg)
-                                else:
-                                    # If no user notes to press, play the software note immediately
-                                    self.midiports.playport.send(msg)
-
-                    absolute_idx += 1
+                                self.predict_future_notes(step_end, end_idx, notes_to_press)
 
-                    # If we have pending software notes but no user notes to press,
-                    # and we've reached the next note's time, play and clear the pending notes
-                    if (self.pending_software_notes and not notes_to_press and
-                            self.next_note_time and time.time() >= self.next_note_time):
-                        for software_note in self.pending_software_notes:
-                            self.midiports.playport.send(software_note)
+                                if set(notes_to_press).issubset(notes_pressed):
+                                    break
+                            # Sleep until the next key press/release instead of spinning
+                            input_seq = self.midiports.wait_for_midi_input(input_seq, INPUT_WAIT_TIMEOUT)
+
+                        hand_hint_notesL = []
+                        hand_hint_notesR = []
+                        # Play the software notes of this step only after all required notes have been pressed
+                        if set(notes_to_press).issubset(notes_pressed):
+                            for software_note in self.pending_software_notes:
+                                self.send_to_playport(software_note)
                         self.pending_software_notes.clear()
-                        self.next_note_time = None
-                        self.next_note_delay = None
+
+                        # Turn off the guide lights of this step, and only those
+                        self.guide.clear()
+                        self.guide.apply()
+                        # Continue the song from here if the keys took longer than the delay
+                        if step_end < len(times):
+                            clock.realign(step_end)
 
                     if self.awaiting_restart_loop:
-                        self.awaiting_restart_loop = False
+                        restart = True
                         break
 
+                if restart:
+                    self.awaiting_restart_loop = False
+
+                self.guide.apply()
+                logger.info("Learning timing error ms: {}".format(clock.get_stats()))
 
             except Exception as e:
                 logger.warning(e)
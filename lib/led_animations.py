@@ -12,73 +12,34 @@ class AnimationInfo:
     
     def __init__(self, 
                  name: str,
-                 function: Callable,
                  display_name: str = None,
                  supports_speed: bool = False,
                  default_speed: Any = None,
                  requires_param: bool = False,
                  param_name: str = None,
-                 web_id: str = None):
+                 web_id: str = None,
+                 frames: Callable = None):
         """
         Initialize animation info.
         
         Args:
             name: Internal name (used in settings)
-            function: Animation function to call
             display_name: Human-readable name (defaults to name)
             supports_speed: Whether animation supports speed configuration
             default_speed: Default speed value
             requires_param: Whether animation requires a parameter (like chords, colormap)
             param_name: Name of the parameter if required
             web_id: ID used in web interface (defaults to lowercase name)
+            frames: Frame generator that renders the animation (see lib.animation_engine)
         """
         self.name = name
-        self.function = function
         self.display_name = display_name or name
         self.supports_speed = supports_speed
         self.default_speed = default_speed
         self.requires_param = requires_param
         self.param_name = param_name
         self.web_id = web_id or name.lower().replace(" ", "")
-    
-    def get_args(self, ledstrip, ledsettings, menu, param=None, usersettings=None):
-        """
-        Get arguments to pass to the animation function.
-        Always uses global speed from settings.
-        
-        Args:
-            ledstrip: LED strip instance
-            ledsettings: LED settings instance
-            menu: Menu instance
-            param: Optional parameter value
-            usersettings: Optional UserSettings for speed conversion
-        
-        Returns:
-            tuple: Arguments for the animation function
-        """
-        # Handle parameter-based animations first
-        if self.requires_param:
-            if param is None:
-                raise ValueError(f"Animation {self.name} requires parameter {self.param_name}")
-            # Parameter goes before standard args for some animations
-            if self.name in ("Chords", "colormap_animation"):
-                args = [param, ledstrip, ledsettings, menu]
-            else:
-                args = [ledstrip, ledsettings, menu, param]
-        else:
-            args = [ledstrip, ledsettings, menu]
-        
-        # Only add speed_ms if animation supports speed
-        if self.supports_speed:
-            # Get global speed from settings
-            if usersettings is None and hasattr(ledsettings, 'usersettings'):
-                usersettings = ledsettings.usersettings
-            
-            # Get global speed in milliseconds
-            speed_ms = get_global_speed_ms(usersettings)
-            args.append(speed_ms)
-        
-        return tuple(args)
+        self.frames = frames
 
 
 class AnimationRegistry:
@@ -179,22 +140,20 @@ class AnimationRegistry:
         if info is None:
             return False
         
-        # Get function arguments (always uses global speed)
-        try:
-            args = info.get_args(ledstrip, ledsettings, menu, param, usersettings)
-        except ValueError as e:
+        if info.requires_param and param is None:
             return False
         
-        # Set running flag
-        if is_idle:
-            menu.is_idle_animation_running = True
-        else:
-            menu.is_animation_running = True
+        # Always uses global speed
+        speed_ms = None
+        if info.supports_speed:
+            if usersettings is None and hasattr(ledsettings, 'usersettings'):
+                usersettings = ledsettings.usersettings
+            speed_ms = get_global_speed_ms(usersettings)
         
-        # Start animation in thread
-        import threading
-        menu.t = threading.Thread(target=info.function, args=args)
-        menu.t.start()
+        # Hand over to the animation worker; replaces any running animation
+        from lib.animation_controller import get_controller
+        get_controller().start(info.frames, ledstrip, ledsettings, speed_ms,
+                               param if info.requires_param else None, is_idle)
         
         return True
 
@@ -220,18 +179,14 @@ def get_registry() -> AnimationRegistry:
 def _register_all_animations(registry: AnimationRegistry):
     """
     Register all animations in the registry.
-    This function imports animation functions and registers them.
+    Each animation is a frame generator from lib.animation_frames.
     """
-    from lib.functions import (
-        theaterChase, rainbow, rainbowCycle, theaterChaseRainbow,
-        breathing, fireplace, sound_of_da_police, scanner,
-        chords, colormap_animation, wave, lava_lamp, aurora, stardust, kaleidoscope, color_ripple, fireworks
-    )
+    from lib import animation_frames
     
     # Animations with speed support
     registry.register(AnimationInfo(
         name="Rainbow",
-        function=rainbow,
+        frames=animation_frames.rainbow,
         display_name="Rainbow",
         supports_speed=True,
         default_speed="Medium"
@@ -239,7 +194,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Rainbow Cycle",
-        function=rainbowCycle,
+        frames=animation_frames.rainbow_cycle,
         display_name="Rainbow Cycle",
         supports_speed=True,
         default_speed="Medium"
@@ -247,7 +202,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Breathing",
-        function=breathing,
+        frames=animation_frames.breathing,
         display_name="Breathing",
         supports_speed=True,
         default_speed="Medium"
@@ -255,7 +210,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Theater Chase Rainbow",
-        function=theaterChaseRainbow,
+        frames=animation_frames.theater_chase_rainbow,
         display_name="Theater Chase Rainbow",
         supports_speed=True,
         default_speed="Medium"
@@ -264,7 +219,7 @@ def _register_all_animations(registry: AnimationRegistry):
     # Animations with fixed/default speed (now support speed but have defaults)
     registry.register(AnimationInfo(
         name="Theater Chase",
-        function=theaterChase,
+        frames=animation_frames.theater_chase,
         display_name="Theater Chase",
         supports_speed=True,
         default_speed=20  # wait_ms in milliseconds
@@ -272,7 +227,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Fireplace",
-        function=fireplace,
+        frames=animation_frames.fireplace,
         display_name="Fireplace",
         supports_speed=True,
         default_speed=20  # wait_ms in milliseconds
@@ -280,7 +235,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Sound of da police",
-        function=sound_of_da_police,
+        frames=animation_frames.sound_of_da_police,
         display_name="Sound of da police",
         supports_speed=True,
         default_speed=5  # wait_ms in milliseconds
@@ -288,7 +243,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Scanner",
-        function=scanner,
+        frames=animation_frames.scanner,
         display_name="Scanner",
         supports_speed=True,
         default_speed=1  # wait_ms in milliseconds
@@ -296,7 +251,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Wave",
-        function=wave,
+        frames=animation_frames.wave,
         display_name="Wave",
         supports_speed=True,
         default_speed="Medium"
@@ -304,7 +259,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Lava Lamp",
-        function=lava_lamp,
+        frames=animation_frames.lava_lamp,
         display_name="Lava Lamp",
         supports_speed=True,
         default_speed="Medium"
@@ -312,7 +267,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Aurora",
-        function=aurora,
+        frames=animation_frames.aurora,
         display_name="Aurora",
         supports_speed=True,
         default_speed="Medium"
@@ -320,7 +275,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Stardust",
-        function=stardust,
+        frames=animation_frames.stardust,
         display_name="Stardust",
         supports_speed=True,
         default_speed="Medium"
@@ -328,7 +283,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Kaleidoscope",
-        function=kaleidoscope,
+        frames=animation_frames.kaleidoscope,
         display_name="Kaleidoscope",
         supports_speed=True,
         default_speed="Medium"
@@ -336,7 +291,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Color Ripple",
-        function=color_ripple,
+        frames=animation_frames.color_ripple,
         display_name="Color Ripple",
         supports_speed=True,
         default_speed="Medium"
@@ -344,7 +299,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="Fireworks",
-        function=fireworks,
+        frames=animation_frames.fireworks,
         display_name="Fireworks",
         supports_speed=True,
         default_speed="Medium"
@@ -353,7 +308,7 @@ def _register_all_animations(registry: AnimationRegistry):
     # Animations with parameters
     registry.register(AnimationInfo(
         name="Chords",
-        function=chords,
+        frames=animation_frames.chords,
         display_name="Chords",
         supports_speed=False,
         requires_param=True,
@@ -363,7 +318,7 @@ def _register_all_animations(registry: AnimationRegistry):
     
     registry.register(AnimationInfo(
         name="colormap_animation",
-        function=colormap_animation,
+        frames=animation_frames.colormap_animation,
         display_name="Colormap",
         supports_speed=False,
         requires_param=True,
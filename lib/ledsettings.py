@@ -76,10 +76,14 @@ class LedSettings:
         self.adjacent_red = int(us.get_setting_value("adjacent_red"))
         self.adjacent_green = int(us.get_setting_value("adjacent_green"))
         self.adjacent_blue = int(us.get_setting_value("adjacent_blue"))
+        self.adjacent_radius = int(us.get_setting_value("adjacent_radius") or 1)
+        self.adjacent_falloff = us.get_setting_value("adjacent_falloff") or "Linear"
 
         self.skipped_notes = us.get_setting_value("skipped_notes")
 
         self.note_offsets = ast.literal_eval(us.get_setting_value("note_offsets"))
+        # Bumped on every note_offsets change so LedStrip knows to rebuild its note map
+        self.note_offsets_version = getattr(self, "note_offsets_version", 0) + 1
 
         self.speed_period_in_seconds = 0.8
 
@@ -133,20 +137,24 @@ class LedSettings:
     def add_note_offset(self):
         self.note_offsets.insert(0, [100, 1])
         self.usersettings.change_setting_value("note_offsets", self.note_offsets)
+        self.note_offsets_version += 1
 
     def append_note_offset(self):
         self.note_offsets.append([1, 1])
         self.usersettings.change_setting_value("note_offsets", self.note_offsets)
+        self.note_offsets_version += 1
 
     def del_note_offset(self, slot):
         del self.note_offsets[int(slot) - 1]
         self.usersettings.change_setting_value("note_offsets", self.note_offsets)
+        self.note_offsets_version += 1
 
     def update_note_offset(self, slot, data):
         pair = data.split(",")
         self.note_offsets[int(slot) - 1][0] = int(pair[0])
         self.note_offsets[int(slot) - 1][1] = int(pair[1])
         self.usersettings.change_setting_value("note_offsets", self.note_offsets)
+        self.note_offsets_version += 1
 
     def update_note_offset_lcd(self, current_choice, currentlocation, value):
         slot = int(currentlocation.replace('Offset', '')) - 1
@@ -155,6 +163,7 @@ class LedSettings:
         else:
             self.note_offsets[slot][1] += value
         self.usersettings.change_setting_value("note_offsets", self.note_offsets)
+        self.note_offsets_version += 1
 
     def addcolor(self):
         self.multicolor.append([0, 255, 0])
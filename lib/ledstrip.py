@@ -1,9 +1,36 @@
 from lib.functions import *
+import threading
+import numpy as np
 import lib.colormaps as cmap
 from lib.rpi_drivers import PixelStrip, ws
 from lib.LED_drivers import PixelStrip_Emu
+from lib.frame_buffer import FrameBuffer, pack_rgb, unpack_rgb
+from lib.latency import LatencyTracker
+from lib.pulse_pool import PulsePool
 from lib.log_setup import logger
 
+HALO_FALLOFFS = ("Flat", "Linear", "Smooth")
+
+
+def halo_kernel(radius, falloff="Linear"):
+    """
+    Weight of the adjacent-LED halo 1..radius LEDs away from a key.
+
+    Args:
+        radius: Halo radius in LEDs
+        falloff: "Flat" (constant), "Linear" or "Smooth" (raised cosine)
+
+    Returns:
+        np.ndarray: radius weights, 1.0 next to the key
+    """
+    distance = np.arange(radius, dtype=np.float64)
+    if falloff == "Flat":
+        return np.ones(radius)
+    if falloff == "Smooth":
+        return 0.5 + 0.5 * np.cos(np.pi * distance / radius)
+    return 1.0 - distance / radius
+
+
 class LedStrip:
     def __init__(self, usersettings, ledsettings, driver="rpi_ws281x"):
         self.usersettings = usersettings
@@ -26,6 +53,13 @@ class LedStrip:
 
         self.current_fps = 0
 
+        # MIDI note -> LED lookup, rebuilt by get_note_map() when strip geometry or note offsets change
+        self.note_map = None
+        self.note_spans = None
+        self.note_map_version = 0
+        self._note_map_key = None
+        self.latency = LatencyTracker()
+
         # LED strip configuration:
         #self.LED_COUNT = int(self.led_number)  # Number of LED pixels.
         # Read LED pin and channel from settings, with fallback to defaults
@@ -48,50 +82,174 @@ class LedStrip:
         self.init_strip()
 
     def init_strip(self):
-        self.keylist = [0] * self.led_number
-        self.keylist_status = [0] * self.led_number
-        self.keylist_color = [0] * self.led_number
-        self.keylist_sustained = [0] * self.led_number  # Track notes sustained by pedal
-        self.keylist_external_software = [0] * self.led_number  # Track LEDs lit by external software (channels 11/12)
-        self.active_pulses = [] # For Pulse mode
-
+        self.reset_key_state()
+        self.pulses = PulsePool()  # For Pulse mode
 
+        driver = None
         if self.driver == "rpi_ws281x":
             try:
                 # Create NeoPixel object with appropriate configuration.
-                self.strip = PixelStrip(int(self.led_number), self.LED_PIN, self.LED_FREQ_HZ, self.LED_DMA, self.LED_INVERT,
-                                            int(self.brightness), self.LED_CHANNEL, ws.WS2811_STRIP_GRB)
+                driver = PixelStrip(int(self.led_number), self.LED_PIN, self.LED_FREQ_HZ, self.LED_DMA, self.LED_INVERT,
+                                    int(self.brightness), self.LED_CHANNEL, ws.WS2811_STRIP_GRB)
                 # Intialize the library (must be called once before other functions).
-                self.strip.begin()
-                if "releaseGIL" in dir(self.strip):
-                    self.strip.releaseGIL()
-                self.change_gamma(self.led_gamma)
+                driver.begin()
+                if "releaseGIL" in dir(driver):
+                    driver.releaseGIL()
             except Exception as e:
                 logger.warning(e)
 
-                if isinstance(e, RuntimeError):
+                if isinstance(e, RuntimeError) and driver is not None:
                     # rpi_ws281x registers _cleanup() atexit, but if it's not initialized ws2811_fini will segfault.
                     # Manually clean up memory, then bypass _cleanup() using knowledge that _cleanup() checks _leds first
                     logger.info("Cleaning up ws281x instance.")
-                    ws.delete_ws2811_t(self.strip._leds)
-                    self.strip._leds = None
+                    ws.delete_ws2811_t(driver._leds)
+                    driver._leds = None
 
                 logger.info("Failed to load LED strip.  Using emu driver.")
-                self.strip = PixelStrip_Emu(int(self.led_number))
+                driver = None
                 self.driver = "emu"
-        elif self.driver == "emu":
-            self.strip = PixelStrip_Emu(int(self.led_number))
 
+        if driver is None:
+            driver = PixelStrip_Emu(int(self.led_number))
+
+        # All drawing goes through the frame buffer, which pushes to the driver once per show()
+        self.strip = FrameBuffer(driver, int(self.led_number))
+        self.strip.latency = self.latency
+
+        if self.driver == "rpi_ws281x":
+            self.change_gamma(self.led_gamma)
+
+
+    def reset_key_state(self):
+        """(Re)allocate per-LED key state as NumPy arrays, all keys released."""
+        n = int(self.led_number)
+        self.keylist = np.zeros(n)  # Key strength: 0 off, ~1000 lit, 1001 held in Fading mode
+        self.keylist_status = np.zeros(n, dtype=np.uint8)  # 1 while the key is pressed
+        self.keylist_color = np.zeros((n, 3))  # Base note color (r, g, b)
+        self.keylist_sustained = np.zeros(n, dtype=np.uint8)  # Track notes sustained by pedal
+        self.keylist_external_software = np.zeros(n, dtype=np.uint8)  # Track LEDs lit by external software (channels 11/12)
+
+        # Occupancy (pressed, lit/fading or sustained) and the derived mask of LEDs animations may draw on
+        self.key_occupied = np.zeros(n, dtype=bool)
+        self.overwrite_mask = np.ones(n, dtype=bool)
+        self._mask_radius = 0
+        self.occupancy_version = getattr(self, "occupancy_version", 0) + 1
+
+        # LEDs apply_halo() drew last frame and the colors it drew
+        self._halo_mask = np.zeros(n, dtype=bool)
+        self._halo_colors = np.zeros(n, dtype=np.uint32)
+        self._halo_inputs = None
+
+    def adjacent_radius(self):
+        """Number of LEDs each side of a key that its adjacent colors may light."""
+        if self.ledsettings.adjacent_mode == "Off":
+            return 0
+        return max(1, int(getattr(self.ledsettings, "adjacent_radius", 1)))
+
+    def update_occupancy(self, positions=None):
+        """
+        Refresh key_occupied after the key state of some LEDs changed.
+
+        Only the LEDs within the adjacent radius of a changed position are
+        recomputed in overwrite_mask, so a note on/off costs O(radius).
+
+        Args:
+            positions: LED index or array of indices whose keylist/status/sustained
+                       changed, or None to rebuild everything
+        """
+        if positions is None:
+            self.key_occupied[:] = (self.keylist != 0) | (self.keylist_status != 0) | (self.keylist_sustained != 0)
+            self._rebuild_overwrite_mask(0, len(self.key_occupied))
+            return
+
+        idx = np.atleast_1d(np.asarray(positions, dtype=np.intp))
+        occupied = (self.keylist[idx] != 0) | (self.keylist_status[idx] != 0) | (self.keylist_sustained[idx] != 0)
+        flipped = idx[occupied != self.key_occupied[idx]]
+        if len(flipped) == 0:
+            return
+        self.key_occupied[idx] = occupied
+        r = self._mask_radius
+        for p in flipped:
+            self._rebuild_overwrite_mask(p - r, p + r + 1)
+
+    def _rebuild_overwrite_mask(self, lo, hi):
+        """Recompute overwrite_mask[lo:hi]: free when no occupied LED is within the radius."""
+        n = len(self.key_occupied)
+        r = self._mask_radius
+        lo, hi = max(0, lo), min(n, hi)
+        a, b = max(0, lo - r), min(n, hi + r)
+        counts = np.concatenate(([0], np.cumsum(self.key_occupied[a:b])))
+        i = np.arange(lo, hi)
+        nearby = counts[np.minimum(b, i + r + 1) - a] - counts[np.maximum(a, i - r) - a]
+        self.overwrite_mask[lo:hi] = nearby == 0
+        self.occupancy_version += 1
+
+    def get_overwrite_mask(self):
+        """
+        Mask of LEDs that animations and the idle backlight may draw on.
+
+        Returns:
+            np.ndarray: bool per LED, False for keys in use and their adjacent LEDs
+        """
+        radius = self.adjacent_radius()
+        if radius != self._mask_radius:
+            self._mask_radius = radius
+            self._rebuild_overwrite_mask(0, len(self.key_occupied))
+        return self.overwrite_mask
+
+    def get_note_map(self):
+        """
+        128-entry MIDI note -> LED index table.
+
+        Rebuilt only when shift, reverse, leds_per_meter, led count or note offsets
+        change; note_map_version is bumped on every rebuild so consumers can cache
+        derived data.
+
+        Returns:
+            np.ndarray: int32 LED index per MIDI note
+        """
+        key = (self.shift, self.reverse, self.leds_per_meter, self.led_number,
+               self.ledsettings.note_offsets_version)
+        if key != self._note_map_key:
+            self._build_note_map(key)
+        return self.note_map
+
+    def get_note_span(self, note):
+        """LED range [start, end) covered by a note; wider than one LED on dense strips."""
+        self.get_note_map()
+        start, end = self.note_spans[note]
+        return int(start), int(end)
+
+    def _build_note_map(self, key):
+        notes = np.arange(129)
+        positions = compute_note_positions(notes, self.led_number, self.leds_per_meter, self.shift, self.reverse,
+                                           self.ledsettings.note_offsets)
+        note_map = positions[:128]
+
+        # Each note owns the LEDs up to where the next note starts
+        start = np.minimum(positions[:128], positions[1:])
+        end = np.maximum(positions[:128], positions[1:])
+        end = np.maximum(end, start + 1)
+        spans = np.stack((start, end), axis=1)
+        np.clip(spans, 0, self.led_number, out=spans)
+
+        self.note_map = note_map
+        self.note_spans = spans
+        self._note_map_key = key
+        self.note_map_version += 1
 
     def change_gamma(self, value):
         self.led_gamma = float(value)
         if 0.01 <= self.led_gamma <= 10.0:
             if self.driver == "rpi_ws281x":
                 # rpi_ws281x.py interface has no ported method to set gamma by factor, using direct ws
-                ws.ws2811_set_custom_gamma_factor(self.strip._leds, self.led_gamma)
+                ws.ws2811_set_custom_gamma_factor(self.strip.driver._leds, self.led_gamma)
+                self.strip.invalidate()
 
-            # Rebuild colormaps
+            # Rebuild colormaps and keep the LUT cache in step for the next start
             cmap.generate_colormaps(cmap.gradients, self.led_gamma)
+            if not cmap.lut_cache_is_current():
+                threading.Thread(target=cmap.save_lut_cache, daemon=True).start()
 
     def change_brightness(self, value, ispercent=False):
         if ispercent:
@@ -131,15 +289,80 @@ class LedStrip:
         self.reverse = clamp(self.reverse, 0, 1)
         self.usersettings.change_setting_value("reverse", self.reverse)
 
-    def set_adjacent_colors(self, note, color, led_turn_off, fading=1):
-        if self.ledsettings.adjacent_mode == "RGB" and color != 0 and led_turn_off is not True:
-            color = Color(int(self.ledsettings.adjacent_red * fading), int(self.ledsettings.adjacent_green * fading),
-                          int(self.ledsettings.adjacent_blue * fading))
-        if self.ledsettings.adjacent_mode != "Off":
+    def apply_halo(self, idle_color=None):
+        """
+        Draw the adjacent-LED halo around every lit key, as one pass over the frame.
+
+        Each LED within adjacent_radius of a key takes the key's color ("Main") or
+        the adjacent color scaled by the key's fade ("RGB"), weighted by the falloff
+        kernel; overlapping halos keep the brighter value. Halos don't cover keys
+        in use and stop before a pressed key, so the LED between two pressed keys
+        stays idle. LEDs that left the halo get idle_color back, unless something
+        else drew on them since.
+
+        Args:
+            idle_color: Packed color for LEDs leaving the halo, the backlight color if None
+
+        Returns:
+            bool: True if any pixel changed
+        """
+        occupied = self.key_occupied
+        n = len(occupied)
+        previous = self._halo_mask
+        radius = self.adjacent_radius()
+        active = radius > 0 and occupied.any()
+        if not active and not previous.any():
+            return False
+
+        ledsettings = self.ledsettings
+        pixels = self.strip.pixels
+        if idle_color is None:
+            idle_color = get_backlight_fill_color(ledsettings)
+        falloff = getattr(ledsettings, "adjacent_falloff", "Linear")
+        sources = np.flatnonzero(occupied) if active else np.zeros(0, dtype=np.intp)
+        source_colors = pixels[sources]
+
+        # Nothing to do while the keys, their colors and the settings stay the same
+        inputs = (self.occupancy_version, ledsettings.adjacent_mode, radius, falloff, ledsettings.adjacent_red,
+                  ledsettings.adjacent_green, ledsettings.adjacent_blue, int(idle_color), source_colors.tobytes(),
+                  self.keylist[sources].tobytes(), self.keylist_status[sources].tobytes())
+        if inputs == self._halo_inputs and np.array_equal(pixels[previous], self._halo_colors[previous]):
+            return False
+        self._halo_inputs = inputs
+
+        halo = np.zeros(n, dtype=bool)
+        best = np.zeros((n, 3))
+        if active:
+            if ledsettings.adjacent_mode == "RGB":
+                strength = self.keylist[sources]
+                fade = np.where(strength > 0, np.minimum(strength / 1000.0, 1.0), 1.0)
+                rgb = np.outer(fade, (ledsettings.adjacent_red, ledsettings.adjacent_green, ledsettings.adjacent_blue))
+                rgb[source_colors == 0] = 0
+            else:
+                rgb = unpack_rgb(source_colors).astype(np.float64)
+
+            status = self.keylist_status
+            for distance, weight in enumerate(halo_kernel(radius, falloff), 1):
+                for step in (distance, -distance):
+                    target = sources + step
+                    beyond = target + (1 if step > 0 else -1)
+                    ok = (beyond >= 0) & (beyond < n)
+                    ok[ok] = (status[beyond[ok]] == 0) & ~occupied[target[ok]]
+                    target = target[ok]  # Unique for a given step
+                    best[target] = np.maximum(best[target], rgb[ok] * weight)
+                    halo[target] = True
+
+        colors = pack_rgb(best[:, 0], best[:, 1], best[:, 2])
+        released = previous & ~halo & ~occupied & (pixels == self._halo_colors)
 
-            if 1 < note < (self.led_number - 2):
-                if self.keylist_status[int(note) + 2] == 0:
-                    self.strip.setPixelColor(int(note) + 1, color)
+        new = pixels.copy()
+        new[halo] = colors[halo]
+        new[released] = idle_color
+        self._halo_mask = halo
+        self._halo_colors = np.where(halo, colors, 0).astype(np.uint32)
 
-                if self.keylist_status[int(note) - 2] == 0:
-                    self.strip.setPixelColor(int(note) - 1, color)
+        changed = np.flatnonzero(new != pixels)
+        if len(changed) == 0:
+            return False
+        self.strip.set_indexed(changed, new[changed])
+        return True
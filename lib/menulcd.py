@@ -8,6 +8,8 @@ from lib import LCD_Config, LCD_1in44, LCD_1in3
 from lib.functions import *
 from lib.rpi_drivers import GPIO
 import lib.colormaps as cmap
+from lib.animation_controller import get_controller
+from lib.playback import get_player
 from lib.log_setup import logger
 
 
@@ -50,12 +52,12 @@ class UITheme:
 
 
 class MenuLCD:
-    def __init__(self, xml_file_name, args, usersettings, ledsettings, ledstrip, learning, saving, midiports, hotspot, platform):
+    def __init__(self, xml_file_name, args, usersettings, ledsettings, ledstrip, learning, saving, midiports, hotspot, platform,
+                 song_index=None):
         self.list_count = None
         self.parent_menu = None
         self.current_choice = None
         self.draw = None
-        self.t = None
         self.usersettings = usersettings
         self.ledsettings = ledsettings
         self.ledstrip = ledstrip
@@ -64,6 +66,8 @@ class MenuLCD:
         self.midiports = midiports
         self.hotspot = hotspot
         self.platform = platform
+        self.song_index = song_index
+        self._songs_version = None
         self.args = args
         self._font_cache = {}
         self._title_image_cache = {}
@@ -143,8 +147,6 @@ class MenuLCD:
         self.current_animation_param = None
         self.was_idle_animation = False
         self.last_activity = time.time()
-        self.is_idle_animation_running = False
-        self.is_animation_running = False
         
         # Track current animation for speed change restart
         self.current_animation_name = None
@@ -175,6 +177,25 @@ class MenuLCD:
             self.menu_title_image = None
             logger.debug(f"Failed to load menu title PNG: {e}")
 
+    # Animation state lives in the animation controller; clearing a flag stops that kind of animation
+    @property
+    def is_animation_running(self):
+        return get_controller().is_running(idle=False)
+
+    @is_animation_running.setter
+    def is_animation_running(self, value):
+        if not value:
+            get_controller().stop(idle=False, wait=False)
+
+    @property
+    def is_idle_animation_running(self):
+        return get_controller().is_running(idle=True)
+
+    @is_idle_animation_running.setter
+    def is_idle_animation_running(self, value):
+        if not value:
+            get_controller().stop(idle=True, wait=False)
+
 
     def _parse_color(self, color_str):
             """Parse 'R,G,B', '#RRGGBB', color names, or 'Default Grey'. Fallback to #27272a."""
@@ -328,6 +349,15 @@ class MenuLCD:
             self.screensaver_settings[setting] = "1"
 
     def update_songs(self):
+        if self.song_index is not None:
+            songs_list = self.song_index.list_names()
+            # Nothing to rebuild if the library did not change since the last call
+            if self.song_index.version == self._songs_version:
+                return
+            self._songs_version = self.song_index.version
+        else:
+            songs_list = os.listdir("Songs")
+
         # Assume the first node is "Choose song"
         replace_node = self.DOMTree.getElementsByTagName("Play_MIDI")[0]
         choose_song_mc = self.DOMTree.createElement("Play_MIDI")
@@ -340,8 +370,7 @@ class MenuLCD:
         load_song_mc.appendChild(self.DOMTree.createTextNode(""))
         load_song_mc.setAttribute("text", "Load song")
         replace_node.parentNode.replaceChild(load_song_mc, replace_node)
-        
-        songs_list = os.listdir("Songs")
+
         for song in songs_list:
             # List of songs for Play_MIDI
             element = self.DOMTree.createElement("Choose_song")
@@ -1362,6 +1391,26 @@ class MenuLCD:
         self.LCD.LCD_ShowImage(self.rotate_image(self.image), 0, 0)
         LCD_Config.Driver_Delay_ms(delay)
 
+    def render_latency(self, stats, delay=5000):
+        """Debug screen: note-to-photon latency per stage (p50/p95 in ms)."""
+        self.image = Image.new("RGB", (self.LCD.width, self.LCD.height), self.background_color)
+        self.draw = ImageDraw.Draw(self.image)
+        self.draw.text((self.scale(3), self.scale(5)), "Latency ms p50/p95", fill=self.text_color, font=self.font)
+        y = 25
+        for stage in ("dequeue", "color", "show", "handoff"):
+            stage_stats = stats.get(stage, {})
+            if stage_stats.get("count"):
+                value = "{:.1f}/{:.1f}".format(stage_stats["p50"], stage_stats["p95"])
+            else:
+                value = "--"
+            self.draw.text((self.scale(3), self.scale(y)), stage.capitalize(), fill=self.text_color, font=self.font)
+            self.draw.text((self.scale(60), self.scale(y)), value, fill=self.text_color, font=self.font)
+            y += 15
+        count = stats.get("show", {}).get("count", 0)
+        self.draw.text((self.scale(3), self.scale(y + 5)), "Notes: " + str(count), fill=self.text_color, font=self.font)
+        self.LCD.LCD_ShowImage(self.rotate_image(self.image), 0, 0)
+        LCD_Config.Driver_Delay_ms(delay)
+
     def render_screensaver(self, hour, date, cpu, cpu_average, ram, temp, cpu_history=None, upload=0, download=0,
                            card_space=None, local_ip="0.0.0.0"):
         if cpu_history is None:
@@ -1489,9 +1538,7 @@ class MenuLCD:
 
         # Play MIDI
         if location == "Choose_song":
-            self.saving.t = threading.Thread(target=play_midi, args=(choice, self.midiports, self.saving, self,
-                                                                     self.ledsettings, self.ledstrip))
-            self.saving.t.start()
+            get_player().play(choice, self.midiports, self.saving, self, self.ledsettings, self.ledstrip)
         if location == "Play_MIDI":
             if choice == "Save MIDI":
                 now = datetime.datetime.now()
@@ -1506,7 +1553,7 @@ class MenuLCD:
                 self.render_message("Recording canceled", "", 2000)
                 self.saving.cancel_recording()
             if choice == "Stop playing":
-                self.saving.is_playing_midi.clear()
+                get_player().stop()
                 self.render_message("Playing stopped", "", 2000)
                 fastColorWipe(self.ledstrip.strip, True, self.ledsettings)
 
@@ -1626,7 +1673,6 @@ class MenuLCD:
                 self.render_message("MIDI Mode", "Learning", 1500)
 
         if location == "LED_animations":
-            self.is_animation_running = True
             from lib.led_animations import get_registry
             registry = get_registry()
             
@@ -1686,13 +1732,7 @@ class MenuLCD:
                 self.usersettings.change_setting_value("led_animation_speed", speed_value)
                 # Restart animation if running
                 if (self.is_animation_running or self.is_idle_animation_running) and self.current_animation_name:
-                    # Stop current animation
-                    self.is_animation_running = False
-                    self.is_idle_animation_running = False
-                    import time
-                    time.sleep(0.2)
-                    
-                    # Restart with new speed
+                    # Restart with new speed (replaces the running animation within a frame)
                     is_idle = self.was_idle_animation
                     registry.start_animation(
                         name=self.current_animation_name,
@@ -1714,6 +1754,8 @@ class MenuLCD:
         if location == "Other_Settings":
             if choice == "System Info":
                 screensaver(self, self.midiports, self.saving, self.ledstrip, self.ledsettings)
+            if choice == "Latency":
+                self.render_latency(self.ledstrip.latency.get_stats())
 
         if location == "Cycle_colors":
             choice = 1 if choice == "Enable" else 0
@@ -1973,10 +2015,6 @@ class MenuLCD:
                     if (self.is_animation_running or self.is_idle_animation_running) and self.current_animation_name:
                         from lib.led_animations import get_registry
                         registry = get_registry()
-                        self.is_animation_running = False
-                        self.is_idle_animation_running = False
-                        import time
-                        time.sleep(0.2)
                         is_idle = self.was_idle_animation
                         registry.start_animation(
                             name=self.current_animation_name,
@@ -0,0 +1,79 @@
+"""
+Compact internal MIDI event.
+
+MidiPorts converts incoming mido messages once, at enqueue time, into NoteEvent
+objects. Downstream code (MIDIEventProcessor, LearnMIDI, color modes, SaveMIDI)
+reads plain attributes instead of formatting the message with str() and
+substring-searching it. NoteEvent exposes the same attribute names as
+mido.Message, so code written against mido messages keeps working.
+"""
+
+import mido
+
+# Message types that get a NoteEvent; everything else stays a mido.Message
+EVENT_TYPES = ("note_on", "note_off", "control_change")
+
+
+class NoteEvent:
+    __slots__ = ("type", "channel", "note", "velocity", "control", "value", "time")
+
+    is_meta = False
+
+    def __init__(self, type, channel=0, note=0, velocity=0, control=0, value=0, time=0):
+        self.type = type
+        self.channel = channel
+        self.note = note
+        self.velocity = velocity
+        self.control = control
+        self.value = value
+        self.time = time
+
+    @classmethod
+    def from_message(cls, msg):
+        if msg.type == "control_change":
+            return cls("control_change", msg.channel, control=msg.control, value=msg.value, time=msg.time)
+        return cls(msg.type, msg.channel, msg.note, msg.velocity, time=msg.time)
+
+    @property
+    def is_note_off(self):
+        return self.type == "note_off" or (self.type == "note_on" and self.velocity == 0)
+
+    def to_message(self):
+        """Convert back to a mido.Message (e.g. for sending to a port)."""
+        if self.type == "control_change":
+            return mido.Message("control_change", channel=self.channel, control=self.control, value=self.value,
+                                time=self.time)
+        return mido.Message(self.type, channel=self.channel, note=self.note, velocity=self.velocity, time=self.time)
+
+    def copy(self, **overrides):
+        event = NoteEvent(self.type, self.channel, self.note, self.velocity, self.control, self.value, self.time)
+        for key, value in overrides.items():
+            setattr(event, key, value)
+        return event
+
+    def __eq__(self, other):
+        if isinstance(other, NoteEvent):
+            return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __str__(self):
+        # Same text as str(mido.Message), which MIDI logging and the web UI expect
+        if self.type == "control_change":
+            return "control_change channel={} control={} value={} time={}".format(
+                self.channel, self.control, self.value, self.time)
+        return "{} channel={} note={} velocity={} time={}".format(
+            self.type, self.channel, self.note, self.velocity, self.time)
+
+    def __repr__(self):
+        return "NoteEvent({})".format(self)
+
+
+def to_event(msg):
+    """Return a NoteEvent for note/control messages, or msg unchanged otherwise."""
+    if isinstance(msg, NoteEvent):
+        return msg
+    if getattr(msg, "type", None) in EVENT_TYPES:
+        return NoteEvent.from_message(msg)
+    return msg
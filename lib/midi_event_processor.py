@@ -1,8 +1,9 @@
 import time
 
+import numpy as np
 from rpi_ws281x import Color
 
-from lib.functions import get_note_position, find_between
+from lib.animation_controller import get_controller
 from lib.log_setup import logger
 
 # Import app_state to check practice_active flag
@@ -65,7 +66,7 @@ class MIDIEventProcessor:
         handle_note_off = self.handle_note_off
         handle_note_on = self.handle_note_on
         handle_control_change = self.handle_control_change
-        get_position = get_note_position
+        note_map = ledstrip.get_note_map()
         led_count = ledstrip.led_number
 
         # Process a bounded slice per frame to avoid jitter and keep FPS stable
@@ -85,7 +86,10 @@ class MIDIEventProcessor:
                 return item[0], item[1], item[2]
             return item[0], item[1], None
 
-        def _process_one(msg, msg_timestamp, source=None):
+        latency = ledstrip.latency
+        animations = get_controller()
+
+        def _process_one(msg, msg_timestamp, source=None, dequeue_ts=None):
             # piano/computer already logged in MidiPorts
             if (
                 midi_logging_enabled
@@ -116,7 +120,7 @@ class MIDIEventProcessor:
             )
 
             if ledsettings.mode != "Disabled" and msg_type in ("note_on", "note_off"):
-                note_position = get_position(msg.note, ledstrip, ledsettings)
+                note_position = int(note_map[msg.note])
                 if 0 <= note_position < led_count:
                     if msg_type == "note_off" or velocity == 0:
                         handle_note_off(msg, msg_timestamp, note_position)
@@ -126,6 +130,10 @@ class MIDIEventProcessor:
                             if saving.is_recording:
                                 saving.add_track("note_on", msg.note, velocity, msg_timestamp)
                         else:
+                            latency.mark_dequeued(msg_timestamp, dequeue_ts)
+                            if animations.stop_for_key():
+                                # Key pressed during an idle animation or the startup fade: released within a frame
+                                latency.expect_handoff()
                             handle_note_on(msg, msg_timestamp, note_position)
             elif msg_type == "control_change":
                 handle_control_change(msg, msg_timestamp)
@@ -141,6 +149,7 @@ class MIDIEventProcessor:
         midipending = midiports.midipending
         while midipending and processed < 512 and (time.perf_counter() - t0) < 0.003:
             head_msg, head_ts, head_source = _unpack_queue_item(midipending.popleft())
+            dequeue_ts = time.perf_counter()
             burst = [(head_msg, head_ts, head_source)]
             # Coalesce a small burst of messages with almost the same timestamp
             while midipending and len(burst) < BURST_LIMIT:
@@ -154,7 +163,7 @@ class MIDIEventProcessor:
             # Notes first (reduce visual latency for chords), then others
             for m, ts, src in burst:
                 if getattr(m, "type", None) in ("note_on", "note_off"):
-                    _process_one(m, ts, src)
+                    _process_one(m, ts, src, dequeue_ts)
                     processed += 1
                     if processed >= 512:
                         break
@@ -179,17 +188,15 @@ class MIDIEventProcessor:
             msg_timestamp: Timestamp when the message was received
             note_position: Position on the LED strip corresponding to the note
         """
-        # Extract channel from message to check if it's from external software
-        channel = find_between(str(msg), "channel=", " ")
-        # Strip trailing commas (mido message format: "channel=12, note=60...")
-        channel = channel.rstrip(',') if channel else False
+        # Channel tells whether the message comes from external software (11/12)
+        channel = msg.channel
         
         # Clear external software tracking flag if external software turns off the LED
         # Allow local piano input to also turn off LEDs even if they were lit by external software
         # This is essential for learning mode where Synthesia lights the LED (channels 11/12)
         # but the user's piano (channel 0) should be able to turn it off
         if self.ledstrip.keylist_external_software[note_position] == 1:
-            if channel == "12" or channel == "11":
+            if channel == 12 or channel == 11:
                 # External software is turning off the LED - clear tracking
                 self.ledstrip.keylist_external_software[note_position] = 0
         
@@ -213,17 +220,15 @@ class MIDIEventProcessor:
                 # Standard mode - full brightness while key is pressed
                 self.ledstrip.keylist[note_position] = 0
             elif self.ledsettings.mode == "Pulse":
-                # Find the active pulse for this note and trigger release
-                for pulse in self.ledstrip.active_pulses:
-                    if pulse["position"] == note_position and pulse.get("state") != "release":
-                        pulse["state"] = "release"
-                        pulse["release_time"] = time.perf_counter()
-                        # Keep the pulse active in the list so led_effects_processor handles the animation
-                        # We don't set keylist to 0 because the pulse effect handles the LED status
+                # Release the held pulse of this note; led_effects_processor animates it out
+                # We don't set keylist to 0 because the pulse effect handles the LED status
+                self.ledstrip.pulses.release(note_position, time.perf_counter())
             elif self.ledsettings.mode == "Pedal":
                 # Gradually reduce brightness based on pedal settings
                 self.ledstrip.keylist[note_position] *= (100 - self.ledsettings.fadepedal_notedrop) / 100
 
+        self.ledstrip.update_occupancy(note_position)
+
         # If LED is completely off, set appropriate color
         if self.ledstrip.keylist[note_position] <= 0:
             idle_color, use_backlight = self._resolve_idle_color()
@@ -254,8 +259,10 @@ class MIDIEventProcessor:
         else:
             red, green, blue = (0, 0, 0)
 
+        self.ledstrip.latency.mark_colored(msg_timestamp)
+
         # Store the note color
-        self.ledstrip.keylist_color[note_position] = [red, green, blue]
+        self.ledstrip.keylist_color[note_position] = (red, green, blue)
 
         # Set this key as active and clear sustained status
         self.ledstrip.keylist_status[note_position] = 1
@@ -282,26 +289,19 @@ class MIDIEventProcessor:
             self.ledstrip.keylist[note_position] = 999
         elif self.ledsettings.mode == "Pulse":
             # Create a new pulse effect
-            self.ledstrip.active_pulses.append({
-                "position": note_position,
-                "color": (red, green, blue),
-                "start_time": time.perf_counter(),
-                "velocity": velocity / 127.0,
-                "state": "attack",
-                "release_time": None
-            })
+            self.ledstrip.pulses.add(note_position, (red, green, blue), velocity / 127.0, time.perf_counter())
             self.ledstrip.keylist[note_position] = 0  # Pulse handles lighting
 
+        self.ledstrip.update_occupancy(note_position)
+
         # Handle special channels for hand coloring (channels 11 and 12)
-        channel = find_between(str(msg), "channel=", " ")
-        # Strip trailing commas (mido message format: "channel=12, note=60...")
-        channel = channel.rstrip(',') if channel else False
-        if channel == "12" or channel == "11":
+        channel = msg.channel
+        if channel == 12 or channel == 11:
             # Mark this LED as externally controlled by external software
             self.ledstrip.keylist_external_software[note_position] = 1
             if self.ledsettings.skipped_notes != "Finger-based":
                 # Apply right hand or left hand color
-                if channel == "12":
+                if channel == 12:
                     hand_color = self.learning.hand_colorR
                 else:
                     hand_color = self.learning.hand_colorL
@@ -309,7 +309,6 @@ class MIDIEventProcessor:
                 red, green, blue = map(int, self.learning.hand_colorList[hand_color])
                 s_color = Color(red, green, blue)
                 self.ledstrip.strip.setPixelColor(note_position, s_color)
-                self.ledstrip.set_adjacent_colors(note_position, s_color, False)
         else:
             # Normal channel is taking control - clear external software flag
             if self.ledstrip.keylist_external_software[note_position] == 1:
@@ -320,7 +319,6 @@ class MIDIEventProcessor:
                 s_color = Color(int(int(red) / float(brightness)), int(int(green) / float(brightness)),
                                 int(int(blue) / float(brightness)))
                 self.ledstrip.strip.setPixelColor(note_position, s_color)
-                self.ledstrip.set_adjacent_colors(note_position, s_color, False)
 
         # Record the note-on event if recording is active
         if self.saving.is_recording:
@@ -357,14 +355,14 @@ class MIDIEventProcessor:
             pedal_deadzone = 10  # Standard MIDI deadzone for sustain pedal
             if value < pedal_deadzone and self.ledsettings.mode in ["Velocity", "Pedal"]:
                 idle_color, use_backlight = self._resolve_idle_color()
-                for i, sustained in enumerate(self.ledstrip.keylist_sustained):
-                    if sustained == 1:
-                        # Clear sustained status
-                        self.ledstrip.keylist_sustained[i] = 0
-                        # If key is not currently pressed, turn it off
-                        if self.ledstrip.keylist_status[i] == 0:
-                            self.ledstrip.keylist[i] = 0  # Turn off immediately
-                            self._apply_idle_color(i, idle_color, use_backlight)
+                sustained = self.ledstrip.keylist_sustained == 1
+                # Clear sustained status
+                self.ledstrip.keylist_sustained[sustained] = 0
+                # If key is not currently pressed, turn it off immediately
+                for i in np.flatnonzero(sustained & (self.ledstrip.keylist_status == 0)):
+                    self.ledstrip.keylist[i] = 0
+                    self._apply_idle_color(i, idle_color, use_backlight)
+                self.ledstrip.update_occupancy(np.flatnonzero(sustained))
 
         current_time = time.time()
         # Handle sequence advancement based on control values
@@ -391,18 +389,11 @@ class MIDIEventProcessor:
             self.saving.add_control_change("control_change", 0, control, value, msg_timestamp)
 
     def clear_all_note_leds(self):
-        idle_color, use_backlight = self._resolve_idle_color()
-        led_count = self.ledstrip.led_number
-        self.ledstrip.keylist = [0] * led_count
-        self.ledstrip.keylist_status = [0] * led_count
-        self.ledstrip.keylist_sustained = [0] * led_count
-        self.ledstrip.keylist_external_software = [0] * led_count
-        if hasattr(self.ledstrip, "keylist_color") and self.ledstrip.keylist_color is not None:
-            self.ledstrip.keylist_color = [0] * led_count
-        if hasattr(self.ledstrip, "active_pulses") and self.ledstrip.active_pulses is not None:
-            self.ledstrip.active_pulses.clear()
-        for i in range(led_count):
-            self._apply_idle_color(i, idle_color, use_backlight)
+        idle_color, _ = self._resolve_idle_color()
+        self.ledstrip.reset_key_state()
+        self.ledstrip.pulses.clear()
+        # Every key gets the same idle color, so adjacent writes cannot differ from it
+        self.ledstrip.strip.fill(idle_color)
         try:
             self.ledstrip.strip.show()
         except Exception:
@@ -419,7 +410,11 @@ class MIDIEventProcessor:
             ), True
         return OFF_COLOR, False
 
+    def idle_color(self):
+        """Packed color of an LED returning to idle: a released key or an LED leaving the halo."""
+        return self._resolve_idle_color()[0]
+
     def _apply_idle_color(self, note_position, color_value, is_backlight):
         """Apply either the backlight color or switch LEDs off for a key."""
+        # Adjacent LEDs go back to idle in the next halo pass (LedStrip.apply_halo)
         self.ledstrip.strip.setPixelColor(note_position, color_value)
-        self.ledstrip.set_adjacent_colors(note_position, color_value, True if is_backlight else False)
@@ -3,6 +3,7 @@ import time
 import threading
 from collections import deque
 from lib.log_setup import logger
+from lib.midi_event import to_event
 
 # Cache for MIDI port names to avoid repeated slow scans
 _cached_input_names = None
@@ -83,6 +84,11 @@ class MidiPorts:
         self.playport = None
 
         self.midipending = None
+        # set whenever a message is queued for the LED loop, so it can sleep until input arrives
+        self.led_input_event = threading.Event()
+        # bumped for every message queued for the LED loop; LearnMIDI blocks on it while waiting for keys
+        self.midi_input_seq = 0
+        self._midi_input_cond = threading.Condition()
         self.midi_monitor_thread = None
         self.monitor_running = False
         self.menu = None
@@ -494,7 +500,45 @@ class MidiPorts:
                 q.popleft()
             except Exception:
                 pass
-        q.append((msg, ts, source))
+        q.append((to_event(msg), ts, source))
+        self.led_input_event.set()
+        self.notify_midi_input()
+
+    def notify_led_input(self):
+        """Wake the LED loop after appending to one of the queues from outside MidiPorts."""
+        self.led_input_event.set()
+
+    def notify_midi_input(self):
+        """Wake threads blocked in wait_for_midi_input(), also used to make them re-check their state."""
+        with self._midi_input_cond:
+            self.midi_input_seq += 1
+            self._midi_input_cond.notify_all()
+
+    def wait_for_midi_input(self, seen_seq, timeout):
+        """
+        Block until something was queued since midi_input_seq was seen_seq, or timeout expires.
+
+        Read midi_input_seq before draining midi_queue and pass it here, so a
+        message queued in between wakes the wait immediately.
+
+        Returns:
+            int: The current midi_input_seq
+        """
+        with self._midi_input_cond:
+            self._midi_input_cond.wait_for(lambda: self.midi_input_seq != seen_seq, timeout)
+            return self.midi_input_seq
+
+    def wait_for_led_input(self, timeout):
+        """
+        Block until a message is queued for the LED loop or timeout expires.
+
+        Returns:
+            bool: True if woken by input, False on timeout
+        """
+        woken = self.led_input_event.wait(timeout)
+        if woken:
+            self.led_input_event.clear()
+        return woken
 
     def _forward_to_port(self, port, msg):
         if port is None:
@@ -682,7 +726,8 @@ class MidiPorts:
                     q.popleft()
                 except Exception:
                     pass
-            q.append((msg, ts, "websocket"))
+            q.append((to_event(msg), ts, "websocket"))
+            self.led_input_event.set()
 
             if self.playport is not None:
                 try:
@@ -0,0 +1,430 @@
+"""
+Song playback shared by the piano player and LearnMIDI.
+
+Both play a CompiledSong, which holds the absolute time of every row (seconds
+from the start of the song). PlaybackClock maps those times onto perf_counter
+deadlines and waits for them: it sleeps until just before a deadline and
+spins for the last SPIN_MARGIN, so events are released with sub-millisecond
+error instead of accumulating the error of one relative sleep per message.
+
+Seek, pause, loop ranges and tempo scaling only move the mapping between song
+time and perf_counter; nothing is reparsed. Every wait records how late the
+event was released, see get_stats().
+
+SongPlayer plays songs to the piano on one worker thread; the web interface
+and the menu control it through get_player().
+"""
+
+import threading
+import time
+from collections import deque
+
+import mido
+import numpy as np
+
+from lib.compiled_song import load_song
+from lib.log_setup import logger
+from lib.midi_event import to_event
+
+# Sleep until this long before a deadline, then spin
+SPIN_MARGIN = 0.001
+# Longest single sleep, so stop conditions are checked regularly
+MAX_SLEEP = 0.05
+
+
+class PlaybackClock:
+    """Maps song time to perf_counter deadlines and waits for them."""
+
+    def __init__(self, times, tempo_scale=1.0, window=4096):
+        """
+        Args:
+            times: Absolute event times in seconds (a CompiledSong time column)
+            tempo_scale: Multiplier applied to song time (100 / set_tempo, as in CompiledSong.delays)
+            window: Number of timing errors kept for get_stats()
+        """
+        self.times = times
+        self.tempo_scale = tempo_scale
+        self.position = 0  # Event run() plays next
+        self._cond = threading.Condition()
+        self._anchor_time = 0.0  # Song time that plays at _anchor_clock
+        self._anchor_clock = time.perf_counter()
+        self._paused_at = None
+        self._seek = None
+        self._stopped = False
+        self._loop = None  # (start, end) event range run() repeats
+        self._errors = deque(maxlen=window)
+
+    def start(self, index, now=None):
+        """Start playing at event index: it is due after its own delay from the previous event."""
+        self._anchor(float(self.times[index - 1]) if index > 0 else 0.0, now)
+
+    def _anchor(self, song_time, now=None):
+        with self._cond:
+            self._anchor_time = song_time
+            self._anchor_clock = time.perf_counter() if now is None else now
+            if self._paused_at is not None:
+                # Paused from here on, so resume() only adds the time after this
+                self._paused_at = self._anchor_clock
+            self._cond.notify_all()
+
+    def deadline(self, index):
+        """perf_counter time at which event index is due."""
+        return self._anchor_clock + (float(self.times[index]) - self._anchor_time) * self.tempo_scale
+
+    def realign(self, index):
+        """
+        Shift the timeline so event index is due now if its deadline already
+        passed, e.g. after playback was held up waiting for keys, so the
+        events after it are not rushed to catch up.
+        """
+        now = time.perf_counter()
+        if self.deadline(index) < now:
+            self._anchor(float(self.times[index]), now)
+
+    def set_tempo_scale(self, tempo_scale, index=None):
+        """Change the tempo scale, keeping event index (the next one, position by default) where it is."""
+        with self._cond:
+            if index is None:
+                index = min(self.position, len(self.times) - 1)
+            due = self.deadline(index)
+            self.tempo_scale = tempo_scale
+            self._anchor_time = float(self.times[index])
+            self._anchor_clock = due
+            self._cond.notify_all()
+
+    def pause(self):
+        with self._cond:
+            if self._paused_at is None:
+                self._paused_at = time.perf_counter()
+
+    def resume(self):
+        """Continue where playback was paused, pushing every deadline back by the pause."""
+        with self._cond:
+            if self._paused_at is not None:
+                self._anchor_clock += time.perf_counter() - self._paused_at
+                self._paused_at = None
+                self._cond.notify_all()
+
+    @property
+    def paused(self):
+        return self._paused_at is not None
+
+    def seek(self, index):
+        """Ask run() to continue from event index."""
+        with self._cond:
+            self._seek = index
+            self._cond.notify_all()
+
+    def set_loop(self, start=None, end=None):
+        """Make run() start over at event start after event end-1; no arguments (or an empty range) plays through."""
+        with self._cond:
+            self._loop = (start, end) if start is not None and end is not None and start < end else None
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def wait_until(self, index, keep_going=None):
+        """
+        Block until event index is due.
+
+        Sleeps until SPIN_MARGIN before the deadline (in slices of at most
+        MAX_SLEEP, checking keep_going and stop()), then spins on perf_counter.
+
+        Args:
+            keep_going: Optional function() -> bool, the wait is abandoned when it returns False
+
+        Returns:
+            bool: True when the event is due, False if stopped, seeking or abandoned
+        """
+        with self._cond:
+            while True:
+                if self._stopped or self._seek is not None or (keep_going is not None and not keep_going()):
+                    return False
+                if self._paused_at is not None:
+                    self._cond.wait(MAX_SLEEP)
+                    continue
+                deadline = self.deadline(index)
+                remaining = deadline - time.perf_counter() - SPIN_MARGIN
+                if remaining <= 0:
+                    break
+                self._cond.wait(min(remaining, MAX_SLEEP))
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+        self._errors.append(now - deadline)
+        return True
+
+    def run(self, start=0, end=None, loop=False, keep_going=None):
+        """
+        Yield event indices from start as they become due, up to end-1.
+
+        Follows seek() and, while a loop range is set (loop=True sets start..end,
+        see set_loop()), starts over at its start after its end or whenever
+        playback is outside it.
+
+        Args:
+            keep_going: Optional function() -> bool, playback stops when it returns False
+        """
+        if end is None:
+            end = len(self.times)
+        if loop:
+            self.set_loop(start, end)
+        index = start
+        self.start(index)
+        while True:
+            with self._cond:
+                loop_range = self._loop
+            if loop_range is not None and not loop_range[0] <= index < min(loop_range[1], end):
+                index = loop_range[0]
+                self.start(index)
+            if index >= end:
+                return
+            self.position = index
+            if not self.wait_until(index, keep_going):
+                with self._cond:
+                    index, self._seek = self._seek, None
+                if index is None:
+                    return
+                index = min(max(index, 0), end)
+                self.start(index)
+                continue
+            yield index
+            index += 1
+
+    def get_stats(self):
+        """
+        How late events were released, in milliseconds.
+
+        Returns:
+            dict: {count, p50, p99, max}
+        """
+        samples = np.array(self._errors) * 1000
+        if len(samples) == 0:
+            return {"count": 0, "p50": None, "p99": None, "max": None}
+        return {"count": int(len(samples)), "p50": round(float(np.median(samples)), 3),
+                "p99": round(float(np.percentile(samples, 99)), 3), "max": round(float(samples.max()), 3)}
+
+
+class _PlayRequest:
+    def __init__(self, song_name, midiports, saving, menu, ledsettings, ledstrip):
+        self.song_name = song_name
+        self.midiports = midiports
+        self.saving = saving
+        self.menu = menu
+        self.ledsettings = ledsettings
+        self.ledstrip = ledstrip
+
+
+class SongPlayer:
+    """
+    Plays songs to the piano port and the LEDs on one worker thread.
+
+    Positions and loop ranges are percentages of the song's length, the tempo
+    a percentage of its speed; they apply to the song playing and carry over
+    to the next one.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = None
+        self._current = None
+        self._clock = None
+        self._thread = None
+        self._held = set()  # (channel, note) sounding on the piano
+        self._held_lock = threading.Lock()
+        self.tempo = 100
+        self.loop_range = None  # (start, end) in percent, None to play through
+
+    def play(self, song_name, midiports, saving, menu, ledsettings, ledstrip):
+        """Stop the song playing, if any, and play song_name from the start."""
+        if song_name in saving.is_playing_midi:
+            menu.render_message(song_name, "Already playing", 2000)
+            return
+        # Existing code checks is_playing_midi to tell whether a song is playing
+        saving.is_playing_midi.clear()
+        saving.is_playing_midi[song_name] = True
+        with self._cond:
+            self._pending = _PlayRequest(song_name, midiports, saving, menu, ledsettings, ledstrip)
+            if self._clock is not None:
+                self._clock.stop()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="playback", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            for request in (self._pending, self._current):
+                if request is not None:
+                    request.saving.is_playing_midi.clear()
+            self._pending = None
+            if self._clock is not None:
+                self._clock.stop()
+
+    def pause(self):
+        with self._cond:
+            if self._clock is not None:
+                self._clock.pause()
+                self._release_notes(self._current)
+
+    def resume(self):
+        with self._cond:
+            if self._clock is not None:
+                self._clock.resume()
+
+    def seek(self, percent):
+        with self._cond:
+            if self._clock is not None:
+                self._clock.seek(self._index_at(self._clock, percent))
+
+    def set_tempo(self, percent):
+        with self._cond:
+            self.tempo = min(max(int(percent), 10), 200)
+            if self._clock is not None:
+                self._clock.set_tempo_scale(100 / self.tempo)
+
+    def set_loop(self, start=None, end=None):
+        """Repeat start..end percent of the song; no arguments plays through."""
+        with self._cond:
+            self.loop_range = (float(start), float(end)) if start is not None and end is not None else None
+            if self._clock is not None:
+                self._apply_loop(self._clock)
+
+    def get_status(self):
+        """
+        Returns:
+            dict: {song, position (percent), paused, tempo, loop (start, end percent or None)}
+        """
+        with self._cond:
+            clock = self._clock
+            status = {"song": self._current.song_name if self._current is not None else None,
+                      "position": 0.0, "paused": False, "tempo": self.tempo,
+                      "loop": list(self.loop_range) if self.loop_range is not None else None}
+            if clock is not None and len(clock.times) and clock.times[-1] > 0:
+                song_time = clock.times[min(clock.position, len(clock.times) - 1)]
+                status["position"] = round(100 * float(song_time / clock.times[-1]), 1)
+                status["paused"] = clock.paused
+            return status
+
+    @staticmethod
+    def _index_at(clock, percent):
+        if not len(clock.times):
+            return 0
+        return int(np.searchsorted(clock.times, clock.times[-1] * float(percent) / 100))
+
+    def _apply_loop(self, clock):
+        if self.loop_range is None:
+            clock.set_loop()
+        else:
+            clock.set_loop(*(self._index_at(clock, percent) for percent in self.loop_range))
+
+    def _release_notes(self, request):
+        """Send note_off for every note the song left sounding, to the piano and the LEDs."""
+        with self._held_lock:
+            held, self._held = self._held, set()
+        midiports = request.midiports
+        for channel, note in sorted(held):
+            message = mido.Message('note_off', channel=channel, note=note)
+            if midiports.playport is not None:
+                midiports.playport.send(message)
+            midiports.midifile_queue.append((to_event(message), time.perf_counter()))
+        if held:
+            midiports.notify_led_input()
+
+    def _track_note(self, message):
+        if message.type not in ('note_on', 'note_off'):
+            return
+        with self._held_lock:
+            if message.type == 'note_on' and message.velocity > 0:
+                self._held.add((message.channel, message.note))
+            else:
+                self._held.discard((message.channel, message.note))
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None)
+                request, self._pending = self._pending, None
+                self._current = request
+            try:
+                self._play(request)
+            except Exception as e:
+                logger.warning(f"Playback failed: {e}")
+            finally:
+                with self._cond:
+                    self._current = None
+                    self._clock = None
+                    if self._pending is None:
+                        request.saving.is_playing_midi.pop(request.song_name, None)
+
+    def _play(self, request):
+        from lib.functions import fastColorWipe, clear_ledstrip_state
+        song_name, midiports, saving, menu = request.song_name, request.midiports, request.saving, request.menu
+        ledstrip, ledsettings = request.ledstrip, request.ledsettings
+        midiports.midifile_queue.append((mido.Message('note_on'), time.perf_counter()))
+        menu.render_message("Playing: ", song_name, 2000)
+
+        def keep_going():
+            return song_name in saving.is_playing_midi
+
+        try:
+            song = load_song(song_name)
+            rows = song.output_rows()
+            clock = PlaybackClock(song.events["play"][rows])
+            with self._cond:
+                if not keep_going():
+                    return
+                clock.tempo_scale = 100 / self.tempo
+                self._apply_loop(clock)
+                start = self._index_at(clock, self.loop_range[0]) if self.loop_range is not None else 0
+                self._clock = clock
+            fastColorWipe(ledstrip.strip, True, ledsettings)
+            t0 = time.perf_counter()
+            previous = None
+            for index in clock.run(start, keep_going=keep_going):
+                if previous is not None and index != previous + 1:
+                    self._release_notes(request)  # Seek or loop: the notes playing would never end
+                previous = index
+                message = song.output_message(rows[index])
+                self._track_note(message)
+                if midiports.playport is not None:
+                    midiports.playport.send(message)
+                else:
+                    logger.debug("Skipping playport send: no output port configured")
+                midiports.midifile_queue.append((to_event(message), clock.deadline(index)))
+                midiports.notify_led_input()
+
+            expected = clock.times[-1] if len(rows) else 0.0
+            logger.info('play time: {:.2f} s (expected {:.2f}), timing error ms: {}'.format(
+                time.perf_counter() - t0, expected, clock.get_stats()))
+        except FileNotFoundError:
+            menu.render_message(song_name, "File not found", 2000)
+        except Exception as e:
+            menu.render_message(song_name, "Error while playing song " + str(e), 2000)
+            logger.warning(e)
+        finally:
+            self._release_notes(request)
+            midiports.midifile_queue.clear()
+            try:
+                clear_ledstrip_state(ledstrip)
+            except Exception as e:
+                logger.debug(f"LED cleanup failed: {e}")
+
+
+# Global player instance, created at import so every caller controls the same worker
+_player = SongPlayer()
+
+
+def get_player() -> SongPlayer:
+    """
+    Get the global song player.
+
+    Returns:
+        SongPlayer: The global player instance
+    """
+    return _player
@@ -0,0 +1,154 @@
+"""
+Fixed-capacity pulse storage for Pulse mode.
+
+Every note_on in Pulse mode starts a pulse: a ring of the note color growing
+out of the key (attack), flickering once fully grown (sustain) and hollowing
+out from the center after note_off (release). Pulses live in parallel arrays,
+one slot per pulse, so a frame renders every pulse with a handful of array
+ops instead of a Python loop per pulse and per LED.
+
+When all slots are taken, a new pulse first merges into a held pulse on the
+same key (restarting it), then replaces the pulse furthest into its release,
+then the oldest pulse.
+"""
+
+import math
+
+import numpy as np
+
+PULSE_CAPACITY = 64
+
+# Slot states
+FREE = 0
+ATTACK = 1
+SUSTAIN = 2
+RELEASE = 3
+
+
+class PulsePool:
+    def __init__(self, capacity=PULSE_CAPACITY):
+        """
+        Args:
+            capacity: Maximum number of simultaneous pulses
+        """
+        self.capacity = capacity
+        self.center = np.zeros(capacity)
+        self.color = np.zeros((capacity, 3))
+        self.start = np.zeros(capacity)
+        self.release_time = np.full(capacity, np.nan)
+        self.velocity = np.zeros(capacity)
+        self.state = np.zeros(capacity, dtype=np.uint8)
+        self.merged = 0  # Pulses that had to merge or replace another one
+
+    def __len__(self):
+        return int(np.count_nonzero(self.state))
+
+    def __bool__(self):
+        return bool(self.state.any())
+
+    def clear(self):
+        self.state[:] = FREE
+
+    def add(self, position, color, velocity, now):
+        """
+        Start a pulse.
+
+        Args:
+            position: LED index of the key
+            color: (r, g, b) pulse color
+            velocity: Peak intensity (note velocity / 127)
+            now: perf_counter timestamp
+        """
+        free = np.flatnonzero(self.state == FREE)
+        if len(free):
+            slot = free[0]
+        else:
+            self.merged += 1
+            held = np.flatnonzero((self.center == position) & (self.state != RELEASE))
+            releasing = np.flatnonzero(self.state == RELEASE)
+            if len(held):
+                slot = held[0]
+            elif len(releasing):
+                slot = releasing[np.argmin(self.release_time[releasing])]
+            else:
+                slot = int(np.argmin(self.start))
+        self.center[slot] = position
+        self.color[slot] = color
+        self.start[slot] = now
+        self.release_time[slot] = np.nan
+        self.velocity[slot] = velocity
+        self.state[slot] = ATTACK
+
+    def release(self, position, now):
+        """Start the release of every held pulse on a key."""
+        held = (self.center == position) & (self.state != FREE) & (self.state != RELEASE)
+        self.state[held] = RELEASE
+        self.release_time[held] = now
+
+    def render(self, now, num_pixels, max_dist, duration, flicker_strength, flicker_speed):
+        """
+        Sum every pulse into one frame and free the pulses that finished.
+
+        Args:
+            now: perf_counter timestamp of the frame
+            num_pixels: Strip length
+            max_dist: Pulse radius in LEDs once fully grown
+            duration: Attack and release duration in seconds
+            flicker_strength: Sustain flicker depth (0-1)
+            flicker_speed: Sustain flicker angular speed
+
+        Returns:
+            tuple: (mask of the LEDs pulses cover, including those of pulses that
+                   just finished, (num_pixels, 3) float summed pulse colors),
+                   or (None, None) when no pulse is alive
+        """
+        live = np.flatnonzero(self.state)
+        if len(live) == 0:
+            return None, None
+        duration = max(duration, 1e-6)
+        center = self.center[live]
+        state = self.state[live]
+
+        # Attack: the outer radius grows with a quadratic ease-out
+        attack = np.minimum((now - self.start[live]) / duration, 1.0)
+        outer = attack * (2 - attack) * max_dist
+
+        # Release: a hole grows from the center until the pulse is gone
+        releasing = state == RELEASE
+        release_progress = np.where(releasing, (now - self.release_time[live]) / duration, 0.0)
+        finished = releasing & (release_progress >= 1.0)
+        inner = release_progress * max_dist
+
+        # Sustain: fully grown, held pulses flicker together
+        intensity = self.velocity[live].copy()
+        sustaining = (attack >= 1.0) & ~releasing
+        if sustaining.any():
+            flicker = (math.sin(now * flicker_speed) + 1) / 2
+            intensity[sustaining] *= 1.0 - flicker_strength * flicker
+            self.state[live[sustaining]] = SUSTAIN
+
+        # Each pulse covers [center - max_dist - 2, center + max_dist + 3) so it clears its last frame
+        lo = np.maximum(0, (center - max_dist - 2).astype(np.intp))
+        hi = np.minimum(num_pixels, (center + max_dist + 3).astype(np.intp))
+        pos = lo[:, None] + np.arange(int(2 * max_dist) + 6)
+        inside = pos < hi[:, None]
+        dist = np.abs(pos - center[:, None])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            falloff = np.where(outer[:, None] < 0.01, (dist < 0.5).astype(np.float64),
+                               np.maximum(0.0, 1.0 - dist / outer[:, None]))
+        level = intensity[:, None] * falloff
+        lit = (inside & ~finished[:, None] & (dist >= inner[:, None]) & (dist <= outer[:, None])
+               & (level > 0.005))
+
+        rows, _ = np.nonzero(lit)
+        lit_pos = pos[lit]
+        weights = self.color[live][rows] * level[lit][:, None]
+        rgb = np.empty((num_pixels, 3))
+        for channel in range(3):
+            rgb[:, channel] = np.bincount(lit_pos, weights=weights[:, channel], minlength=num_pixels)
+
+        touched = np.zeros(num_pixels, dtype=bool)
+        touched[pos[inside]] = True
+        self.state[live[finished]] = FREE
+        return touched, rgb
@@ -0,0 +1,171 @@
+"""
+Frame-paced render scheduler for the main visualizer loop.
+
+Instead of sleeping a fixed interval after each iteration, the loop runs on a
+fixed frame period derived from a target FPS. Each frame sleeps only what is
+left of its budget (measured with perf_counter deadlines), so the frame rate
+does not drift with load. When a frame overruns by more than a whole period,
+the missed frames are dropped and the schedule resynchronises to "now". The
+next frame then sees the full elapsed time (fades use it as event_loop_time),
+which effectively merges the skipped frames into one.
+
+wait() can also take a wake function (MidiPorts.wait_for_led_input) that
+blocks until input arrives or the timeout expires. A note-on then starts
+the next frame immediately instead of waiting out the period, which matters
+most in IDLE where the period is close to a second.
+"""
+
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class RenderScheduler:
+    """
+    Paces frames to a target FPS and keeps rolling frame-time statistics.
+
+    Usage:
+        start = scheduler.begin_frame()
+        ... render ...
+        scheduler.end_frame()
+        scheduler.wait()
+    """
+
+    # Minimum gap between the start of a frame and an input-triggered wake,
+    # so a continuous MIDI stream cannot spin the loop faster than this
+    MIN_WAKE_INTERVAL = 0.002
+
+    def __init__(self, target_fps=100, history=512):
+        """
+        Args:
+            target_fps: Frames per second to aim for
+            history: Number of recent frames kept for percentile statistics
+        """
+        self.target_fps = 100
+        self.frame_period = 0.01
+        self.set_target_fps(target_fps)
+
+        self._lock = threading.Lock()
+        self._frame_times = deque(maxlen=history)      # Work time per frame
+        self._frame_intervals = deque(maxlen=history)  # Start-to-start period
+
+        self._deadline = None
+        self._frame_start = None
+        self._last_frame_start = None
+
+        self.frames = 0
+        self.skipped_frames = 0
+        self.wakeups = 0
+
+    def set_target_fps(self, fps):
+        try:
+            fps = float(fps)
+        except (TypeError, ValueError):
+            return
+        if fps <= 0:
+            return
+        self.target_fps = fps
+        self.frame_period = 1.0 / fps
+
+    def begin_frame(self):
+        """Mark the start of a frame. Returns the perf_counter timestamp used."""
+        now = time.perf_counter()
+        if self._last_frame_start is not None:
+            with self._lock:
+                self._frame_intervals.append(now - self._last_frame_start)
+        self._last_frame_start = now
+        self._frame_start = now
+        return now
+
+    def end_frame(self):
+        """Mark the end of the frame's work."""
+        if self._frame_start is None:
+            return
+        with self._lock:
+            self._frame_times.append(time.perf_counter() - self._frame_start)
+        self.frames += 1
+        self._frame_start = None
+
+    def wait(self, period=None, sleep=time.sleep, wake=None):
+        """
+        Sleep until the next frame deadline.
+
+        Args:
+            period: Frame period for this wait in seconds (defaults to 1 / target_fps).
+                    Longer periods are used in low-power states.
+            sleep: Function used to block for a number of seconds
+            wake: Optional function(timeout) -> bool that blocks until input arrives.
+                  When it returns True the wait ends early and the schedule restarts from now.
+
+        Returns:
+            float: Seconds actually slept
+        """
+        if period is None:
+            period = self.frame_period
+
+        now = time.perf_counter()
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += period
+
+        remaining = self._deadline - now
+        if remaining <= 0:
+            # Overrun: drop whole frames we are late for and restart the schedule from now
+            missed = int(-remaining // period) if period > 0 else 0
+            self.skipped_frames += missed
+            if missed or period <= 0:
+                self._deadline = now
+            return 0.0
+
+        if wake is None:
+            sleep(remaining)
+            return time.perf_counter() - now
+
+        if self._last_frame_start is not None:
+            gap = self._last_frame_start + self.MIN_WAKE_INTERVAL - now
+            if gap > 0:
+                sleep(min(gap, remaining))
+                remaining = self._deadline - time.perf_counter()
+
+        if remaining > 0 and wake(remaining):
+            self.wakeups += 1
+            self._deadline = time.perf_counter()
+        return time.perf_counter() - now
+
+    def reset(self):
+        """Drop the current schedule, e.g. after a long blocking operation."""
+        self._deadline = None
+        self._last_frame_start = None
+
+    @staticmethod
+    def _percentiles(samples):
+        if not samples:
+            return {"p50": None, "p95": None, "p99": None, "max": None}
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99)) * 1000
+        return {
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "max": round(max(samples) * 1000, 3),
+        }
+
+    def get_stats(self):
+        """
+        Frame statistics in milliseconds.
+
+        Returns:
+            dict: target_fps, frame_time / frame_interval percentiles, frame/skip/wakeup counters
+        """
+        with self._lock:
+            frame_times = list(self._frame_times)
+            frame_intervals = list(self._frame_intervals)
+        return {
+            "target_fps": self.target_fps,
+            "frame_time_ms": self._percentiles(frame_times),
+            "frame_interval_ms": self._percentiles(frame_intervals),
+            "frames": self.frames,
+            "skipped_frames": self.skipped_frames,
+            "wakeups": self.wakeups,
+        }
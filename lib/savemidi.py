@@ -1,84 +1,273 @@
+"""
+Recording of what is played on the piano.
+
+While recording, every message is appended to a journal file in the Songs
+folder as one fixed-size binary record (JOURNAL_DTYPE), so memory use does not
+grow with the length of a session and a crash or power loss loses at most the
+last JOURNAL_SYNC_INTERVAL. save() only renames the journal; a background
+worker turns it into <name>_main.mid plus one <name>_<color>.mid per
+Multicolor color. Journals found at startup (a crashed recording or an
+unfinished save) are converted by recover_journals().
+"""
+
+import datetime
+import os
+import queue
+import struct
+import threading
 import time
 
-from mido import MidiFile, MidiTrack, Message
+import numpy as np
+from mido.midifiles.meta import encode_variable_int
+
+from lib.log_setup import logger
+
+# One record per recorded message; color is 0 for the main track or HAS_COLOR | 0xRRGGBB
+JOURNAL_DTYPE = np.dtype([("time", "<f8"), ("status", "u1"), ("data1", "u1"), ("data2", "u1"),
+                          ("pad", "u1"), ("color", "<u4")])
+_RECORD = struct.Struct("<dBBBxI")
+HAS_COLOR = 1 << 24
+JOURNAL_SUFFIX = ".journal"
+ACTIVE_JOURNAL = ".recording" + JOURNAL_SUFFIX
+# How often the journal is forced to disk while recording
+JOURNAL_SYNC_INTERVAL = 1.0
+# How long the web interface waits for a save before it reloads the song list
+SAVE_WAIT_TIMEOUT = 5.0
+
+STATUS = {"note_off": 0x80, "note_on": 0x90, "control_change": 0xB0}
+TICKS_PER_BEAT = 20000
+TICKS_PER_SECOND = 40000  # At the default tempo of 120 bpm
+
+
+def _color_code(hex_color):
+    if hex_color == "main":
+        return 0
+    return HAS_COLOR | (int(str(hex_color).lstrip("#"), 16) & 0xFFFFFF)
+
+
+def _data_byte(value):
+    return min(max(int(value), 0), 127)
+
+
+def read_journal(path):
+    """Records of a journal file, without a last record cut short by a crash."""
+    count = os.path.getsize(path) // JOURNAL_DTYPE.itemsize
+    return np.fromfile(path, dtype=JOURNAL_DTYPE, count=count)
+
+
+def _write_track_file(path, records, start_time, placeholder=False):
+    """Write records as a single track MIDI file, replacing path atomically."""
+    ticks = np.maximum(np.diff(records["time"], prepend=start_time), 0) * TICKS_PER_SECOND
+    data = bytearray()
+    running_status = None
+    if placeholder:
+        # Silent note_off at the start, so every color track lines up with the main one
+        data += b"\x00\x80\x00\x00"
+        running_status = 0x80
+    for delta, status, data1, data2 in zip(ticks.astype(np.int64).tolist(), records["status"].tolist(),
+                                           records["data1"].tolist(), records["data2"].tolist()):
+        data.extend(encode_variable_int(delta))
+        if status != running_status:
+            data.append(status)
+            running_status = status
+        data.append(data1)
+        data.append(data2)
+    data += b"\x00\xff\x2f\x00"  # end_of_track
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, TICKS_PER_BEAT))
+        f.write(b"MTrk" + struct.pack(">I", len(data)))
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_journal_midi(journal_path, prefix):
+    """
+    Convert a journal to MIDI files.
+
+    The main track gets every message. Each Multicolor color gets its own track
+    with its note_on messages and every note_off from the moment it was first used.
+
+    Args:
+        journal_path: Journal file to read
+        prefix: Output path without the "_<track>.mid" part
+
+    Returns:
+        list: Paths of the written files
+    """
+    records = read_journal(journal_path)
+    if len(records) == 0:
+        return []
+    kind = records["status"] & 0xF0
+    is_note = kind != STATUS["control_change"]
+    note_rows = np.flatnonzero(is_note)
+    start_time = records["time"][note_rows[0] if len(note_rows) else 0]
+
+    path = prefix + "_main.mid"
+    _write_track_file(path, records, start_time)
+    paths = [path]
+
+    colors = records["color"]
+    codes, first_rows = np.unique(colors, return_index=True)
+    for code, first_row in sorted(zip(codes.tolist(), first_rows.tolist()), key=lambda item: item[1]):
+        if code == 0:
+            continue
+        rows = np.flatnonzero(is_note & ((colors == code) | (kind == STATUS["note_off"])))
+        path = prefix + "_#{:06x}.mid".format(code & 0xFFFFFF)
+        _write_track_file(path, records[rows[rows >= first_row]], start_time, placeholder=True)
+        paths.append(path)
+    return paths
 
 
 class SaveMIDI:
-    def __init__(self):
-        self.last_note_time = None
-        self.track = None
-        self.mid = None
-        self.first_note_time = None
-        self.messages_to_save = None
+    def __init__(self, songs_dir="Songs"):
+        self.songs_dir = songs_dir
+        self.journal_path = os.path.join(songs_dir, ACTIVE_JOURNAL)
         self.menu = None
         self.is_recording = False
         self.is_playing_midi = {}
         self.start_time = time.perf_counter()
+        self._journal = None
+        self._lock = threading.Lock()
+        self._jobs = queue.Queue()
+        self._unsaved = 0  # Queued saves not written yet
+        self._saved = threading.Condition()
+        self._worker = None
 
     def add_instance(self, menu):
         self.menu = menu
 
     def start_recording(self):
-        self.messages_to_save = dict()
-        self.messages_to_save["main"] = []
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+            self._journal = open(self.journal_path, "wb")
+            self.is_recording = True
+        self._start_worker()
         self.restart_time()
-        self.first_note_time = 0
-        self.is_recording = True
         self.menu.render_message("Recording started", "", 500)
 
     def cancel_recording(self):
-        self.is_recording = False
+        with self._lock:
+            self.is_recording = False
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+                os.remove(self.journal_path)
         self.menu.render_message("Recording canceled", "", 1500)
 
     def add_track(self, status, note, velocity, time_value, hex_color="main"):
-        if not self.is_recording or self.messages_to_save is None:
-            return
-
-        if self.first_note_time == 0:
-            self.first_note_time = time_value
-
-        if hex_color not in self.messages_to_save:
-            self.messages_to_save[str(hex_color)] = []
-            self.messages_to_save[str(hex_color)].append(["note", self.first_note_time, "note_off", 0, 0])
-
-        if status == "note_off":
-            for key, note_off_message in self.messages_to_save.items():
-                self.messages_to_save[key].append(["note", time_value, status, note, velocity])
-        else:
-            self.messages_to_save[str(hex_color)].append(["note", time_value, status, note, velocity])
-            if str(hex_color) != "main":
-                self.messages_to_save["main"].append(["note", time_value, status, note, velocity])
+        self._append(time_value, STATUS[status], note, velocity, _color_code(hex_color))
 
     def add_control_change(self, status, channel, control, value, time_value):
-        if not self.is_recording or self.messages_to_save is None:
-            return
+        self._append(time_value, STATUS[status] | int(channel), control, value, 0)
 
-        self.messages_to_save["main"].append(["control_change", time_value, status, channel, control, value])
+    def _append(self, time_value, status, data1, data2, color):
+        if not self.is_recording:
+            return
+        record = _RECORD.pack(float(time_value), status, _data_byte(data1), _data_byte(data2), color)
+        with self._lock:
+            if self._journal is None:
+                return
+            self._journal.write(record)
+            # Hand every record to the OS right away; the worker forces it to disk
+            self._journal.flush()
 
     def save(self, filename):
-        for key, multicolor_track in self.messages_to_save.items():
-            self.mid = MidiFile(None, None, 0, 20000)  # 20000 is a ticks_per_beat value
-            self.track = MidiTrack()
-            self.mid.tracks.append(self.track)
-            previous_message_time = self.first_note_time
-            for message in multicolor_track:
-                time_delay = max(0, message[1] - previous_message_time)
-                previous_message_time = message[1]
-
-                if message[0] == "note":
-                    self.track.append(Message(message[2], note=int(message[3]), velocity=int(message[4]),
-                                              time=int(time_delay * 40000)))
-                else:
-                    self.track.append(
-                        Message(message[2], channel=int(message[3]), control=int(message[4]), value=int(message[5]),
-                                time=int(time_delay * 40000)))
-                self.last_note_time = message[1]
-
-            self.mid.save('Songs/' + filename + '_' + str(key) + '.mid')
+        """Stop recording and convert the journal to filename_*.mid in the background."""
+        with self._lock:
+            self.is_recording = False
+            if self._journal is None:
+                return
+            self._journal.close()
+            self._journal = None
+            pending_path = self._pending_path(filename)
+            os.replace(self.journal_path, pending_path)
+        self._queue_save(pending_path, filename)
 
-        self.is_recording = False
-        self.messages_to_save = None
-        self.menu.render_message("File saved", filename + ".mid", 1500)
+    def recover_journals(self):
+        """Queue journals left behind by a crash or an unfinished save for conversion."""
+        for name in sorted(os.listdir(self.songs_dir)):
+            if not (name.startswith(".") and name.endswith(JOURNAL_SUFFIX)):
+                continue
+            path = os.path.join(self.songs_dir, name)
+            if name == ACTIVE_JOURNAL:
+                if self._journal is not None:
+                    continue
+                mtime = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+                filename = "recovered " + mtime.strftime("%Y-%m-%d %H:%M")
+                pending_path = self._pending_path(filename)
+                os.replace(path, pending_path)
+                path = pending_path
+            else:
+                filename = name[1:-len(JOURNAL_SUFFIX)]
+            logger.info(f"Recovering recording {filename}")
+            self._queue_save(path, filename)
+
+    def wait_until_saved(self, timeout=None):
+        """
+        Block until every queued save is written.
+
+        Returns:
+            bool: False if the timeout expired first
+        """
+        with self._saved:
+            return self._saved.wait_for(lambda: self._unsaved == 0, timeout)
 
     def restart_time(self):
         self.start_time = time.perf_counter()
+
+    def _pending_path(self, filename):
+        return os.path.join(self.songs_dir, "." + filename + JOURNAL_SUFFIX)
+
+    def _queue_save(self, journal_path, filename):
+        with self._saved:
+            self._unsaved += 1
+        self._start_worker()
+        self._jobs.put((journal_path, filename))
+
+    def _start_worker(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+
+    def _work(self):
+        while True:
+            try:
+                journal_path, filename = self._jobs.get(timeout=JOURNAL_SYNC_INTERVAL)
+            except queue.Empty:
+                self._sync_journal()
+                continue
+            try:
+                self._write_recording(journal_path, filename)
+            finally:
+                with self._saved:
+                    self._unsaved -= 1
+                    self._saved.notify_all()
+
+    def _sync_journal(self):
+        with self._lock:
+            if self._journal is None:
+                return
+            fd = os.dup(self._journal.fileno())
+        # fsync outside the lock so recording never waits for the disk
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write_recording(self, journal_path, filename):
+        try:
+            paths = write_journal_midi(journal_path, os.path.join(self.songs_dir, filename))
+            os.remove(journal_path)
+        except Exception as e:
+            # The journal stays, so the next start retries
+            logger.warning(f"Saving recording {filename} failed: {e}")
+            return
+        if not paths:
+            logger.info(f"Recording {filename} was empty, nothing saved")
+            return
+        if self.menu is not None:
+            self.menu.render_message("File saved", filename + ".mid", 1500)
+            self.menu.update_songs()
@@ -0,0 +1,270 @@
+import os
+import queue
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import mido
+
+from lib.compiled_song import get_tempo
+from lib.log_setup import logger
+
+COLUMNS = ("name", "mtime", "size", "duration", "note_count", "track_count", "tempo")
+
+
+class SongIndex:
+    """Index of the song library, so song lists don't listdir/stat the whole Songs folder per request.
+
+    Rows are added from a directory listing and a stat (cheap), then filled in with
+    MIDI metadata by a background worker that parses each file once. The index is
+    refreshed whenever the Songs folder's own mtime changes, which covers uploads,
+    deletes, renames and recordings saved by SaveMIDI.
+
+    Schema:
+        songs(name TEXT PK, mtime REAL, size INTEGER, duration REAL, note_count INTEGER,
+              track_count INTEGER, tempo INTEGER, hidden INTEGER)
+
+    Metadata columns stay NULL until the worker has parsed the file.
+    """
+
+    SORT_ORDERS = {
+        "dateAsc": "mtime DESC, name DESC",
+        "dateDesc": "mtime ASC, name ASC",
+        "nameAsc": "name ASC",
+        "nameDesc": "name DESC",
+    }
+
+    def __init__(self, db_path: str = "song_index.db", songs_dir: str = "Songs"):
+        # Same location rules as ProfileManager: relative paths go to the project 'data' directory
+        if db_path != ":memory:" and not os.path.isabs(db_path):
+            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+            data_dir = os.path.join(project_root, 'data')
+            try:
+                os.makedirs(data_dir, exist_ok=True)
+            except OSError:
+                data_dir = os.path.abspath(project_root)
+            db_path = os.path.join(data_dir, db_path)
+        self.db_path = db_path
+        self.songs_dir = songs_dir
+        self._lock = threading.RLock()
+        # One shared connection, so ":memory:" works and every query skips the connect cost
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._init_db()
+
+        self._dir_mtime = None
+        self._visible_count = None
+        self.version = 0  # Bumped whenever the set of songs changes
+
+        self._pending = queue.Queue()
+        self._queued = set()
+        self._worker = None
+
+    # --------------- Internal helpers ---------------
+    def _init_db(self):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS songs (
+                    name TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    duration REAL,
+                    note_count INTEGER,
+                    track_count INTEGER,
+                    tempo INTEGER,
+                    hidden INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS songs_mtime ON songs(hidden, mtime, name)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS songs_name ON songs(hidden, name)")
+
+    @staticmethod
+    def _is_song(name: str) -> bool:
+        return name.lower().endswith('.mid')
+
+    @staticmethod
+    def _is_hidden(name: str) -> bool:
+        # Per-track files written next to a recording are not listed in the web song list
+        return '_#' in name
+
+    def _stat(self, name: str):
+        try:
+            return os.stat(os.path.join(self.songs_dir, name))
+        except OSError:
+            return None
+
+    def _changed(self):
+        with self._lock:
+            self._visible_count = None
+            self.version += 1
+
+    # --------------- Scanning ---------------
+    def start(self):
+        """Scan the library and start the background metadata worker."""
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, daemon=True)
+            self._worker.start()
+        threading.Thread(target=self.scan, daemon=True).start()
+
+    def scan(self):
+        """Sync the index with the Songs folder: add new/changed files, drop missing ones."""
+        try:
+            dir_mtime = os.stat(self.songs_dir).st_mtime_ns
+            names = [f for f in os.listdir(self.songs_dir) if self._is_song(f)]
+        except OSError as e:
+            logger.warning(f"Song index scan failed: {e}")
+            return
+
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in
+                     self._conn.execute("SELECT name, mtime, size FROM songs")}
+            on_disk = set(names)
+            changed = False
+            with self._conn:
+                for name in names:
+                    stat = self._stat(name)
+                    if stat is None:
+                        continue
+                    if known.get(name) != (stat.st_mtime, stat.st_size):
+                        self._upsert(name, stat)
+                        changed = True
+                missing = [name for name in known if name not in on_disk]
+                for name in missing:
+                    self._conn.execute("DELETE FROM songs WHERE name=?", (name,))
+                    changed = True
+            self._dir_mtime = dir_mtime
+            if changed:
+                self._changed()
+            unparsed = [row[0] for row in self._conn.execute("SELECT name FROM songs WHERE duration IS NULL")]
+
+        for name in unparsed:
+            self._queue_analysis(name)
+
+    def refresh_if_changed(self):
+        """Rescan only if the Songs folder changed since the last scan (one stat)."""
+        try:
+            dir_mtime = os.stat(self.songs_dir).st_mtime_ns
+        except OSError:
+            return
+        if dir_mtime != self._dir_mtime:
+            self.scan()
+
+    def _upsert(self, name: str, stat):
+        self._conn.execute(
+            """
+            INSERT INTO songs(name, mtime, size, hidden) VALUES(?,?,?,?)
+            ON CONFLICT(name) DO UPDATE SET mtime=excluded.mtime, size=excluded.size, duration=NULL,
+                note_count=NULL, track_count=NULL, tempo=NULL
+            """,
+            (name, stat.st_mtime, stat.st_size, int(self._is_hidden(name)))
+        )
+
+    def _queue_analysis(self, name: str):
+        with self._lock:
+            if name in self._queued:
+                return
+            self._queued.add(name)
+        self._pending.put(name)
+
+    def _work(self):
+        while True:
+            name = self._pending.get()
+            with self._lock:
+                self._queued.discard(name)
+            self._analyze(name)
+
+    def _analyze(self, name: str):
+        stat = self._stat(name)
+        if stat is None:
+            return
+        try:
+            mid = mido.MidiFile(os.path.join(self.songs_dir, name), clip=True)
+            metadata = (mid.length, sum(1 for track in mid.tracks for msg in track
+                                        if msg.type == 'note_on' and msg.velocity > 0),
+                        len(mid.tracks), get_tempo(mid))
+        except Exception as e:
+            # Store zeros so an unreadable file is not parsed again on every scan
+            logger.warning(f"Song index could not parse {name}: {e}")
+            metadata = (0, 0, 0, None)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE songs SET duration=?, note_count=?, track_count=?, tempo=? WHERE name=? AND mtime=? AND size=?",
+                metadata + (name, stat.st_mtime, stat.st_size)
+            )
+
+    # --------------- Incremental updates ---------------
+    def add(self, name: str):
+        """Index a song that was just written (upload, recording)."""
+        stat = self._stat(name)
+        if stat is None or not self._is_song(name):
+            return
+        with self._lock:
+            with self._conn:
+                self._upsert(name, stat)
+            self._changed()
+        self._queue_analysis(name)
+
+    def remove(self, name: str):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM songs WHERE name=?", (name,))
+            self._changed()
+
+    def rename(self, old_name: str, new_name: str):
+        self.remove(old_name)
+        self.add(new_name)
+
+    # --------------- Queries ---------------
+    def count(self, search: Optional[str] = None) -> int:
+        """Number of listed (non-hidden) songs, optionally filtered by a name search."""
+        self.refresh_if_changed()
+        with self._lock:
+            if not search:
+                if self._visible_count is None:
+                    self._visible_count = self._conn.execute(
+                        "SELECT COUNT(*) FROM songs WHERE hidden=0").fetchone()[0]
+                return self._visible_count
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM songs WHERE hidden=0 AND name LIKE ? ESCAPE '\\'",
+                (self._like_pattern(search),)).fetchone()[0]
+
+    def get_page(self, page: int, length: int, sort_by: Optional[str] = None,
+                 search: Optional[str] = None) -> List[Dict]:
+        """One page of listed songs.
+
+        Args:
+            page: Zero-based page number
+            length: Songs per page
+            sort_by: One of SORT_ORDERS (defaults to oldest first, like the old listing)
+            search: Case-insensitive substring of the song name
+        """
+        self.refresh_if_changed()
+        order = self.SORT_ORDERS.get(sort_by, self.SORT_ORDERS["dateDesc"])
+        query = "SELECT " + ", ".join(COLUMNS) + " FROM songs WHERE hidden=0"
+        args = []
+        if search:
+            query += " AND name LIKE ? ESCAPE '\\'"
+            args.append(self._like_pattern(search))
+        query += " ORDER BY " + order + " LIMIT ? OFFSET ?"
+        args += [length, max(0, page) * length]
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def list_names(self, include_hidden: bool = True) -> List[str]:
+        self.refresh_if_changed()
+        query = "SELECT name FROM songs" + ("" if include_hidden else " WHERE hidden=0") + " ORDER BY name"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query)]
+
+    def get_song(self, name: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT " + ", ".join(COLUMNS) + " FROM songs WHERE name=?",
+                                     (name,)).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    @staticmethod
+    def _like_pattern(search: str) -> str:
+        escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return '%' + escaped + '%'
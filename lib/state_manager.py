@@ -66,6 +66,10 @@ class StateManager:
             screen_off_value = self.usersettings.get_setting_value("screen_off_delay")
             self.screen_off_delay = float(screen_off_value) * 60 if screen_off_value else 3600
             
+            # Render loop target frame rate for ACTIVE_USE/NORMAL
+            target_fps_value = self.usersettings.get_setting_value("target_fps")
+            self.target_fps = max(1.0, float(target_fps_value)) if target_fps_value else 100.0
+
             # Screensaver delay (existing setting)
             screensaver_value = self.usersettings.get_setting_value("screensaver_delay")
             self.screensaver_delay = float(screensaver_value) * 60 if screensaver_value else 600
@@ -79,6 +83,7 @@ class StateManager:
             self.midi_timeout_seconds = 60    # 1 minute
             self.screen_off_delay = 3600      # 60 minutes
             self.screensaver_delay = 600      # 10 minutes
+            self.target_fps = 100.0
     
     def update_midi_activity(self):
         """Called when MIDI message is received"""
@@ -163,6 +168,17 @@ class StateManager:
         else:  # IDLE
             return 0.9  # Large delay for CPU savings
     
+    def get_frame_period(self):
+        """
+        Get the render scheduler frame period for current state.
+
+        Returns:
+            float: Frame period in seconds (1 / target_fps, or the IDLE delay)
+        """
+        if self.current_state == SystemState.IDLE:
+            return self.get_loop_delay()
+        return 1.0 / self.target_fps
+
     def should_refresh_screen(self):
         """
         Determine if screen should be refreshed based on current state.
@@ -10,7 +10,7 @@ from webinterface import webinterface, app_state
 
 
 class WebInterfaceManager:
-    def __init__(self, args, usersettings, ledsettings, ledstrip, learning, saving, midiports, menu, hotspot, platform, state_manager=None):
+    def __init__(self, args, usersettings, ledsettings, ledstrip, learning, saving, midiports, menu, hotspot, platform, state_manager=None, render_scheduler=None, song_index=None):
         self.args = args
         self.usersettings = usersettings
         self.ledsettings = ledsettings
@@ -22,6 +22,8 @@ class WebInterfaceManager:
         self.hotspot = hotspot
         self.platform = platform
         self.state_manager = state_manager
+        self.render_scheduler = render_scheduler
+        self.song_index = song_index
         self.websocket_loop = asyncio.new_event_loop()
         self.setup_web_interface()
 
@@ -39,6 +41,8 @@ class WebInterfaceManager:
             app_state.hotspot = self.hotspot
             app_state.platform = self.platform
             app_state.state_manager = self.state_manager
+            app_state.render_scheduler = self.render_scheduler
+            app_state.song_index = self.song_index
 
             webinterface.jinja_env.auto_reload = True
             webinterface.config['TEMPLATES_AUTO_RELOAD'] = True
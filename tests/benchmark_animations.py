@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+##########################################################################
+#
+# INFO:
+# - Benchmark of every animation in the AnimationRegistry.
+# - Runs each frame generator headless on the emu driver for a number of
+#   frames at several strip lengths, the same way animation_engine does
+#   (generator step, masked write, show), and prints JSON with:
+#     ms_per_frame   mean generator + set_masked time
+#     p95_ms         95th percentile of the above
+#     show_ms        mean show() time (frame buffer -> emu driver)
+#     fps            frames per second achieved by the uncapped loop
+#     alloc_kb       mean peak of temporary memory allocated per frame
+#                    (tracemalloc, measured in a separate pass)
+#     over_budget    fps below the animation frame rate
+#   Periodic animations replay from the frame cache as in run_animation;
+#   --live renders every frame instead.
+# - Run from the repository root: python3 tests/benchmark_animations.py
+#   e.g. --leds 88,176,300 --frames 300 --output animations.json
+#
+##########################################################################
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmark_setup import emu_strip
+from lib.led_animations import get_registry
+from lib.functions import can_overwrite_mask
+from lib.animation_engine import AnimationContext, start_frames, ANIMATION_FPS
+from lib.animation_frames import PERIODIC
+from lib.frame_cache import FrameCache, cached_frames
+
+
+def resize_strip(ledstrip, led_count):
+    ledstrip.led_number = led_count
+    ledstrip.init_strip()
+    ledstrip.strip.driver.VIS_FPS = 1000000  # no simulated transfer time
+
+
+def run_frames(gen, ledstrip, ledsettings, frames, dt, trace=False):
+    """Step a primed generator; returns per-frame render times, show times and peak allocations."""
+    render = np.zeros(frames)
+    show = np.zeros(frames)
+    alloc = np.zeros(frames)
+    strip = ledstrip.strip
+    t = 0.0
+    for k in range(frames):
+        if trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        frame = gen.send((t, dt))
+        # render_frame() with show() timed separately, skipped for unchanged frames
+        if frame is not None:
+            strip.set_masked(can_overwrite_mask(ledstrip, ledsettings, len(frame)), frame)
+        shown = time.perf_counter()
+        strip.show()
+        end = time.perf_counter()
+        if trace:
+            alloc[k] = tracemalloc.get_traced_memory()[1] - base
+        render[k] = shown - start
+        show[k] = end - shown
+        t += dt
+    return render, show, alloc
+
+
+def benchmark(info, ledstrip, ledsettings, frames, param, live=False):
+    dt = 1.0 / ANIMATION_FPS
+    ctx = AnimationContext(ledstrip, ledsettings, param=param, seed=0)
+    generator = info.frames
+    if not live and generator in PERIODIC:
+        generator = cached_frames(generator, PERIODIC[generator], FrameCache())
+    gen = start_frames(generator, ctx)
+    gen.send((0.0, 0.0))  # first frame sets up state
+    started = time.perf_counter()
+    render, show, _ = run_frames(gen, ledstrip, ledsettings, frames, dt)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        _, _, alloc = run_frames(gen, ledstrip, ledsettings, max(10, frames // 10), dt, trace=True)
+    finally:
+        tracemalloc.stop()
+    gen.close()
+
+    fps = frames / elapsed
+    return {
+        "ms_per_frame": round(float(render.mean()) * 1000, 3),
+        "p95_ms": round(float(np.percentile(render, 95)) * 1000, 3),
+        "show_ms": round(float(show.mean()) * 1000, 3),
+        "fps": round(fps, 1),
+        "alloc_kb": round(float(alloc.mean()) / 1024, 1),
+        "over_budget": bool(fps < ANIMATION_FPS),
+    }
+
+
+def run(led_counts, frames, names=None, scale=0, colormap="Rainbow", live=False):
+    with emu_strip() as (usersettings, ledsettings, ledstrip):
+        params = {"scale": scale, "colormap": colormap}
+        animations = [info for info in get_registry().get_all() if names is None or info.name in names]
+
+        results = {}
+        for led_count in led_counts:
+            resize_strip(ledstrip, led_count)
+            for info in animations:
+                param = params.get(info.param_name) if info.requires_param else None
+                results.setdefault(info.name, {})[str(led_count)] = benchmark(info, ledstrip, ledsettings, frames, param, live)
+
+    return {
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "target_fps": ANIMATION_FPS,
+        "frames": frames,
+        "frame_cache": not live,
+        "led_counts": led_counts,
+        "animations": results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-l', '--leds', default="88,176,300", help='comma separated strip lengths')
+    parser.add_argument('-f', '--frames', type=int, default=300, help='frames per animation and strip length')
+    parser.add_argument('-a', '--animations', help='comma separated animation names (default: all registered)')
+    parser.add_argument('--live', action='store_true', help='render periodic animations without the frame cache')
+    parser.add_argument('-o', '--output', help='write JSON to this file instead of stdout')
+    args = parser.parse_args()
+
+    report = run([int(n) for n in args.leds.split(",")], args.frames,
+                 args.animations.split(",") if args.animations else None, live=args.live)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+##########################################################################
+#
+# INFO:
+# - Micro-benchmark for MIDIEventProcessor throughput (events/sec).
+# - Feeds note_on/note_off pairs through the same queue path MidiPorts
+#   uses and drains them with process_midi_events() on the emu driver.
+# - Run from the repository root: python3 tests/benchmark_midi_events.py
+#
+##########################################################################
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import time
+import types
+from collections import deque
+
+import mido
+
+from benchmark_setup import emu_strip
+from lib.color_mode import ColorMode
+from lib.midi_event_processor import MIDIEventProcessor
+from lib.midi_event import to_event
+
+
+def build_processor(usersettings, ledsettings, ledstrip):
+    ledstrip.strip.driver.VIS_FPS = 1000000
+
+    midiports = types.SimpleNamespace(midi_queue=deque(), midifile_queue=deque(), websocket_midi_queue=deque(),
+                                      midipending=None, last_activity=0, get_midi_mode=lambda: "light_show")
+    saving = types.SimpleNamespace(is_playing_midi={}, is_recording=False, restart_time=lambda: None)
+    learning = types.SimpleNamespace(is_started_midi=False, socket_send=[])
+    menu = types.SimpleNamespace(screensaver_is_running=False)
+    color_mode = ColorMode(ledsettings.color_mode, ledsettings)
+
+    processor = MIDIEventProcessor(midiports, ledstrip, ledsettings, usersettings, saving, learning, menu,
+                                   color_mode)
+    return processor, midiports
+
+
+def run(events=20000, rounds=5):
+    with emu_strip(mode="Fading") as (usersettings, ledsettings, ledstrip):
+        processor, midiports = build_processor(usersettings, ledsettings, ledstrip)
+        messages = []
+        for i in range(events // 2):
+            note = 21 + (i % 88)
+            messages.append(mido.Message("note_on", channel=i % 2, note=note, velocity=64))
+            messages.append(mido.Message("note_off", channel=i % 2, note=note, velocity=0))
+
+        best = 0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for msg in messages:
+                # spread timestamps so the processor does not merge everything into one burst
+                midiports.midi_queue.append((to_event(msg), time.perf_counter(), "piano"))
+            while midiports.midi_queue:
+                processor.process_midi_events()
+            elapsed = time.perf_counter() - start
+            best = max(best, len(messages) / elapsed)
+
+        print("{} events, best of {}: {:.0f} events/sec".format(len(messages), rounds, best))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+##########################################################################
+#
+# INFO:
+# - Micro-benchmark for Pulse mode: frame time of
+#   LEDEffectsProcessor.process_pulse_effects() with many overlapping
+#   pulses (a fast trill), half held and half releasing, on the emu driver.
+# - Run from the repository root: python3 tests/benchmark_pulse_effects.py
+#
+##########################################################################
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import time
+import types
+
+import numpy as np
+
+from benchmark_setup import emu_strip
+from lib.led_effects_processor import LEDEffectsProcessor
+
+
+def build_processor(ledsettings, ledstrip):
+    menu = types.SimpleNamespace(screensaver_is_running=False)
+    return LEDEffectsProcessor(ledstrip, ledsettings, menu, None, 0, 10)
+
+
+def run(pulses=64, frames=2000):
+    with emu_strip(mode="Pulse") as (usersettings, ledsettings, ledstrip):
+        processor = build_processor(ledsettings, ledstrip)
+        rng = np.random.default_rng(0)
+        positions = rng.integers(0, ledstrip.led_number, pulses)
+        colors = rng.integers(0, 256, (pulses, 3))
+
+        times = np.zeros(frames)
+        for k in range(frames):
+            if not k % 100:
+                # Restart the trill so pulses stay alive: half in attack/sustain, half releasing
+                now = time.perf_counter()
+                ledstrip.pulses.clear()
+                for i in range(pulses):
+                    ledstrip.pulses.add(int(positions[i]), tuple(colors[i]), 0.8, now - 0.2 * (i % 5))
+                    if i % 2:
+                        ledstrip.pulses.release(int(positions[i]), now)
+            start = time.perf_counter()
+            processor.process_pulse_effects()
+            times[k] = time.perf_counter() - start
+
+        print("{} pulses on {} LEDs: {:.3f} ms/frame median, {:.3f} ms p95".format(
+            pulses, ledstrip.led_number, np.median(times) * 1000, np.percentile(times, 95) * 1000))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+##########################################################################
+#
+# INFO:
+# - Shared setup for the benchmark_*.py scripts: an LedStrip on the emu
+#   driver with the default settings, configured from a temporary copy of
+#   config/default_settings.xml that is removed afterwards.
+#
+##########################################################################
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import contextlib
+import os
+import shutil
+import tempfile
+
+from lib.usersettings import UserSettings
+from lib.ledsettings import LedSettings
+from lib.ledstrip import LedStrip
+
+
+@contextlib.contextmanager
+def emu_strip(mode=None):
+    """
+    Yields:
+        tuple: (usersettings, ledsettings, ledstrip)
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = os.path.join(tmp_dir, "settings.xml")
+        shutil.copy("config/default_settings.xml", config)
+        usersettings = UserSettings(config, "config/default_settings.xml")
+
+        ledsettings = LedSettings(usersettings)
+        if mode is not None:
+            ledsettings.mode = mode
+        ledstrip = LedStrip(usersettings, ledsettings, "emu")
+        yield usersettings, ledsettings, ledstrip
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+##########################################################################
+#
+# INFO:
+# - Shared fixtures for the LED tests: LED settings with the attributes the
+#   strip and animations read, and an LedStrip on the emu driver that is
+#   built without a settings file.
+#
+##########################################################################
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+from lib.frame_buffer import FrameBuffer
+from lib.LED_drivers import PixelStrip_Emu
+from lib.ledstrip import LedStrip
+from lib.latency import LatencyTracker
+
+
+class FakeSettings:
+    adjacent_mode = "Off"
+    adjacent_red = adjacent_green = adjacent_blue = 255
+    adjacent_radius = 1
+    adjacent_falloff = "Linear"
+    backlight_stopped = False
+    backlight_brightness_percent = 50
+    led_animation_brightness_percent = 80
+    note_offsets = [[75, 2], [65, 1]]
+    note_offsets_version = 0
+    usersettings = None
+    key_in_scale = {"red": 0, "green": 200, "blue": 0}
+    key_not_in_scale = {"red": 200, "green": 0, "blue": 0}
+
+    def get_backlight_color(self, color):
+        return {"Red": 40, "Green": 120, "Blue": 250}[color]
+
+
+class FakeStrip(LedStrip):
+    """LedStrip on an emulated driver, without user settings."""
+
+    def __init__(self, led_number, ledsettings):
+        self.ledsettings = ledsettings
+        self.led_number = led_number
+        self.leds_per_meter = 144
+        self.shift = 0
+        self.reverse = False
+        self.note_map_version = 0
+        self._note_map_key = None
+        self.strip = FrameBuffer(PixelStrip_Emu(led_number))
+        self.latency = LatencyTracker()
+        self.strip.latency = self.latency
+        self.reset_key_state()
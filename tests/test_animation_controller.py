@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import time
+import unittest
+from lib.animation_engine import ANIMATION_FPS
+from lib.animation_controller import AnimationController
+from lib import animation_frames
+from lib.led_animations import get_registry
+from fake_strip import FakeSettings, FakeStrip
+
+
+class TestAnimationController(unittest.TestCase):
+    def setUp(self):
+        self.ledsettings = FakeSettings()
+        self.ledstrip = FakeStrip(300, self.ledsettings)
+
+    def test_controller_hands_strip_back_on_stop(self):
+        controller = AnimationController()
+        rainbow = get_registry().get("Rainbow").frames
+        first = controller.start(rainbow, self.ledstrip, self.ledsettings, speed_ms=20)
+        second = controller.start(rainbow, self.ledstrip, self.ledsettings, speed_ms=20, is_idle=True)
+        self.assertTrue(first.cancelled)
+        self.assertFalse(controller.is_running(idle=False))
+        self.assertTrue(controller.is_running(idle=True))
+
+        deadline = time.time() + 2
+        while self.ledstrip.strip.show_requested < 5 and time.time() < deadline:
+            time.sleep(0.01)
+
+        # A key pressed during the idle animation, handled inside the main loop's frame barrier
+        pressed = time.perf_counter()
+        self.ledstrip.strip.begin_frame()
+        self.assertFalse(controller.stop(idle=False))
+        self.assertTrue(controller.stop(idle=True))
+        self.ledstrip.latency.expect_handoff()
+        self.assertTrue(second.cancelled)
+        self.assertFalse(controller.is_running())
+        # stop() returned because the worker released the strip, not because it timed out
+        self.assertEqual(controller.get_stats()["count"], 1)
+        shows = self.ledstrip.strip.show_requested
+        time.sleep(3 / ANIMATION_FPS)
+        self.assertEqual(self.ledstrip.strip.show_requested, shows)
+
+        self.ledstrip.latency.mark_colored(pressed)
+        self.ledstrip.strip.setPixelColorRGB(100, 255, 255, 255)
+        self.ledstrip.strip.show()
+        self.ledstrip.strip.commit()
+        self.assertEqual(self.ledstrip.latency.get_stats()["handoff"]["count"], 1)
+
+
+    def test_key_press_ends_startup_fade_only(self):
+        controller = AnimationController()
+        rainbow = get_registry().get("Rainbow").frames
+        controller.start(rainbow, self.ledstrip, self.ledsettings, speed_ms=20)
+        self.assertFalse(controller.stop_for_key())
+        self.assertTrue(controller.is_running(idle=False))
+
+        shows = self.ledstrip.strip.show_requested
+        fade = controller.start(animation_frames.startup, self.ledstrip, self.ledsettings, param=(2000, 30),
+                                stop_on_key=True)
+        deadline = time.time() + 2
+        while self.ledstrip.strip.show_requested < shows + 3 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(controller.stop_for_key())
+        self.assertTrue(fade.cancelled)
+        # Stopped by a key: the free pixels go back to the backlight
+        self.assertEqual(self.ledstrip.strip.getPixelColor(0), 0x143C7D)
+
+    def test_startup_fade_ends_with_the_strip_off(self):
+        controller = AnimationController()
+        pixels = self.ledstrip.strip.pixels
+        pixels.fill(0x050505)
+        start = time.perf_counter()
+        controller.start(animation_frames.startup, self.ledstrip, self.ledsettings, param=(100, 30),
+                         stop_on_key=True)
+        # start() does not wait for the fade
+        self.assertLess(time.perf_counter() - start, 0.05)
+        deadline = time.time() + 2
+        while controller.is_running() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(controller.is_running())
+        self.assertFalse(pixels.any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import unittest
+import numpy as np
+from lib.frame_buffer import to_packed
+from lib.animation_engine import AnimationContext, start_frames
+from lib import animation_frames
+from lib.animation_frames import PERIODIC
+from lib.frame_cache import FrameCache, cached_frames
+from lib.led_animations import get_registry
+from fake_strip import FakeSettings, FakeStrip
+
+
+class TestAnimationEngine(unittest.TestCase):
+    def setUp(self):
+        self.ledsettings = FakeSettings()
+        self.ledstrip = FakeStrip(300, self.ledsettings)
+
+    def test_all_animations_render_whole_frames(self):
+        for info in get_registry().get_all():
+            param = {"scale": 0, "colormap": "Rainbow"}.get(info.param_name)
+            ctx = AnimationContext(self.ledstrip, self.ledsettings, speed_ms=20, param=param, seed=1)
+            gen = start_frames(info.frames, ctx)
+            for k in range(120):
+                frame = gen.send((k / 60, 0 if k == 0 else 1 / 60))
+                self.assertEqual(np.shape(frame), (300, 3), info.name)
+                self.assertTrue(np.isfinite(frame).all(), info.name)
+                self.assertGreaterEqual(np.min(frame), 0, info.name)
+                self.assertLessEqual(np.max(frame), 255, info.name)
+
+    def test_chords_cover_every_key(self):
+        # 144 LED/m shows more than 128 keys on 300 LEDs; notes past 127 must not fail
+        ctx = AnimationContext(self.ledstrip, self.ledsettings, param=0)
+        frame = start_frames(get_registry().get("Chords").frames, ctx).send((0, 0))
+        lit = np.flatnonzero(frame.any(axis=1))
+        self.assertEqual(frame[lit[0]].tolist(), [0, 160, 0])  # A is in C major
+        self.assertEqual(frame[lit[1]].tolist(), [160, 0, 0])  # A# is not
+        self.assertGreater(lit[-1], 280)
+
+    def test_startup_fades_in_and_out_then_ends(self):
+        ctx = AnimationContext(self.ledstrip, self.ledsettings, param=(2000, 30))
+        gen = start_frames(animation_frames.startup, ctx)
+        frame = gen.send((1.0, 0.0))
+        # Red, blue and green blocks of 10 LEDs centered on the strip, at half brightness
+        self.assertEqual(np.flatnonzero(frame.any(axis=1)).tolist(), list(range(135, 165)))
+        self.assertEqual(frame[[135, 145, 155]].tolist(), [[127, 0, 0], [0, 0, 127], [0, 127, 0]])
+        self.assertEqual(gen.send((1.9, 0.9))[135, 0], 12)
+        # Then it ends, leaving the strip off
+        with self.assertRaises(StopIteration) as stop:
+            gen.send((2.0, 0.1))
+        self.assertFalse(stop.exception.value.any())
+
+    def test_periodic_animations_replay_from_cache(self):
+        for frames, period in PERIODIC.items():
+            param = "Rainbow" if frames.__name__ == "colormap_animation" else None
+            cache = FrameCache()
+            ctx = AnimationContext(self.ledstrip, self.ledsettings, speed_ms=20, param=param)
+            steps, step_seconds = period(ctx)
+            live = start_frames(frames, ctx)
+            replay = start_frames(cached_frames(frames, period, cache), ctx)
+            # The next period replays the first rows again
+            sequence = list(range(min(steps, 20))) + ([steps, steps + 1] if steps > 20 else [])
+            for step in sequence:
+                middle = (step + 0.5) * step_seconds if np.isfinite(step_seconds) else 0.0
+                row = replay.send((middle, 0))
+                expected = to_packed(live.send(((step % steps + 0.5) * step_seconds if steps > 1 else 0.0, 0)))
+                self.assertEqual(row.tolist(), expected.tolist(), frames.__name__)
+                # Same step again: nothing to redraw
+                self.assertIsNone(replay.send((middle, 0)), frames.__name__)
+            self.assertEqual(cache.misses, min(steps, 20), frames.__name__)
+
+
+if __name__ == '__main__':
+    unittest.main()
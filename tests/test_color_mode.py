@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import os
+import shutil
+import tempfile
+import unittest
+import mido
+import numpy as np
+import lib.colormaps as cmap
+from lib.usersettings import UserSettings
+from lib.ledsettings import LedSettings
+from lib.color_mode import ColorMode
+from lib.functions import get_scale_color, powercurve
+
+
+class TestColorModeTables(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        config = os.path.join(cls.tmp_dir, "settings.xml")
+        shutil.copy("config/default_settings.xml", config)
+        cls.ledsettings = LedSettings(UserSettings(config, "config/default_settings.xml"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_note_tables_match_direct_colors(self):
+        ledsettings = self.ledsettings
+
+        gradient = ColorMode("Gradient", ledsettings)
+        for position in (0, 1, 50, gradient.led_number - 1, gradient.led_number + 5):
+            self.assertEqual(gradient.NoteOn(None, None, None, position), gradient.gradient_get_colors(position))
+
+        scale = ColorMode("Scale", ledsettings)
+        for note in range(128):
+            self.assertEqual(list(scale.NoteOn(mido.Message("note_on", note=note), None, None, 0)),
+                             get_scale_color(scale.scale_key, note, scale.key_in_scale, scale.key_not_in_scale))
+
+        ledsettings.velocityrainbow_colormap = "Rainbow"
+        ledsettings.velocityrainbow_curve = 150
+        velocity_rainbow = ColorMode("VelocityRainbow", ledsettings)
+        for velocity in range(128):
+            x = int(((255 * powercurve(velocity / 127, 1.5) * (velocity_rainbow.scale / 100) % 256)
+                     + velocity_rainbow.offset) % 256)
+            color = velocity_rainbow.NoteOn(mido.Message("note_on", velocity=velocity), None, None, 0)
+            self.assertEqual(color, cmap.colormaps["Rainbow"][x])
+
+    def test_frame_color_update_matches_per_led(self):
+        ledsettings = self.ledsettings
+        ledsettings.rainbow_colormap = "Rainbow"
+        ledsettings.rainbow_timeshift = 0
+        rainbow = ColorMode("Rainbow", ledsettings)
+        positions = np.arange(0, 176, 3)
+        old_colors = np.ones((len(positions), 3), dtype=int)
+
+        colors, updated = rainbow.ColorUpdateFrame(rainbow.timeshift_start, positions, old_colors)
+        self.assertIsNone(updated)
+        expected = [rainbow.ColorUpdate(None, n, (1, 1, 1)) for n in positions]
+        self.assertEqual([tuple(color) for color in colors.tolist()], expected)
+
+        # Modes with only a per-LED ColorUpdate go through the default shim
+        class EveryOther(ColorMode):
+            def ColorUpdate(self, time_delta, led_pos, old_color):
+                return (led_pos, 0, 0) if led_pos % 2 else None
+
+        colors, updated = EveryOther("EveryOther", ledsettings).ColorUpdateFrame(0.0, positions, old_colors)
+        self.assertEqual(updated.tolist(), (positions % 2 == 1).tolist())
+        self.assertEqual(colors[updated, 0].tolist(), positions[updated].tolist())
+        self.assertEqual(colors[~updated].tolist(), old_colors[~updated].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
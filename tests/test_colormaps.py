@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+import lib.colormaps as cmap
+
+
+class TestColormaps(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        for filepath in glob.glob("Colormaps/*.data"):
+            shutil.copy(filepath, self.data_dir)
+        self.cache_dir = os.path.join(self.data_dir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_lut_cache_round_trip(self):
+        loaded = cmap.load_colormaps(self.data_dir, self.cache_dir)
+        cmap.gradients.update(loaded)
+        cmap.generate_colormaps(cmap.gradients, 1.5, ["Rainbow"])
+        self.assertFalse(cmap.lut_cache_is_current())
+        cmap.save_lut_cache(self.data_dir, self.cache_dir)
+        self.assertTrue(cmap.lut_cache_is_current())
+
+        # A restart reads the same gradients and tables back from the cache
+        self.assertEqual(cmap.load_colormaps(self.data_dir, self.cache_dir), loaded)
+        self.assertTrue(cmap.lut_cache_is_current())
+        for name in cmap.gradients:
+            if name.startswith("^"):
+                continue
+            expected = cmap.gradient_to_cmaplut(cmap.gradients[name], 1.5)
+            self.assertEqual(list(cmap.colormaps[name]), expected)
+            lut = cmap.get_lut(name)
+            self.assertEqual(lut.shape, (256, 3))
+            self.assertFalse(lut.flags.writeable)
+            self.assertEqual(cmap.colormaps_preview[name], cmap.gradient_to_cmaplut(cmap.gradients[name], 2.2, 64))
+
+        # Changing the gamma swaps in new tables; editing a data file makes the cache stale
+        cmap.generate_colormaps(cmap.gradients, 2.0, ["Rainbow"])
+        self.assertFalse(cmap.lut_cache_is_current())
+        self.assertEqual(list(cmap.colormaps["Rainbow"]), cmap.gradient_to_cmaplut(cmap.gradients["Rainbow"], 2.0))
+        data_file = glob.glob(os.path.join(self.data_dir, "*.data"))[0]
+        os.utime(data_file, ns=(0, 0))
+        cmap.load_colormaps(self.data_dir, self.cache_dir)
+        self.assertFalse(cmap.lut_cache_is_current())
+
+        self.assertNotIn("Missing", cmap.colormaps)
+        self.assertIsNone(cmap.colormaps.get("Missing"))
+        self.assertIsNone(cmap.get_lut("Missing"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import os
+import shutil
+import tempfile
+import unittest
+import mido
+import numpy as np
+from lib import compiled_song
+
+
+class TestCompiledSong(unittest.TestCase):
+    song_name = "Ludwig van Beethoven - Fur Elise.mid"
+
+    def setUp(self):
+        songs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Songs")
+        self.songs_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.songs_dir, "cache")
+        shutil.copy(os.path.join(songs_dir, self.song_name), self.songs_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.songs_dir)
+
+    def load(self):
+        return compiled_song.load_song(self.song_name, self.songs_dir, self.cache_dir)
+
+    def test_matches_mido_messages(self):
+        song = self.load()
+        mid = mido.MidiFile(os.path.join(self.songs_dir, self.song_name), clip=True)
+        merged = mido.merge_tracks(mid.tracks)
+        self.assertEqual(len(song), len(merged))
+
+        tempo = compiled_song.get_tempo(mid)
+        expected = [mido.tick2second(msg.time, mid.ticks_per_beat, tempo * 100 / 80) for msg in merged]
+        np.testing.assert_allclose(song.delays(0, len(song), 100 / 80), expected, atol=1e-9)
+        np.testing.assert_allclose(song.delays(10, 50, 100 / 80), expected[10:50], atol=1e-9)
+
+        offset = 1 if len(mid.tracks) == 2 else 0
+        for row, msg in zip(song.iter_events(), merged):
+            self.assertEqual(row.is_meta, msg.is_meta)
+            if msg.type in ("note_on", "note_off"):
+                self.assertEqual((row.type, row.note), (msg.type, msg.note))
+                self.assertIn(row.channel, range(offset, len(mid.tracks) + offset))
+            elif not msg.is_meta:
+                self.assertEqual(row.bytes(), msg.bytes())
+
+    def test_output_matches_midi_playback(self):
+        song = self.load()
+        expected = []
+        song_time = 0.0
+        for msg in mido.MidiFile(os.path.join(self.songs_dir, self.song_name), clip=True):
+            song_time += msg.time  # Delta in seconds, following tempo changes
+            if not msg.is_meta:
+                expected.append((song_time, msg.bytes() if msg.type == "sysex" else msg.bytes()[:2]))
+
+        rows = song.output_rows()
+        np.testing.assert_allclose(song.events["play"][rows], [t for t, data in expected], atol=1e-9)
+        # Notes keep the channel they have in the file
+        self.assertEqual([song.output_message(row).bytes() if row in song.sysex else song.output_message(row).bytes()[:2]
+                          for row in rows], [data for t, data in expected])
+
+    def test_sysex_is_played(self):
+        mid = mido.MidiFile()
+        track = mido.MidiTrack()
+        track.append(mido.Message("sysex", data=[0x7E, 0x7F, 0x09, 0x01]))
+        track.append(mido.Message("note_on", note=60, velocity=64, time=96))
+        track.append(mido.Message("sysex", data=[0x43, 0x10, 0x4C], time=96))
+        track.append(mido.Message("note_off", note=60, time=96))
+        mid.tracks.append(track)
+        mid.save(os.path.join(self.songs_dir, "sysex.mid"))
+
+        # Compiled, then read back from the cache
+        for _ in range(2):
+            song = compiled_song.load_song("sysex.mid", self.songs_dir, self.cache_dir)
+            messages = [song.output_message(row) for row in song.output_rows()]
+            self.assertEqual([msg.type for msg in messages], ["sysex", "note_on", "sysex", "note_off"])
+            self.assertEqual(messages[0].bytes(), [0xF0, 0x7E, 0x7F, 0x09, 0x01, 0xF7])
+            self.assertEqual(messages[2].bytes(), [0xF0, 0x43, 0x10, 0x4C, 0xF7])
+
+    def test_step_preview_matches_scan(self):
+        song = self.load()
+        end = len(song)
+
+        def scan(start, exclude):
+            # What predict_future_notes used to do: walk the rows to the next chord
+            predicted = []
+            for row, delay in zip(range(start, end), song.delays(start, end)):
+                msg = song.event(row)
+                if msg.type in ("note_on", "note_off") and delay > 0 and predicted:
+                    return predicted
+                if msg.type == "note_on" and msg.velocity > 0 and msg.note not in exclude:
+                    predicted.append(row)
+            return []
+
+        for start in range(0, end, 7):
+            exclude = [song.event(row).note for row in scan(start, [])[:1]]
+            self.assertEqual(song.steps.preview(start, end), scan(start, []))
+            self.assertEqual(song.steps.preview(start, end, exclude), scan(start, exclude))
+
+    def test_step_groups_match_scan(self):
+        song = self.load()
+        steps = song.steps
+
+        def scan(hands, mute_hand):
+            # Walk the rows as the learn loop did: a step ends at the next note after a delay
+            press, autoplay = [[]], [[]]
+            for row, delay in zip(range(len(song)), song.delays(0, len(song))):
+                msg = song.event(row)
+                if msg.type in ("note_on", "note_off") and delay > 0 and row > 0:
+                    press.append([])
+                    autoplay.append([])
+                if msg.is_meta:
+                    continue
+                if msg.type == "note_on" and msg.velocity > 0 and (hands == 0 or msg.channel == hands):
+                    press[-1].append(msg.note)
+                if (hands == 1 and mute_hand != 2 and msg.channel == 2) or (
+                        hands == 2 and mute_hand != 1 and msg.channel == 1):
+                    autoplay[-1].append(row)
+            return press, autoplay
+
+        for hands in range(3):
+            for mute_hand in range(3):
+                press, autoplay = scan(hands, mute_hand)
+                self.assertEqual(len(steps), len(press))
+                self.assertEqual([steps.to_press(step, hands)[0] for step in range(len(steps))], press)
+                self.assertEqual([steps.autoplay(step, hands, mute_hand) for step in range(len(steps))], autoplay)
+
+        # Every row maps to the step whose row range holds it
+        for step in range(len(steps)):
+            start, end = steps.rows(step)
+            self.assertEqual({steps.step_at(row) for row in range(start, end)}, {step})
+        self.assertEqual(steps.autoplay(3, 0, 0, listen=True), song.output_rows()[
+            np.searchsorted(song.output_rows(), steps.rows(3)[0]):
+            np.searchsorted(song.output_rows(), steps.rows(3)[1])].tolist())
+
+        # A row range widens to the chords it touches
+        first, last = steps.span(steps.rows(5)[1] - 1, steps.rows(9)[0] + 1)
+        self.assertEqual((first, last), (5, 10))
+        self.assertEqual(steps.span(10, 10), (0, 0))
+
+    def test_cache_is_memory_mapped_and_versioned(self):
+        self.load()
+        song = compiled_song.load_cached(self.song_name, self.songs_dir, self.cache_dir)
+        self.assertIsInstance(song.events, np.memmap)
+
+        # Same content with a new mtime stays valid
+        source = os.path.join(self.songs_dir, self.song_name)
+        os.utime(source, ns=(0, 0))
+        self.assertIsNotNone(compiled_song.load_cached(self.song_name, self.songs_dir, self.cache_dir))
+
+        # Changed content invalidates the cache
+        with open(source, "r+b") as handle:
+            handle.seek(-1, os.SEEK_END)
+            last = handle.read(1)
+            handle.seek(-1, os.SEEK_END)
+            handle.write(bytes([last[0] ^ 1]))
+        os.utime(source, ns=(1, 1))
+        self.assertIsNone(compiled_song.load_cached(self.song_name, self.songs_dir, self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
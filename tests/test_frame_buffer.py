@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import threading
+import unittest
+import numpy as np
+from lib.frame_buffer import FrameBuffer, pack_rgb, unpack_rgb
+from lib.LED_drivers import PixelStrip_Emu
+
+
+class CountingDriver(PixelStrip_Emu):
+    def __init__(self, numleds):
+        super().__init__(numleds)
+        self.VIS_FPS = 1000000
+        self.bulk_writes = 0
+        self.shows = 0
+
+    def setPixels(self, pixels):
+        self.bulk_writes += 1
+        super().setPixels(pixels)
+
+    def show(self):
+        self.shows += 1
+
+
+class PerPixelDriver:
+    """rpi_ws281x-like driver: no setPixels(), so flush() only sends the pixels that changed."""
+
+    def __init__(self, numleds):
+        self.pixels = [0] * numleds
+
+    def numPixels(self):
+        return len(self.pixels)
+
+    def setPixelColor(self, pos, color):
+        self.pixels[pos] = color
+
+    def show(self):
+        pass
+
+
+class TestFrameBuffer(unittest.TestCase):
+    def setUp(self):
+        self.driver = CountingDriver(10)
+        self.fb = FrameBuffer(self.driver)
+
+    def test_01_set_pixel_matches_color_format(self):
+        self.fb.setPixelColor(3, (10 << 16) | (20 << 8) | 30)
+        self.fb.setPixelColor(99, 1)  # out of range is ignored
+        self.assertEqual(self.fb.getPixelColor(3), int(pack_rgb(10, 20, 30)))
+        self.assertEqual(unpack_rgb(self.fb.pixels)[3].tolist(), [10, 20, 30])
+
+    def test_02_bulk_writes(self):
+        self.fb.fill((1, 2, 3))
+        self.assertTrue((self.fb.rgb() == [1, 2, 3]).all())
+
+        self.fb.blit(np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]]), offset=8)
+        self.assertEqual(self.fb.rgb()[8:].tolist(), [[255, 0, 0], [0, 255, 0]])
+
+        mask = np.zeros(10, dtype=bool)
+        mask[[0, 2]] = True
+        self.fb.set_masked(mask, 0)
+        self.assertEqual(self.fb.getPixels()[:3], [0, int(pack_rgb(1, 2, 3)), 0])
+
+    def test_03_show_flushes_in_one_call(self):
+        self.fb.fill((5, 5, 5))
+        self.fb.show()
+        self.assertEqual(self.driver.bulk_writes, 1)
+        self.assertEqual(self.driver.shows, 1)
+        self.assertEqual(self.driver.getPixels(), self.fb.getPixels())
+
+    def test_04_unchanged_frame_is_not_shown(self):
+        self.fb.setPixelColor(2, 7)
+        self.fb.show()
+        self.fb.setPixelColor(2, 7)
+        self.fb.show()
+        self.fb.show()
+        self.assertEqual(self.driver.shows, 1)
+
+        self.fb.setBrightness(10)
+        self.fb.show()
+        self.assertEqual(self.driver.shows, 2)
+        self.assertEqual(self.fb.get_show_stats(), {"requested": 4, "issued": 2, "suppressed": 2})
+
+    def test_05_frame_barrier_merges_shows(self):
+        with self.fb.frame():
+            for i in range(5):
+                self.fb.setPixelColor(i, i + 1)
+                self.fb.show()
+            self.assertEqual(self.driver.shows, 0)
+        self.assertEqual(self.driver.shows, 1)
+        self.assertEqual(self.driver.getPixels()[:5], [1, 2, 3, 4, 5])
+
+
+    def test_06_write_during_flush_is_not_lost(self):
+        driver = PerPixelDriver(16)
+        fb = FrameBuffer(driver)
+        fb.flush()
+
+        class RacyPixels(np.ndarray):
+            """Lets another thread write while flush() is taking its snapshot."""
+            writer = None
+
+            def copy(self, *args, **kwargs):
+                if RacyPixels.writer is None:
+                    RacyPixels.writer = threading.Thread(target=fb.setPixelColor, args=(5, 99))
+                    RacyPixels.writer.start()
+                    RacyPixels.writer.join(0.1)  # Blocks the full timeout only if the write has to wait
+                return np.ndarray.copy(self, *args, **kwargs)
+
+        fb.pixels = fb.pixels.view(RacyPixels)
+        fb.setPixelColor(2, 7)
+        fb.flush()
+        RacyPixels.writer.join()
+        fb.flush()
+        self.assertEqual(driver.pixels[2], 7)
+        self.assertEqual(driver.pixels[5], 99)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import types
+import unittest
+from lib.frame_buffer import FrameBuffer, pack_rgb
+from lib.guide_lights import GuideLights
+from lib.LED_drivers import PixelStrip_Emu
+
+
+class FakeSettings:
+    backlight_stopped = False
+    backlight_brightness_percent = 50
+
+    def get_backlight_color(self, color):
+        return {"Red": 0, "Green": 0, "Blue": 20}[color]
+
+
+class TestGuideLights(unittest.TestCase):
+    def setUp(self):
+        driver = PixelStrip_Emu(20)
+        driver.VIS_FPS = 1000000
+        self.strip = FrameBuffer(driver)
+        self.strip.fill(pack_rgb(0, 0, 10))
+        self.strip.show()
+        self.guide = GuideLights(types.SimpleNamespace(strip=self.strip), FakeSettings())
+
+    def test_only_changed_leds_are_written_in_one_show(self):
+        guide = self.guide
+        shows = self.strip.show_issued
+        guide.set("step", 3, (0, 100, 0))
+        guide.set("step", 5, (0, 100, 0))
+        guide.set("preview", 8, (0, 5, 0))
+        self.assertEqual(guide.apply(), 3)
+        self.assertEqual(self.strip.show_issued, shows + 1)
+        self.assertEqual(guide.apply(), 0)
+        self.assertEqual(self.strip.show_issued, shows + 1)
+
+        # Later layers win; LEDs that leave every layer get the backlight back
+        guide.set("wrong", 5, (255, 0, 0))
+        guide.set("preview", 5, (0, 5, 0))
+        guide.discard("step", 3)
+        self.assertEqual(guide.apply(), 2)
+        self.assertEqual(int(self.strip.pixels[3]), int(pack_rgb(0, 0, 10)))
+        self.assertEqual(int(self.strip.pixels[5]), int(pack_rgb(0, 5, 0)))
+        guide.clear("preview")
+        guide.apply()
+        self.assertEqual(int(self.strip.pixels[5]), int(pack_rgb(255, 0, 0)))
+
+        # Finishing a step restores only the guide LEDs
+        self.strip.setPixelColor(12, pack_rgb(1, 2, 3))
+        guide.clear()
+        self.assertEqual(guide.apply(), 1)
+        self.assertEqual(int(self.strip.pixels[12]), int(pack_rgb(1, 2, 3)))
+        self.assertTrue((self.strip.pixels[:12] == pack_rgb(0, 0, 10)).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
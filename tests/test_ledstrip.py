@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import unittest
+import numpy as np
+from lib.functions import can_overwrite_mask
+from fake_strip import FakeSettings, FakeStrip
+
+
+class TestLedStrip(unittest.TestCase):
+    def setUp(self):
+        self.ledsettings = FakeSettings()
+        self.ledstrip = FakeStrip(300, self.ledsettings)
+
+    def test_overwrite_mask_tracks_key_state(self):
+        strip = self.ledstrip
+        strip.keylist[[10, 50]] = 1000
+        strip.keylist_status[10] = 1
+        strip.keylist_sustained[120] = 1
+        strip.update_occupancy([10, 50, 120])
+        self.assertEqual(np.flatnonzero(~can_overwrite_mask(strip, self.ledsettings)).tolist(), [10, 50, 120])
+
+        # Adjacent colors also reserve the neighbours
+        self.ledsettings.adjacent_mode = "RGB"
+        self.assertEqual(np.flatnonzero(~strip.get_overwrite_mask()).tolist(),
+                         [9, 10, 11, 49, 50, 51, 119, 120, 121])
+
+        # Incremental updates give the same mask as a full rebuild
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            led = int(rng.integers(0, 300))
+            strip.keylist[led] = rng.choice([0, 0, 500])
+            strip.keylist_status[led] = rng.choice([0, 1])
+            strip.update_occupancy(led)
+        incremental = strip.get_overwrite_mask().copy()
+        strip.update_occupancy()
+        self.assertEqual(incremental.tolist(), strip.get_overwrite_mask().tolist())
+
+    def test_halo_pass(self):
+        strip = self.ledstrip
+        pixels = strip.strip.pixels
+        self.ledsettings.adjacent_mode = "Main"
+        strip.keylist[[100, 104]] = 1000
+        strip.keylist_status[[100, 104]] = 1
+        strip.update_occupancy([100, 104])
+        pixels[100] = 0xC80000
+        pixels[104] = 0x0000C8
+        self.assertTrue(strip.apply_halo(idle_color=0x050505))
+        self.assertEqual(pixels[98:107].tolist(), [0, 0xC80000, 0xC80000, 0xC80000, 0, 0x0000C8, 0x0000C8, 0x0000C8, 0])
+        self.assertFalse(strip.apply_halo(idle_color=0x050505))
+
+        # Pressed keys two LEDs apart leave the LED between them idle
+        strip.keylist[102] = 1000
+        strip.keylist_status[102] = 1
+        strip.update_occupancy(102)
+        pixels[102] = 0x00C800
+        strip.apply_halo(idle_color=0x050505)
+        self.assertEqual(pixels[[99, 101, 103, 105]].tolist(), [0xC80000, 0x050505, 0x050505, 0x0000C8])
+
+        # RGB halo follows the key's fade, wider radii fall off
+        self.ledsettings.adjacent_mode = "RGB"
+        self.ledsettings.adjacent_radius = 3
+        strip.keylist[[102, 104]] = 0
+        strip.keylist_status[[102, 104]] = 0
+        strip.keylist[100] = 500
+        strip.update_occupancy([100, 102, 104])
+        pixels[[102, 104]] = 0  # Keys turned off
+        strip.apply_halo(idle_color=0x050505)
+        self.assertEqual(pixels[97:104].tolist(), [0x2A2A2A, 0x555555, 0x7F7F7F, 0xC80000, 0x7F7F7F, 0x555555,
+                                                   0x2A2A2A])
+        self.assertEqual(pixels[105], 0x050505)  # Left the halo: back to idle
+
+        strip.keylist[100] = 0
+        strip.keylist_status[100] = 0
+        strip.update_occupancy(100)
+        strip.apply_halo(idle_color=0x050505)
+        self.assertEqual(pixels[[97, 99, 101, 103]].tolist(), [0x050505] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import threading
+import time
+import unittest
+import numpy as np
+from lib.playback import PlaybackClock
+
+
+class TestPlaybackClock(unittest.TestCase):
+    def test_deadlines_follow_song_time(self):
+        clock = PlaybackClock(np.array([0.5, 1.0, 1.0, 3.0]), tempo_scale=2.0)
+        clock.start(1, now=100.0)
+        # Event 1 is due its own delay after event 0
+        self.assertAlmostEqual(clock.deadline(1), 101.0)
+        self.assertAlmostEqual(clock.deadline(2), 101.0)
+        self.assertAlmostEqual(clock.deadline(3), 105.0)
+
+        # Held up for 10 s: event 1 becomes due now and the rest keep their spacing
+        clock.start(1, now=time.perf_counter() - 10)
+        before = time.perf_counter()
+        clock.realign(1)
+        self.assertGreaterEqual(clock.deadline(1), before)
+        self.assertAlmostEqual(clock.deadline(3) - clock.deadline(1), 4.0)
+
+    def test_run_waits_for_each_event(self):
+        times = np.arange(6) * 0.01
+        clock = PlaybackClock(times)
+        played = []
+        for index in clock.run(1, 4):
+            played.append((index, time.perf_counter() - clock.deadline(index)))
+        self.assertEqual([index for index, late in played], [1, 2, 3])
+        # Never early; the upper bound leaves room for a busy scheduler
+        self.assertTrue(all(0 <= late < 0.05 for index, late in played))
+        self.assertEqual(clock.get_stats()["count"], 3)
+
+        # keep_going is checked while waiting, so a stop does not wait for the next event
+        clock = PlaybackClock(np.array([0.0, 10.0]))
+        start = time.perf_counter()
+        self.assertEqual(list(clock.run(keep_going=lambda: time.perf_counter() - start < 0.1)), [0])
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_tempo_change_keeps_the_next_event_in_place(self):
+        clock = PlaybackClock(np.array([0.0, 1.0, 2.0, 4.0]))
+        clock.start(1, now=100.0)
+        clock.set_tempo_scale(0.5, 2)
+        # Event 2 stays due at 102, the events after it come twice as fast
+        self.assertAlmostEqual(clock.deadline(2), 102.0)
+        self.assertAlmostEqual(clock.deadline(3), 103.0)
+        self.assertAlmostEqual(clock.tempo_scale, 0.5)
+
+    def test_pause_pushes_deadlines_back(self):
+        clock = PlaybackClock(np.array([0.0, 10.0]))
+        clock.start(0)
+        due = clock.deadline(1)
+        clock.pause()
+        self.assertTrue(clock.paused)
+        time.sleep(0.05)
+        clock.resume()
+        self.assertFalse(clock.paused)
+        self.assertGreaterEqual(clock.deadline(1) - due, 0.05)
+
+        # A paused clock does not release events
+        clock = PlaybackClock(np.array([0.0, 0.01]))
+        clock.pause()
+        start = time.perf_counter()
+        self.assertFalse(clock.wait_until(1, lambda: time.perf_counter() - start < 0.1))
+
+    def test_run_loops_and_seeks(self):
+        clock = PlaybackClock(np.arange(10) * 0.002)
+        played = []
+        for index in clock.run(2, 5, loop=True):
+            played.append(index)
+            if len(played) == 7:
+                clock.set_loop()
+        self.assertEqual(played, [2, 3, 4, 2, 3, 4, 2, 3, 4])
+
+        # Playback outside the loop range jumps to its start
+        clock.set_loop(1, 3)
+        played = []
+        for index in clock.run(5):
+            played.append(index)
+            if len(played) == 4:
+                break
+        self.assertEqual(played, [1, 2, 1, 2])
+
+        # An empty range plays through
+        clock.set_loop(4, 4)
+        self.assertEqual(list(clock.run(7)), [7, 8, 9])
+
+        # Seeking from another thread interrupts the wait for the next event
+        clock = PlaybackClock(np.array([0.0, 10.0, 10.0, 10.001]))
+        timer = threading.Timer(0.05, clock.seek, (2,))
+        timer.start()
+        start = time.perf_counter()
+        self.assertEqual(list(clock.run()), [0, 2, 3])
+        self.assertLess(time.perf_counter() - start, 1.0)
+        timer.join()
+
+        # stop() ends run() while it waits
+        clock = PlaybackClock(np.array([0.0, 10.0]))
+        threading.Timer(0.05, clock.stop).start()
+        self.assertEqual(list(clock.run()), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import unittest
+import numpy as np
+from lib.pulse_pool import PulsePool, ATTACK, SUSTAIN, RELEASE, FREE
+
+
+def render(pool, now):
+    # 10 LED radius, 1 s attack/release, no flicker
+    return pool.render(now, 100, 10, 1.0, 0.0, 30.0)
+
+
+class TestPulsePool(unittest.TestCase):
+    def test_pulse_lifecycle(self):
+        pool = PulsePool(4)
+        pool.add(50, (200, 100, 0), 1.0, now=0.0)
+
+        # Halfway through the attack the ring reaches 7.5 LEDs, fading linearly
+        touched, rgb = render(pool, 0.5)
+        self.assertEqual(np.flatnonzero(touched).tolist(), list(range(38, 63)))
+        self.assertEqual(rgb[50].tolist(), [200, 100, 0])
+        self.assertAlmostEqual(rgb[53, 0], 200 * (1 - 3 / 7.5))
+        self.assertFalse(rgb[58].any())
+        self.assertEqual(pool.state[0], ATTACK)
+
+        render(pool, 1.5)
+        self.assertEqual(pool.state[0], SUSTAIN)
+
+        # Release hollows the pulse out from the center, then frees the slot
+        pool.release(50, now=2.0)
+        self.assertEqual(pool.state[0], RELEASE)
+        touched, rgb = render(pool, 2.5)
+        self.assertFalse(rgb[50:55].any())
+        self.assertTrue(rgb[56].any())
+        touched, rgb = render(pool, 3.0)
+        self.assertTrue(touched[40:61].all())  # Last frame clears the area
+        self.assertFalse(rgb.any())
+        self.assertFalse(pool)
+
+    def test_overlapping_pulses_add_up(self):
+        pool = PulsePool(4)
+        pool.add(50, (100, 0, 0), 1.0, now=0.0)
+        pool.add(52, (0, 0, 100), 0.5, now=0.0)
+        touched, rgb = render(pool, 2.0)
+        self.assertEqual(rgb[51].tolist(), [90, 0, 45])
+
+    def test_full_pool_merges_then_replaces(self):
+        pool = PulsePool(3)
+        pool.add(10, (255, 0, 0), 1.0, now=0.0)
+        pool.add(20, (255, 0, 0), 1.0, now=1.0)
+        pool.add(30, (255, 0, 0), 1.0, now=2.0)
+
+        # Same key held: restart that pulse
+        pool.add(20, (0, 255, 0), 0.5, now=3.0)
+        self.assertEqual(len(pool), 3)
+        self.assertEqual(pool.start[1], 3.0)
+        self.assertEqual(pool.color[1].tolist(), [0, 255, 0])
+
+        # Otherwise a releasing pulse goes first, then the oldest one
+        pool.release(30, now=3.5)
+        pool.add(40, (0, 0, 255), 1.0, now=4.0)
+        self.assertEqual(sorted(pool.center.tolist()), [10, 20, 40])
+        pool.add(50, (0, 0, 255), 1.0, now=5.0)
+        self.assertEqual(sorted(pool.center.tolist()), [20, 40, 50])
+        self.assertEqual(pool.merged, 3)
+
+        pool.clear()
+        self.assertTrue((pool.state == FREE).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import types
+import unittest
+from unittest import mock
+from lib.render_scheduler import RenderScheduler
+
+
+class FakeClock:
+    """perf_counter()/sleep() pair where time only moves when sleeping or working."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRenderScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch("lib.render_scheduler.time", types.SimpleNamespace(perf_counter=self.clock.perf_counter))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = RenderScheduler(target_fps=100)
+
+    def frame(self, work, wake=None):
+        self.scheduler.begin_frame()
+        self.clock.sleep(work)
+        self.scheduler.end_frame()
+        return self.scheduler.wait(sleep=self.clock.sleep, wake=wake)
+
+    def test_deadline_advances_by_one_period(self):
+        self.frame(0.003)
+        starts = []
+        for work in (0.004, 0.001, 0.009):
+            starts.append(self.clock.now)
+            slept = self.frame(work)
+            self.assertAlmostEqual(slept, 0.01 - work)
+        # Frames start a whole period apart whatever their work time
+        self.assertAlmostEqual(starts[1] - starts[0], 0.01)
+        self.assertAlmostEqual(starts[2] - starts[1], 0.01)
+        self.assertEqual(self.scheduler.skipped_frames, 0)
+        self.assertEqual(self.scheduler.frames, 4)
+
+    def test_overrun_skips_whole_frames_and_resyncs(self):
+        self.frame(0.0)
+        # 3.5 periods of work: the frame due now plus two whole missed ones
+        self.assertEqual(self.frame(0.035), 0.0)
+        self.assertEqual(self.scheduler.skipped_frames, 2)
+        # The schedule restarts from now instead of trying to catch up
+        self.assertAlmostEqual(self.frame(0.002), 0.008)
+        self.assertEqual(self.scheduler.skipped_frames, 2)
+
+    def test_wake_ends_the_wait_early(self):
+        timeouts = []
+
+        def wake(timeout):
+            timeouts.append(timeout)
+            self.clock.sleep(0.001)  # Input arrives after 1 ms
+            return True
+
+        self.frame(0.0)
+        self.assertAlmostEqual(self.frame(0.003, wake), 0.001)
+        self.assertAlmostEqual(timeouts[-1], 0.007)
+        self.assertEqual(self.scheduler.wakeups, 1)
+
+        # Right after a frame start the wait holds off MIN_WAKE_INTERVAL first
+        self.frame(0.0, wake)
+        self.assertAlmostEqual(timeouts[-1], 0.01 - RenderScheduler.MIN_WAKE_INTERVAL)
+
+        # Without input the wait lasts the remaining period, from the wake-up restart
+        def idle(timeout):
+            timeouts.append(timeout)
+            self.clock.sleep(timeout)
+            return False
+
+        self.assertAlmostEqual(self.frame(0.004, idle), 0.006)
+        self.assertEqual(self.scheduler.wakeups, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import os
+import shutil
+import tempfile
+import unittest
+import mido
+from lib.savemidi import SaveMIDI, ACTIVE_JOURNAL
+
+
+class FakeMenu:
+    def __init__(self):
+        self.messages = []
+
+    def render_message(self, *args):
+        self.messages.append(args[0])
+
+    def update_songs(self):
+        pass
+
+
+def summary(path):
+    return [(msg.type, msg.bytes()[1:], msg.time) for msg in mido.MidiFile(path).tracks[0] if not msg.is_meta]
+
+
+class TestSaveMIDI(unittest.TestCase):
+    def setUp(self):
+        self.songs_dir = tempfile.mkdtemp()
+        self.saving = SaveMIDI(self.songs_dir)
+        self.saving.add_instance(FakeMenu())
+
+    def tearDown(self):
+        shutil.rmtree(self.songs_dir)
+
+    def record(self, saving):
+        saving.start_recording()
+        saving.add_track("note_on", 60, 100, 10.0, "#ff0000")
+        saving.add_control_change("control_change", 0, 64, 127, 10.25)
+        saving.add_track("note_on", 64, 90, 10.5, "#00ff00")
+        saving.add_track("note_off", 60, 0, 11.0)
+        saving.add_track("note_off", 64, 0, 11.5)
+
+    def test_journal_to_tracks(self):
+        self.record(self.saving)
+        self.saving.save("take")
+        self.assertTrue(self.saving.wait_until_saved(5))
+        self.assertEqual(self.saving.menu.messages[-1], "File saved")
+
+        self.assertEqual(sorted(os.listdir(self.songs_dir)),
+                         ["take_#00ff00.mid", "take_#ff0000.mid", "take_main.mid"])
+        self.assertEqual(summary(os.path.join(self.songs_dir, "take_main.mid")), [
+            ("note_on", [60, 100], 0), ("control_change", [64, 127], 10000), ("note_on", [64, 90], 10000),
+            ("note_off", [60, 0], 20000), ("note_off", [64, 0], 20000)])
+        # Color tracks start with a silent note_off and get every note_off from their first note on
+        self.assertEqual(summary(os.path.join(self.songs_dir, "take_#ff0000.mid")), [
+            ("note_off", [0, 0], 0), ("note_on", [60, 100], 0), ("note_off", [60, 0], 40000),
+            ("note_off", [64, 0], 20000)])
+        self.assertEqual(summary(os.path.join(self.songs_dir, "take_#00ff00.mid")), [
+            ("note_off", [0, 0], 0), ("note_on", [64, 90], 20000), ("note_off", [60, 0], 20000),
+            ("note_off", [64, 0], 20000)])
+
+    def test_empty_recording_writes_nothing(self):
+        self.saving.start_recording()
+        self.saving.save("empty")
+        self.assertTrue(self.saving.wait_until_saved(5))
+        self.assertEqual(os.listdir(self.songs_dir), [])
+        self.assertNotIn("File saved", self.saving.menu.messages)
+
+    def test_recover_crashed_recording(self):
+        self.record(self.saving)
+        # The process dies mid-write: the last record is cut short
+        with open(os.path.join(self.songs_dir, ACTIVE_JOURNAL), "ab") as f:
+            f.write(b"\x00" * 5)
+
+        saving = SaveMIDI(self.songs_dir)
+        saving.recover_journals()
+        saving.wait_until_saved()
+        names = os.listdir(self.songs_dir)
+        self.assertEqual(len(names), 3)
+        main = [name for name in names if name.startswith("recovered ") and name.endswith("_main.mid")]
+        self.assertEqual(len(summary(os.path.join(self.songs_dir, main[0]))), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
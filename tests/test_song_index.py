@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import sys
+sys.path.append('./')
+sys.path.append('../')
+import os
+import shutil
+import tempfile
+import unittest
+from lib.song_index import SongIndex
+
+
+class TestSongIndex(unittest.TestCase):
+    def setUp(self):
+        songs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Songs")
+        self.songs_dir = tempfile.mkdtemp()
+        source = os.path.join(songs_dir, "Ludwig van Beethoven - Fur Elise.mid")
+        for i, name in enumerate(["b.mid", "a.mid", "c_#1.mid", "notes.txt"]):
+            path = os.path.join(self.songs_dir, name)
+            shutil.copy(source, path)
+            os.utime(path, (1000 + i, 1000 + i))
+        self.index = SongIndex(":memory:", self.songs_dir)
+        self.index.scan()
+
+    def tearDown(self):
+        shutil.rmtree(self.songs_dir)
+
+    def names(self, **kwargs):
+        return [song["name"] for song in self.index.get_page(0, 10, **kwargs)]
+
+    def test_paging_sorting_and_search(self):
+        self.assertEqual(self.index.count(), 2)
+        self.assertEqual(self.names(), ["b.mid", "a.mid"])
+        self.assertEqual(self.names(sort_by="dateAsc"), ["a.mid", "b.mid"])
+        self.assertEqual(self.names(sort_by="nameAsc"), ["a.mid", "b.mid"])
+        self.assertEqual([s["name"] for s in self.index.get_page(1, 1, "nameAsc")], ["b.mid"])
+        self.assertEqual(self.names(search="B."), ["b.mid"])
+        self.assertEqual(self.index.count(search="%"), 0)
+        self.assertIn("c_#1.mid", self.index.list_names())
+
+    def test_tracks_library_changes(self):
+        shutil.copy(os.path.join(self.songs_dir, "a.mid"), os.path.join(self.songs_dir, "d.mid"))
+        os.remove(os.path.join(self.songs_dir, "b.mid"))
+        # Picked up from the folder mtime, without explicit add/remove calls
+        self.assertEqual(sorted(self.names()), ["a.mid", "d.mid"])
+
+        os.rename(os.path.join(self.songs_dir, "d.mid"), os.path.join(self.songs_dir, "e.mid"))
+        self.index.rename("d.mid", "e.mid")
+        self.assertEqual(sorted(self.names()), ["a.mid", "e.mid"])
+
+    def test_metadata(self):
+        self.index._analyze("a.mid")
+        song = self.index.get_song("a.mid")
+        self.assertGreater(song["duration"], 0)
+        self.assertGreater(song["note_count"], 0)
+        self.assertEqual(song["track_count"], 2)
+        self.assertIsNotNone(song["tempo"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,7 +8,7 @@ import time
 
 from lib.argument_parser import ArgumentParser
 from lib.component_initializer import ComponentInitializer
-from lib.functions import fastColorWipe, screensaver, \
+from lib.functions import fastColorWipe, backlight_idle_leds, screensaver, \
     manage_idle_animation, stop_animations
 from lib.gpio_handler import GPIOHandler
 from lib.led_effects_processor import LEDEffectsProcessor
@@ -19,6 +19,7 @@ from lib.midi_event_processor import MIDIEventProcessor
 from lib.color_mode import ColorMode
 from lib.webinterface_manager import WebInterfaceManager
 from lib.state_manager import StateManager
+from lib.render_scheduler import RenderScheduler
 
 from lib.log_setup import logger
 
@@ -56,6 +57,7 @@ class VisualizerApp:
         
         # Initialize state manager first
         self.state_manager = StateManager(self.ci.usersettings)
+        self.render_scheduler = RenderScheduler(self.state_manager.target_fps)
         
         self.gpio_handler = GPIOHandler(self.args, self.ci.midiports, self.ci.menu,
                                         self.ci.ledstrip, self.ci.ledsettings,
@@ -69,7 +71,9 @@ class VisualizerApp:
                                                          self.ci.menu,
                                                          self.ci.hotspot,
                                                          self.ci.platform,
-                                                         self.state_manager)
+                                                         self.state_manager,
+                                                         self.render_scheduler,
+                                                         self.ci.song_index)
         self.midi_event_processor = MIDIEventProcessor(self.ci.midiports,
                                                        self.ci.ledstrip,
                                                        self.ci.ledsettings,
@@ -117,8 +121,9 @@ class VisualizerApp:
         platform = ci.platform
         platform.manage_hotspot(ci.hotspot, ci.usersettings, ci.midiports, True)
 
+        scheduler = self.render_scheduler
         while True:
-            loop_start = time.perf_counter()
+            loop_start = scheduler.begin_frame()
             try:
                 elapsed_time = loop_start - ci.saving.start_time
             except Exception as e:
@@ -136,8 +141,8 @@ class VisualizerApp:
             # Update system state (syncs with midiports and menu activity)
             self.state_manager.update_state(midiports, menu, now_wall)
             
-            # Get dynamic sleep interval based on current state
-            sleep_interval = self.state_manager.get_loop_delay()
+            # Frame period based on current state (target FPS, or long period in IDLE)
+            frame_period = self.state_manager.get_frame_period()
 
             self.check_screensaver(midiports, menu, now_wall)
             manage_idle_animation(ledstrip, ledsettings, menu, midiports, self.state_manager)
@@ -151,19 +156,31 @@ class VisualizerApp:
             event_loop_time = loop_start - self.event_loop_stamp
             self.event_loop_stamp = loop_start
 
-            fade_processed = self.led_effects_processor.process_fade_effects(event_loop_time)
-            midi_processed = self.midi_event_processor.process_midi_events()
+            # Frame barrier: show() requests from any thread are merged into one transfer at commit()
+            ledstrip.strip.begin_frame()
+            try:
+                fade_processed = self.led_effects_processor.process_fade_effects(event_loop_time)
+                midi_processed = self.midi_event_processor.process_midi_events()
+                # Adjacent-LED halo around lit keys, drawn once over the finished frame;
+                # LEDs leaving it go idle like released keys (off during the screensaver)
+                halo_processed = ledstrip.apply_halo(self.midi_event_processor.idle_color())
+
+                # Only update LEDs if effects changed them or MIDI events occurred
+                should_update = fade_processed or midi_processed or halo_processed
+                if should_update:
+                    ledstrip.strip.show()
+            finally:
+                ledstrip.strip.commit()
 
-            # Only update LEDs if effects changed them or MIDI events occurred
-            should_update = fade_processed or midi_processed
-            
             if should_update:
-                ledstrip.strip.show()
                 self.update_fps_stats()
             else:
                 # In IDLE with no activity, set FPS to reflect actual state
-                ledstrip.current_fps = 1.0 / max(sleep_interval, 0.001) if sleep_interval > 0 else 0
-            time.sleep(sleep_interval)  # Dynamic delay based on system state
+                ledstrip.current_fps = 1.0 / max(frame_period, 0.001) if frame_period > 0 else 0
+
+            scheduler.end_frame()
+            # Sleep only what is left of this frame's budget, waking early when MIDI input is queued
+            scheduler.wait(frame_period, wake=midiports.wait_for_led_input)
 
     def update_fps_stats(self):
         self.frame_count += 1
@@ -194,12 +211,12 @@ class VisualizerApp:
         if (now - midiports.last_activity) > 120:
             if not self.backlight_cleared:
                 ledsettings.backlight_stopped = True
-                fastColorWipe(ledstrip.strip, True, ledsettings)
+                backlight_idle_leds(ledstrip, ledsettings)
                 self.backlight_cleared = True
         else:
             if self.backlight_cleared:
                 ledsettings.backlight_stopped = False
-                fastColorWipe(ledstrip.strip, True, ledsettings)
+                backlight_idle_leds(ledstrip, ledsettings)
                 self.backlight_cleared = False
 
     def update_display(self, elapsed_time, menu):
@@ -34,6 +34,8 @@ class AppState:
         self.hotspot = None
         self.platform = None
         self.state_manager = None
+        self.render_scheduler = None
+        self.song_index = None
         self.ledemu_clients = set()  # Track active LED emulator clients
         self.ledemu_pause = False
         self.current_profile_id = None
@@ -11,6 +11,7 @@ let count = 0;
 let is_playing = 0;
 
 let learning_status_timeout = '';
+let recording_status_timeout = '';
 let hand_colorList = '';
 
 let uploadProgress = [];
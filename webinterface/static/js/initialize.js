@@ -266,6 +266,14 @@ function initialize_led_settings() {
             change_setting("sides_color_mode", this.value)
             document.getElementById('sides_color_choose').hidden = this.value !== "RGB";
         }
+
+        document.getElementById('sides_radius').onchange = function () {
+            change_setting("sides_radius", this.value)
+        }
+
+        document.getElementById('sides_falloff').onchange = function () {
+            change_setting("sides_falloff", this.value)
+        }
     }
 
     document.getElementById('fading_speed').onchange = function () {
@@ -613,6 +613,8 @@ function get_settings(home = true) {
                     document.getElementById("backlight_color").value = response["backlight_color"];
                     document.getElementById("sides_color").value = response["sides_color"];
                     document.getElementById("sides_color_mode").value = response["sides_color_mode"];
+                    document.getElementById("sides_radius").value = response["sides_radius"];
+                    document.getElementById("sides_falloff").value = response["sides_falloff"];
 
                     if (response["sides_color_mode"] !== "RGB") {
                         document.getElementById('sides_color_choose').hidden = true;
@@ -1988,10 +1990,27 @@ function get_recording_status() {
                 document.getElementById("save_recording_button").classList.add('pointer-events-none', 'opacity-50');
                 document.getElementById("cancel_recording_button").classList.add('pointer-events-none', 'opacity-50');
             }
+            const playback = response["playback"];
+            document.getElementById("midi_play_paused").checked = playback["paused"];
+            document.getElementById("midi_play_tempo").value = playback["tempo"];
+            document.getElementById("midi_play_tempo_value").innerHTML = playback["tempo"];
+            document.getElementById("midi_play_loop").checked = playback["loop"] !== null;
+            if (playback["loop"] !== null) {
+                document.getElementById("midi_play_loop_start").value = playback["loop"][0];
+                document.getElementById("midi_play_loop_end").value = playback["loop"][1];
+            }
+            clearTimeout(recording_status_timeout);
             if (Object.keys(response["isplaying"]).length > 0) {
                 document.getElementById("midi_player_wrapper").classList.remove("hidden");
                 document.getElementById("start_midi_play").classList.add("hidden");
                 document.getElementById("stop_midi_play").classList.remove("hidden");
+                const position = document.getElementById("midi_play_position");
+                // Don't move the slider while it is being dragged
+                if (document.activeElement !== position) {
+                    position.value = playback["position"];
+                }
+                // Follow the song while it plays
+                recording_status_timeout = setTimeout(get_recording_status, 1000);
             }
         }
     };
@@ -1999,6 +2018,16 @@ function get_recording_status() {
     xhttp.send();
 }
 
+function set_midi_play_loop() {
+    // "start,end" in percent of the song, empty to play through
+    let value = "";
+    if (document.getElementById("midi_play_loop").checked) {
+        value = document.getElementById("midi_play_loop_start").value + "," +
+            document.getElementById("midi_play_loop_end").value;
+    }
+    change_setting("midi_play_loop", value);
+}
+
 function get_learning_status(loop_call = false) {
     const xhttp = new XMLHttpRequest();
     const delay_between_requests = 500;
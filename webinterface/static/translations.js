@@ -136,6 +136,11 @@ const translations = {
         off: "Off",
         same_as_led_color: "Same as LED Color",
         rgb: "RGB",
+        sides_radius: "Radius",
+        sides_falloff: "Falloff",
+        flat: "Flat",
+        linear: "Linear",
+        smooth: "Smooth",
         adjustments: "Adjustments",
         skipped_notes: "Skipped Notes",
         finger_based_ignore: "Finger Based: ignore notes with information about which hand to play",
@@ -198,6 +203,8 @@ const translations = {
         or_click_to_choose: "or click to choose file(s) to upload",
         play_on_piano: "Play on piano",
         stop: "Stop",
+        pause: "Pause",
+        position: "Position",
         learning_status: "Start learning",
         stop_learning: "Stop learning",
         loop: "Loop",
@@ -83,4 +83,6 @@ def upload_file():
 
         filename = filename.replace("'", "")
         file.save(os.path.join(webinterface.config['UPLOAD_FOLDER'], filename))
+        if app_state.song_index is not None:
+            app_state.song_index.add(filename)
         return jsonify(success=True, reload_songs=True, song_name=filename)
@@ -1,10 +1,16 @@
 from webinterface import webinterface, app_state
 from flask import render_template, send_file, request, jsonify
 from werkzeug.security import safe_join
-from lib.functions import (get_last_logs, find_between, fastColorWipe, play_midi, clamp, validate_schedule_overlaps,
+from lib.functions import (get_last_logs, find_between, fastColorWipe, clamp, validate_schedule_overlaps,
                            HAT_DISABLED, read_cover_open)
 from lib.led_animations import get_registry
+from lib.animation_controller import get_controller
+from lib.playback import get_player
+from lib.ledstrip import HALO_FALLOFFS
+from lib.savemidi import SAVE_WAIT_TIMEOUT
 import lib.colormaps as cmap
+from lib import compiled_song
+from lib.song_index import SongIndex
 import psutil
 import threading
 import webcolors as wc
@@ -99,13 +105,7 @@ def change_animation_speed():
         registry = get_registry()
         anim_info = registry.get_by_web_id(app_state.menu.current_animation_name)
         if anim_info:
-            # Stop current animation
-            app_state.menu.is_animation_running = False
-            app_state.menu.is_idle_animation_running = False
-            import time
-            time.sleep(0.2)  # Give time for thread to stop
-
-            # Restart with new speed
+            # Restart with new speed (replaces the running animation within a frame)
             is_idle = getattr(app_state.menu, 'was_idle_animation', False)
             registry.start_animation(
                 name=anim_info.name,
@@ -161,6 +161,8 @@ def get_homepage_data():
         'card_space_percent': card_space.percent,
         'cover_state': 'Opened' if cover_opened else 'Closed',
         'led_fps': led_fps,
+        'led_frame_stats': app_state.render_scheduler.get_stats() if app_state.render_scheduler else None,
+        'led_show_stats': app_state.ledstrip.strip.get_show_stats(),
         'system_state': system_state,
         'screen_on': app_state.menu.screen_on,
         'display_type': app_state.menu.args.display if app_state.menu and app_state.menu.args and app_state.menu.args.display else app_state.usersettings.get_setting_value("display_type") or '1in44',
@@ -170,6 +172,20 @@ def get_homepage_data():
     return jsonify(homepage_data)
 
 
+@webinterface.route('/api/latency', methods=['GET'])
+def get_latency():
+    """Note-to-photon latency percentiles and histograms per stage (dequeue, color, show, handoff)."""
+    if app_state.ledstrip is None:
+        return jsonify(success=False, error="LED strip not initialized"), 503
+
+    if request.args.get('reset') == '1':
+        app_state.ledstrip.latency.reset()
+
+    stats = app_state.ledstrip.latency.get_stats()
+    stats["animation_stop"] = get_controller().get_stats()
+    return jsonify(stats)
+
+
 @webinterface.route('/api/get_timezones', methods=['GET'])
 def get_timezones():
     """Get list of available timezones."""
@@ -338,6 +354,16 @@ def change_setting():
         app_state.ledsettings.adjacent_mode = value
         app_state.usersettings.change_setting_value("adjacent_mode", value)
 
+    if setting_name == "sides_radius":
+        radius = clamp(int(value), 1, 8)
+        app_state.ledsettings.adjacent_radius = radius
+        app_state.usersettings.change_setting_value("adjacent_radius", radius)
+
+    if setting_name == "sides_falloff":
+        if value in HALO_FALLOFFS:
+            app_state.ledsettings.adjacent_falloff = value
+            app_state.usersettings.change_setting_value("adjacent_falloff", value)
+
     if setting_name == "piano_port":
         app_state.usersettings.change_setting_value("piano_port", value)
         app_state.midiports.change_port("piano", value)
@@ -1165,6 +1191,8 @@ def change_setting():
         now = datetime.datetime.now()
         current_date = now.strftime("%Y-%m-%d %H:%M")
         app_state.saving.save(current_date)
+        # The .mid files are written by the save worker; reload the song list once they exist
+        app_state.saving.wait_until_saved(SAVE_WAIT_TIMEOUT)
         return jsonify(success=True, reload_songs=True)
 
     if setting_name == "songs_per_page":
@@ -1189,9 +1217,15 @@ def change_setting():
                 if search_name in fname:
                     new_name = second_value.replace(".mid", "") + fname.replace(search_name, "")
                     os.rename('Songs/' + fname, 'Songs/' + new_name)
+                    if app_state.song_index is not None:
+                        app_state.song_index.rename(fname, new_name)
         else:
             os.rename('Songs/' + value, 'Songs/' + second_value)
-            os.rename('Songs/cache/' + value + ".p", 'Songs/cache/' + second_value + ".p")
+            for old_path, new_path in zip(compiled_song.cache_files(value), compiled_song.cache_files(second_value)):
+                if os.path.exists(old_path):
+                    os.rename(old_path, new_path)
+            if app_state.song_index is not None:
+                app_state.song_index.rename(value, second_value)
 
         return jsonify(success=True, reload_songs=True)
 
@@ -1201,8 +1235,12 @@ def change_setting():
             for fname in os.listdir('Songs'):
                 if name_no_suffix in fname:
                     os.remove("Songs/" + fname)
+                    if app_state.song_index is not None:
+                        app_state.song_index.remove(fname)
         else:
             os.remove("Songs/" + value)
+            if app_state.song_index is not None:
+                app_state.song_index.remove(value)
 
             file_types = [".musicxml", ".xml", ".mxl", ".abc"]
             for file_type in file_types:
@@ -1211,9 +1249,14 @@ def change_setting():
                 except:
                     pass
 
-            try:
-                os.remove("Songs/cache/" + value + ".p")
-            except:
+            removed = False
+            for cache_path in compiled_song.cache_files(value):
+                try:
+                    os.remove(cache_path)
+                    removed = True
+                except OSError:
+                    pass
+            if not removed:
                 logger.info("No cache file for " + value)
 
         return jsonify(success=True, reload_songs=True)
@@ -1260,20 +1303,45 @@ def change_setting():
             logger.warning("Converting failed")
 
     if setting_name == "start_midi_play":
-        app_state.saving.t = threading.Thread(target=play_midi, args=(value, app_state.midiports,
-                                                                         app_state.saving, app_state.menu,
-                                                                         app_state.ledsettings,
-                                                                         app_state.ledstrip))
-        app_state.saving.t.start()
+        get_player().play(value, app_state.midiports, app_state.saving, app_state.menu, app_state.ledsettings,
+                          app_state.ledstrip)
 
         return jsonify(success=True, reload_songs=True)
 
     if setting_name == "stop_midi_play":
-        app_state.saving.is_playing_midi.clear()
+        get_player().stop()
         fastColorWipe(app_state.ledstrip.strip, True, app_state.ledsettings)
 
         return jsonify(success=True, reload_songs=True)
 
+    if setting_name == "pause_midi_play":
+        if value == "1":
+            get_player().pause()
+        else:
+            get_player().resume()
+
+        return jsonify(success=True)
+
+    if setting_name == "seek_midi_play":
+        get_player().seek(clamp(float(value), 0, 100))
+
+        return jsonify(success=True)
+
+    if setting_name == "midi_play_tempo":
+        get_player().set_tempo(int(value))
+
+        return jsonify(success=True)
+
+    if setting_name == "midi_play_loop":
+        # "start,end" in percent of the song, empty to play through
+        if value:
+            start, end = (clamp(float(point), 0, 100) for point in value.split(","))
+            get_player().set_loop(start, end)
+        else:
+            get_player().set_loop()
+
+        return jsonify(success=True)
+
     if setting_name == "learning_load_song":
         app_state.learning.t = threading.Thread(target=app_state.learning.load_midi, args=(value,))
         app_state.learning.t.start()
@@ -1628,6 +1696,15 @@ def change_setting():
             app_state.state_manager.reload_config()
         return jsonify(success=True)
 
+    if setting_name == "target_fps":
+        value = clamp(int(value), 1, 1000)
+        app_state.usersettings.change_setting_value("target_fps", value)
+        if app_state.state_manager:
+            app_state.state_manager.reload_config()
+        if app_state.render_scheduler:
+            app_state.render_scheduler.set_target_fps(value)
+        return jsonify(success=True)
+
     if setting_name == "screensaver_delay":
         value = max(int(value), 0)
         app_state.menu.screensaver_delay = value
@@ -1662,13 +1739,7 @@ def change_setting():
         if (app_state.menu.is_animation_running or app_state.menu.is_idle_animation_running) and hasattr(app_state.menu, 'current_animation_name'):
             current_name = app_state.menu.current_animation_name
             if current_name:
-                # Stop current animation
-                app_state.menu.is_animation_running = False
-                app_state.menu.is_idle_animation_running = False
-                import time
-                time.sleep(0.2)  # Brief pause to let animation stop
-                
-                # Restart with new speed
+                # Restart with new speed (replaces the running animation within a frame)
                 registry = get_registry()
                 is_idle = getattr(app_state.menu, 'was_idle_animation', False)
                 param = getattr(app_state.menu, 'current_animation_param', None)
@@ -1819,6 +1890,7 @@ def get_idle_animation_settings():
                 "led_animation_brightness_percent": app_state.ledsettings.led_animation_brightness_percent,
                 "led_animation_speed": app_state.usersettings.get_setting_value("led_animation_speed") or "",
                 "idle_timeout_minutes": app_state.usersettings.get_setting_value("idle_timeout_minutes"),
+                "target_fps": app_state.usersettings.get_setting_value("target_fps"),
                 "screensaver_delay": app_state.usersettings.get_setting_value("screensaver_delay"),
                 "screen_off_delay": app_state.usersettings.get_setting_value("screen_off_delay"),
                 "idle_animation_schedule": schedule_list}
@@ -1928,6 +2000,8 @@ def get_settings():
 
     response["sides_color_mode"] = app_state.usersettings.get_setting_value("adjacent_mode")
     response["sides_color"] = sides_color
+    response["sides_radius"] = app_state.usersettings.get_setting_value("adjacent_radius")
+    response["sides_falloff"] = app_state.usersettings.get_setting_value("adjacent_falloff")
 
     response["piano_port"] = app_state.usersettings.get_setting_value("piano_port")
     response["computer_port"] = app_state.usersettings.get_setting_value("computer_port")
@@ -2013,7 +2087,8 @@ def get_recording_status():
     response = {"piano_port": piano_port,
                 "input_port": piano_port,
                 "play_port": piano_port,
-                "isrecording": app_state.saving.is_recording, "isplaying": app_state.saving.is_playing_midi}
+                "isrecording": app_state.saving.is_recording, "isplaying": app_state.saving.is_playing_midi,
+                "playback": get_player().get_status()}
 
     return jsonify(response)
 
@@ -2082,54 +2157,15 @@ def get_songs():
     sortby = request.args.get('sortby')
     search = request.args.get('search')
 
-    start = int(page) * int(length)
-
-    songs_list_dict = {}
-
-    path = 'Songs/'
-    songs_list = os.listdir(path)
-    songs_list = [os.path.join(path, i) for i in songs_list]
-
-    songs_list = sorted(songs_list, key=os.path.getmtime)
-
-    if sortby == "dateAsc":
-        songs_list.reverse()
-
-    if sortby == "nameAsc":
-        songs_list.sort()
+    length = int(length)
+    song_index = app_state.song_index
+    if song_index is None:
+        song_index = app_state.song_index = SongIndex(":memory:")
 
-    if sortby == "nameDesc":
-        songs_list.sort(reverse=True)
-
-    i = 0
-    total_songs = 0
-
-    for song in songs_list:
-        if "_#" in song or not song.endswith('.mid'):
-            continue
-        if search:
-            if search.lower() not in song.lower():
-                continue
-        total_songs += 1
-
-    max_page = int(math.ceil(total_songs / int(length)))
-
-    for song in songs_list:
-        song = song.replace("Songs/", "")
-        date = os.path.getmtime("Songs/" + song)
-        if "_#" in song or not song.endswith('.mid'):
-            continue
-
-        if search:
-            if search.lower() not in song.lower():
-                continue
-
-        i += 1
-        if i > int(start):
-            songs_list_dict[song] = date
-
-        if len(songs_list_dict) >= int(length):
-            break
+    # Only the requested page is read from the index, sorted and filtered by SQLite
+    total_songs = song_index.count(search)
+    max_page = int(math.ceil(total_songs / length))
+    songs_list_dict = {song["name"]: song["mtime"] for song in song_index.get_page(page, length, sortby, search)}
 
     return render_template('songs_list.html', len=len(songs_list_dict), songs_list_dict=songs_list_dict, page=page,
                            max_page=max_page, total_songs=total_songs)
@@ -2386,7 +2422,7 @@ LED_SETTINGS_ALLOWLIST = {
     'led_animation_brightness_percent',
     # Other LED Settings
     'backlight_red', 'backlight_green', 'backlight_blue',
-    'adjacent_mode', 'adjacent_red', 'adjacent_green', 'adjacent_blue',
+    'adjacent_mode', 'adjacent_red', 'adjacent_green', 'adjacent_blue', 'adjacent_radius', 'adjacent_falloff',
     'led_animation', 'led_animation_delay', 'led_animation_speed',
     'animation_speed_slow', 'animation_speed_medium', 'animation_speed_fast',
     'led_gamma',